@@ -1,30 +1,242 @@
-from flask import Flask, request, jsonify, render_template, session, Response, stream_with_context
+from flask import Flask, request, jsonify, render_template, session, Response, stream_with_context, g
 from flask_cors import CORS
-import openai
 import os
 from dotenv import load_dotenv
-import json
 from datetime import datetime
+import hashlib
+import hmac
+import json
+import time
 import uuid
 
+# 환경 변수 로드 (모듈이 import 시점에 읽는 설정도 .env를 따르도록 가장 먼저)
+load_dotenv()
+
 # 커스텀 모듈 import
-from prompts import get_system_prompt, get_relevant_teaching
-from emotion_tracker import EmotionTracker, get_tracker
+from prompts import get_system_prompt, get_relevant_teaching, select_few_shot_examples
+from emotion_tracker import EmotionTracker, get_registry
 from data_logger import ConversationLogger, get_logger
-
-# 환경 변수 로드
-load_dotenv()
+from response_cache import get_response_cache
+from conversation_history import get_history_compactor
+from conversation_store import create_conversation_store
+from sse import DeltaCoalescer, get_stream_stats, sse_comment, sse_event
+from openai_clients import api_key_hash, find_client, get_client, get_default_client, validate_api_key
+from llm_scheduler import (
+    PRIORITY_NORMAL, PRIORITY_RETURNING, PRIORITY_URGENT, SchedulerBusy, get_llm_scheduler
+)
+from token_counter import count_message_tokens
+from crisis_detector import get_crisis_audit_log, get_crisis_detector
+from metrics import get_metrics_registry
+from profiling import get_profiler
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))
 CORS(app)
 
 # OpenAI 클라이언트 (서버 사이드 관리로 보안 강화)
-openai_client = None
+# 워커 프로세스마다 시작 시 환경 변수 키로 미리 생성해 모든 워커가 바로 응답할 수 있게 함
+get_default_client()
+
+# 세션별 감정 트래커 보관소 및 데이터 로거 초기화
+tracker_registry = get_registry(
+    max_sessions=int(os.environ.get('TRACKER_MAX_SESSIONS', 10000)),
+    idle_ttl_seconds=int(os.environ.get('TRACKER_IDLE_TTL_SECONDS', 3600)),
+    max_entries_per_session=int(os.environ.get('TRACKER_MAX_ENTRIES_PER_SESSION', 200)),
+    max_total_entries=int(os.environ.get('TRACKER_MAX_TOTAL_ENTRIES', 200000))
+)
+data_logger = get_logger(
+    consent_required=True,
+    storage=os.environ.get('STORAGE_BACKEND', 'csv'),
+    batch_size=int(os.environ.get('LOG_BATCH_SIZE', 100)),
+    flush_interval=float(os.environ.get('LOG_FLUSH_INTERVAL_SECONDS', 1.0)),
+    fsync_interval=float(os.environ.get('LOG_FSYNC_INTERVAL_SECONDS', 5.0))
+)
+
+# 첫 턴 응답 캐시 (RESPONSE_CACHE_ENABLED=True일 때만 사용)
+response_cache = get_response_cache(
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+    ttl_seconds=int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 3600)),
+    similarity_threshold=float(os.environ.get('RESPONSE_CACHE_SIMILARITY_THRESHOLD', 0.7)),
+    resample_rate=float(os.environ.get('RESPONSE_CACHE_RESAMPLE_RATE', 0.2))
+) if os.environ.get('RESPONSE_CACHE_ENABLED', 'False') == 'True' else None
+
+# 표본 프로파일링 (/api/chat 일부 요청을 cProfile로 기록 - 환경 변수 또는 관리자 API로 켬)
+profiler = get_profiler(
+    output_dir=os.environ.get('PROFILING_DIR', 'conversation_data/profiles'),
+    enabled=os.environ.get('PROFILING_ENABLED', 'False') == 'True',
+    sample_rate=float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01)),
+    max_files=int(os.environ.get('PROFILING_MAX_FILES', 50))
+)
+
+# 관리자 API 토큰 (X-Admin-Token 헤더, 설정하지 않으면 관리자 API 비활성)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# 위기 표현 감지기와 감사 기록 (API 키 확인, 감정 분석, OpenAI 호출보다 먼저 처리)
+crisis_detector = get_crisis_detector()
+crisis_audit_log = get_crisis_audit_log(
+    path=os.environ.get('CRISIS_AUDIT_LOG', 'conversation_data/crisis_audit.jsonl'),
+    flush_interval=float(os.environ.get('CRISIS_AUDIT_FLUSH_INTERVAL_SECONDS', 0.2))
+)
+
+# 서버 측 대화 상태 저장소 (세션별 대화 턴과 이전 대화 요약, 클라이언트는 메시지만 전송)
+conversation_store = create_conversation_store(
+    os.environ.get('CONVERSATION_STORE', 'memory'),
+    max_turns=int(os.environ.get('CONVERSATION_MAX_TURNS', 50)),
+    idle_ttl_seconds=int(os.environ.get('CONVERSATION_IDLE_TTL_SECONDS', 86400))
+)
+
+# 대화 기록 압축기 (최근 턴 원문 + 세션별 이전 대화 요약, 토큰 예산)
+history_compactor = get_history_compactor(
+    token_budget=int(os.environ.get('HISTORY_TOKEN_BUDGET', 1500)),
+    max_recent_turns=int(os.environ.get('HISTORY_MAX_RECENT_TURNS', 4)),
+    summary_token_budget=int(os.environ.get('HISTORY_SUMMARY_TOKEN_BUDGET', 300)),
+    summary_store=conversation_store
+)
+
+def _get_session_id():
+    """현재 요청의 세션 ID 반환 (없으면 새로 발급)"""
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    return session['session_id']
+
+def _is_admin():
+    """관리자 토큰 확인 (ADMIN_TOKEN이 없으면 항상 거부)"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+def _get_openai_client():
+    """
+    현재 요청에 쓸 OpenAI 클라이언트
+    세션에서 /api/setup으로 입력한 키가 있으면 그 클라이언트, 없으면 환경 변수 키의 기본 클라이언트
+
+    세션에 키 해시가 있는데 이 워커에 그 클라이언트가 없으면(다른 워커에서 설정했거나 풀에서 밀려남)
+    기본 클라이언트로 대신하지 않고 None 반환 (사용자의 대화가 운영자 키로 과금되지 않게 - 키를 다시 설정해야 함)
+
+    Returns:
+        openai.OpenAI: 동기 클라이언트 (설정된 키가 없으면 None)
+    """
+    key_hash = session.get('api_key_hash')
+    if key_hash:
+        client = find_client(key_hash)
+        if client is None:
+            session['api_configured'] = False
+        return client
+    return get_default_client()
+
+def _missing_client_message():
+    """_get_openai_client가 None일 때의 안내 문구 (세션 키를 잃었으면 다시 설정 요청)"""
+    return API_KEY_RESET_MESSAGE if session.get('api_key_hash') else 'API 키를 먼저 설정해주세요'
+
+def _get_emotion_tracker():
+    """현재 세션 전용 감정 트래커 반환"""
+    return tracker_registry.get(_get_session_id())
+
+# OpenAI 호출 옵션
+CHAT_COMPLETION_OPTIONS = {
+    'model': 'gpt-4o',
+    'max_tokens': 800,
+    'temperature': 0.8,
+    'presence_penalty': 0.6,
+    'frequency_penalty': 0.3
+}
+# 스트리밍도 일반 응답과 같은 설정으로 생성 (두 경로의 답변 품질을 맞춤)
+# 마지막 청크로 토큰 사용량(usage)을 받아 지표와 스케줄러 정산에 사용
+STREAM_COMPLETION_OPTIONS = dict(CHAT_COMPLETION_OPTIONS, stream_options={'include_usage': True})
+
+# 스트리밍 프레임 묶기(시간/바이트 기준)와 하트비트 주기
+STREAM_COALESCE_SECONDS = int(os.environ.get('STREAM_COALESCE_MS', 50)) / 1000
+STREAM_COALESCE_BYTES = int(os.environ.get('STREAM_COALESCE_BYTES', 64))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15))
+
+# 스트리밍 지표 (클라이언트가 떠나 중단한 스트림, 아낀 토큰)
+stream_stats = get_stream_stats(max_tokens=STREAM_COMPLETION_OPTIONS['max_tokens'])
+
+# Prometheus 지표 (/metrics - 워커가 여러 개면 METRICS_DIR에 워커별 스냅샷을 모아 합산)
+metrics = get_metrics_registry(
+    directory=os.environ.get('METRICS_DIR') or None,
+    flush_interval=float(os.environ.get('METRICS_FLUSH_INTERVAL_SECONDS', 5))
+)
+request_count = metrics.counter(
+    'buddha_requests_total', 'HTTP 요청 수', ('endpoint', 'method', 'status')
+)
+request_latency = metrics.histogram(
+    'buddha_request_duration_seconds', 'HTTP 요청 처리 시간 (스트리밍은 응답 헤더까지)', ('endpoint',)
+)
+stage_latency = metrics.histogram(
+    'buddha_stage_duration_seconds',
+    '대화 처리 단계별 소요 시간 (analyze, context_build, prompt_render, upstream, first_token, store, logging)',
+    ('stage',)
+)
+openai_tokens = metrics.counter(
+    'buddha_openai_tokens_total', 'OpenAI 응답 usage 기준 토큰 수', ('kind',)
+)
+cache_lookups = metrics.counter(
+    'buddha_cache_lookups_total', '캐시 조회 수', ('cache', 'result')
+)
+chat_errors = metrics.counter(
+    'buddha_errors_total', '대화 처리 오류 수 (예외 종류별)', ('type',)
+)
+
+# OpenAI 호출 스케줄러 (분당 요청/토큰 한도, 우선순위 대기열, 429 재시도, 동일 프롬프트 합치기)
+llm_scheduler = get_llm_scheduler(
+    requests_per_minute=int(os.environ.get('LLM_REQUESTS_PER_MINUTE', 0)),
+    tokens_per_minute=int(os.environ.get('LLM_TOKENS_PER_MINUTE', 0)),
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', 64)),
+    max_queue_size=int(os.environ.get('LLM_MAX_QUEUE_SIZE', 1000)),
+    max_wait_seconds=float(os.environ.get('LLM_MAX_WAIT_SECONDS', 30)),
+    max_retries=int(os.environ.get('LLM_MAX_RETRIES', 3))
+)
+
+# 대기열에서 먼저 처리할 감정 (위기에 가까운 고통)
+URGENT_EMOTIONS = {'고통', '자기비난'}
+
+# 대기열이 가득 찼을 때 안내 메시지
+BUSY_MESSAGE = '지금 부처님을 찾는 분이 많습니다. 잠시 후 다시 말씀해주세요.'
+
+# 세션에 설정한 API 키의 클라이언트를 이 워커가 갖고 있지 않을 때 안내 메시지
+API_KEY_RESET_MESSAGE = 'API 키를 다시 설정해주세요 (서버에 설정한 키가 남아 있지 않습니다)'
+
+# 프롬프트에 넣을 Few-shot 예시 수와 토큰 예산
+FEW_SHOT_MAX_EXAMPLES = int(os.environ.get('FEW_SHOT_MAX_EXAMPLES', 2))
+FEW_SHOT_TOKEN_BUDGET = int(os.environ.get('FEW_SHOT_TOKEN_BUDGET', 900))
+
+# SSE 응답 헤더 (캐시/프록시 버퍼링 방지)
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+# 대화 맥락에 넣을 관련 가르침 수
+TEACHING_TOP_K = int(os.environ.get('TEACHING_TOP_K', 2))
+
+# 위기 상황 안내 메시지
+CRISIS_RESPONSE = """
+제자여, 당신이 지금 매우 깊은 고통 속에 있다는 것이 느껴집니다.
 
-# 감정 트래커 및 데이터 로거 초기화
-emotion_tracker = get_tracker()
-data_logger = get_logger(consent_required=True)
+이런 때는 혼자 견디지 마세요. 전문가의 도움이 필요합니다:
+
+• 자살예방상담전화: 1393 (24시간)
+• 정신건강위기상담: 1577-0199 (24시간)
+• 희망의 전화: 129 (24시간)
+
+당신의 생명은 무한히 소중합니다. 지금 당장 위 번호로 전화해주세요.
+당신은 혼자가 아닙니다. 🙏
+""".strip()
+
+@app.before_request
+def _start_request_timer():
+    """요청 처리 시간 측정 시작"""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    """요청 수와 처리 시간 기록 (경로는 URL 규칙 기준으로 묶음)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_latency.observe(time.perf_counter() - started, endpoint)
+        request_count.inc(endpoint, request.method, str(response.status_code))
+    return response
 
 @app.route('/')
 def index():
@@ -39,173 +251,201 @@ def index():
 
 @app.route('/api/setup', methods=['POST'])
 def setup_api():
-    """OpenAI API 키 설정 (서버 환경 변수로 관리 권장)"""
-    global openai_client
+    """OpenAI API 키 설정 (서버 환경 변수 OPENAI_API_KEY로 관리 권장)"""
     data = request.get_json()
     api_key = data.get('api_key')
 
     if not api_key:
         return jsonify({'error': 'API 키가 필요합니다'}), 400
 
-    try:
-        # OpenAI 클라이언트 설정
-        openai_client = openai.OpenAI(api_key=api_key)
-
-        # 간단한 테스트 요청
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": "안녕"}],
-            max_tokens=10
-        )
+    # 모델 목록 조회로 키 확인 (응답 생성 비용 없음, 결과는 키별로 캐시)
+    valid, error = validate_api_key(api_key)
+    if not valid:
+        return jsonify({'error': f'API 키 설정 실패: {error}'}), 400
 
-        # 세션에 플래그만 저장 (API 키는 저장하지 않음 - 보안)
-        session['api_configured'] = True
+    # 세션에는 키 해시만 저장 (API 키는 저장하지 않음 - 보안)
+    get_client(api_key)
+    session['api_key_hash'] = api_key_hash(api_key)
+    session['api_configured'] = True
 
-        return jsonify({'message': 'API 키가 성공적으로 설정되었습니다'})
-
-    except Exception as e:
-        return jsonify({'error': f'API 키 설정 실패: {str(e)}'}), 400
+    return jsonify({'message': 'API 키가 성공적으로 설정되었습니다'})
 
 @app.route('/api/chat', methods=['POST'])
+@profiler.sampled('chat')
 def chat():
     """부처님과의 대화 (일반 응답)"""
-    global openai_client
-
-    if not openai_client:
-        return jsonify({'error': 'API 키를 먼저 설정해주세요'}), 400
-
     data = request.get_json()
     user_message = data.get('message')
-    conversation_history = data.get('history', [])
-    user_id = data.get('user_id', 'anonymous')
 
     if not user_message:
         return jsonify({'error': '메시지가 필요합니다'}), 400
 
-    try:
-        # 세션 정보
-        session_id = session.get('session_id', str(uuid.uuid4()))
-        session['conversation_turn'] = session.get('conversation_turn', 0) + 1
-
-        # 감정 분석
-        emotion_result = emotion_tracker.analyze_emotion(user_message)
+    # 위기 상황 감지 (API 키가 없어도 안내 응답은 바로 전달)
+    crisis = _detect_crisis(data, '/api/chat')
+    if crisis is not None:
+        return jsonify(crisis)
 
-        # 위기 상황 감지
-        if emotion_result.get('needs_crisis_support'):
-            crisis_response = """
-제자여, 당신이 지금 매우 깊은 고통 속에 있다는 것이 느껴집니다.
+    openai_client = _get_openai_client()
+    if openai_client is None:
+        return jsonify({'error': _missing_client_message()}), 400
 
-이런 때는 혼자 견디지 마세요. 전문가의 도움이 필요합니다:
-
-• 자살예방상담전화: 1393 (24시간)
-• 정신건강위기상담: 1577-0199 (24시간)
-• 희망의 전화: 129 (24시간)
-
-당신의 생명은 무한히 소중합니다. 지금 당장 위 번호로 전화해주세요.
-당신은 혼자가 아닙니다. 🙏
-            """
-            return jsonify({
-                'message': crisis_response.strip(),
-                'timestamp': str(datetime.now()),
-                'emotion': emotion_result,
-                'crisis_alert': True
-            })
-
-        # 대화 맥락 구성
-        context = _build_context(conversation_history, emotion_result)
-
-        # 시스템 프롬프트 생성 (Few-shot 포함)
-        system_prompt = get_system_prompt(context=context, include_few_shot=True)
-
-        # 메시지 구성
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
-
-        # OpenAI API 호출
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=800,
-            temperature=0.8,
-            presence_penalty=0.6,
-            frequency_penalty=0.3
+    try:
+        # 세션 정보, 감정 분석, 프롬프트 구성
+        turn = _start_chat_turn(data)
+
+        # 자주 들어오는 첫 고민은 캐시된 응답 사용
+        cached_response = _get_cached_response(turn)
+        if cached_response is not None:
+            return _finish_chat_turn(turn, cached_response, cached=True)
+
+        # OpenAI API 호출 (스케줄러 대기열을 거쳐 한도 안에서, 같은 프롬프트는 한 번만)
+        response = llm_scheduler.call(
+            lambda: _create_completion(openai_client, turn['messages']),
+            priority=turn['priority'],
+            tokens=turn['reserved_tokens'],
+            coalesce_key=_coalesce_key(openai_client.api_key, turn['messages'])
         )
 
-        buddha_response = response.choices[0].message.content
-
-        # 데이터 로깅 (사용자 동의 시)
-        if data_logger.check_consent(user_id):
-            data_logger.log_conversation(
-                user_id=user_id,
-                session_id=session_id,
-                user_message=user_message,
-                buddha_response=buddha_response,
-                detected_emotions=emotion_result.get('all_emotions', []),
-                conversation_turn=session['conversation_turn']
-            )
+        return _finish_chat_turn(turn, response.choices[0].message.content)
 
-        return jsonify({
-            'message': buddha_response,
-            'timestamp': str(datetime.now()),
-            'emotion': emotion_result,
-            'meditation_suggestion': emotion_tracker.suggest_meditation()
-        })
+    except SchedulerBusy:
+        chat_errors.inc('SchedulerBusy')
+        return jsonify({'error': BUSY_MESSAGE}), 503
 
     except Exception as e:
+        chat_errors.inc(type(e).__name__)
         print(f"Error in chat: {str(e)}")
         return jsonify({'error': f'대화 생성 실패: {str(e)}'}), 500
 
 @app.route('/api/chat/stream', methods=['POST'])
 def chat_stream():
-    """스트리밍 응답 (실시간 타이핑 효과)"""
-    global openai_client
-
-    if not openai_client:
-        return jsonify({'error': 'API 키를 먼저 설정해주세요'}), 400
-
+    """스트리밍 응답 (실시간 타이핑 효과, /api/chat과 같은 처리 단계)"""
     data = request.get_json()
     user_message = data.get('message')
-    conversation_history = data.get('history', [])
 
     if not user_message:
         return jsonify({'error': '메시지가 필요합니다'}), 400
 
-    def generate():
-        try:
-            # 감정 분석
-            emotion_result = emotion_tracker.analyze_emotion(user_message)
-
-            # 맥락 구성
-            context = _build_context(conversation_history, emotion_result)
-            system_prompt = get_system_prompt(context=context, include_few_shot=True)
-
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ]
-
-            # 스트리밍 응답
-            stream = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                max_tokens=800,
-                temperature=0.8,
-                stream=True
-            )
+    # 위기 상황 감지 (안내 응답을 done 프레임 하나로 바로 전달)
+    crisis = _detect_crisis(data, '/api/chat/stream')
+    if crisis is not None:
+        return Response(
+            sse_event({'done': True, **crisis}),
+            mimetype='text/event-stream',
+            headers=SSE_HEADERS
+        )
 
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield f"data: {json.dumps({'content': chunk.choices[0].delta.content})}\n\n"
+    openai_client = _get_openai_client()
+    if openai_client is None:
+        return jsonify({'error': _missing_client_message()}), 400
 
-            # 완료 신호
-            yield f"data: {json.dumps({'done': True, 'emotion': emotion_result})}\n\n"
+    try:
+        # 세션 정보, 감정 분석, 프롬프트 구성 (세션 쿠키가 응답 헤더에 실리도록 본문 전에 처리)
+        turn = _start_chat_turn(data)
+    except Exception as e:
+        chat_errors.inc(type(e).__name__)
+        print(f"Error in chat_stream: {str(e)}")
+        return jsonify({'error': f'대화 생성 실패: {str(e)}'}), 500
 
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    return Response(
+        stream_with_context(_generate_chat_stream(turn, openai_client)),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
+def _generate_chat_stream(turn, openai_client):
+    """
+    /api/chat/stream 본문 생성기
+
+    Args:
+        turn: _start_chat_turn 결과
+        openai_client: 응답을 생성할 OpenAI 클라이언트
+
+    Yields:
+        str: SSE 프레임 (content 조각들 → done 또는 error)
+    """
+    # 헤더를 바로 내보내 연결을 확정 (첫 토큰 전에도 프록시가 연결을 유지)
+    yield sse_comment("connected")
+
+    # 자주 들어오는 첫 고민은 캐시된 응답 사용
+    cached_response = _get_cached_response(turn)
+    if cached_response is not None:
+        yield sse_event({'content': cached_response})
+        yield sse_event({'done': True, **_record_chat_turn(turn, cached_response, cached=True)})
+        return
+
+    stream = None
+    ticket = None
+    usage = None
+    upstream_started = None
+    outcome = 'failed'
+    response_parts = []
+    stream_stats.start()
+
+    def open_upstream():
+        # 대기열에서 기다린 시간은 빼고 OpenAI 요청 시점부터 측정 (재시도하면 마지막 시도 기준)
+        nonlocal upstream_started
+        upstream_started = time.perf_counter()
+        return openai_client.chat.completions.create(
+            messages=turn['messages'],
+            stream=True,
+            **STREAM_COMPLETION_OPTIONS
+        )
 
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+    try:
+        # 스케줄러 대기열을 거쳐 스트림 시작 (스트림이 끝날 때까지 실행 권한 유지)
+        stream, ticket = llm_scheduler.open_stream(
+            open_upstream,
+            priority=turn['priority'],
+            tokens=turn['reserved_tokens']
+        )
+
+        coalescer = DeltaCoalescer(STREAM_COALESCE_SECONDS, STREAM_COALESCE_BYTES)
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if not content:
+                continue
+            if not response_parts:
+                stage_latency.observe(time.perf_counter() - upstream_started, 'first_token')
+            response_parts.append(content)
+            text = coalescer.add(content)
+            if text:
+                yield sse_event({'content': text})
+        outcome = 'completed'
+        stage_latency.observe(time.perf_counter() - upstream_started, 'upstream')
+        _record_usage(usage)
+
+        text = coalescer.flush()
+        if text:
+            yield sse_event({'content': text})
+
+        # 완료 신호 (대화 저장, 캐시, 로깅 후 감정/명상 추천 전달)
+        yield sse_event({'done': True, **_record_chat_turn(turn, ''.join(response_parts))})
+
+    except GeneratorExit:
+        # 클라이언트가 연결을 끊음 (프레임 쓰기에 실패하면 서버가 생성기를 닫음)
+        if outcome != 'completed':
+            outcome = 'aborted'
+        raise
+
+    except SchedulerBusy:
+        chat_errors.inc('SchedulerBusy')
+        yield sse_event({'error': BUSY_MESSAGE})
+
+    except Exception as e:
+        chat_errors.inc(type(e).__name__)
+        print(f"Error in chat_stream: {str(e)}")
+        yield sse_event({'error': f'대화 생성 실패: {str(e)}'})
+
+    finally:
+        # OpenAI 스트림을 바로 닫아 남은 토큰 생성을 멈춤
+        if stream is not None:
+            stream.close()
+        if ticket is not None:
+            llm_scheduler.release(ticket, _used_tokens(turn, usage, len(response_parts)))
+        stream_stats.record(outcome, len(response_parts))
 
 @app.route('/api/consent', methods=['POST'])
 def save_consent():
@@ -233,6 +473,7 @@ def save_consent():
 def get_session_summary():
     """현재 세션 요약 정보"""
     try:
+        emotion_tracker = _get_emotion_tracker()
         summary = emotion_tracker.get_session_summary()
         meditation = emotion_tracker.suggest_meditation()
 
@@ -253,11 +494,54 @@ def get_analytics():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """응답 캐시 적중/미스 지표 (관리자용)"""
+    if response_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(response_cache.stats(), enabled=True))
+
+@app.route('/api/stream/stats')
+def get_stream_stats_route():
+    """스트리밍 응답 지표 (관리자용, 중단된 스트림과 아낀 토큰 추정치)"""
+    return jsonify(stream_stats.stats())
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus 지표 (워커가 여러 개면 모든 워커의 합계)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/profiling', methods=['GET', 'POST'])
+def profiling_admin():
+    """표본 프로파일링 요약 조회(GET)와 켜기/끄기, 표본 비율 변경(POST) - 관리자 전용"""
+    if not _is_admin():
+        return jsonify({'error': '권한이 없습니다'}), 403
+
+    try:
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            return jsonify(profiler.configure(
+                enabled=data.get('enabled'),
+                sample_rate=data.get('sample_rate')
+            ))
+
+        return jsonify(profiler.summary(
+            limit=request.args.get('limit', 20, type=int),
+            sort=request.args.get('sort', 'cumulative')
+        ))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/scheduler/stats')
+def get_scheduler_stats():
+    """OpenAI 호출 스케줄러 지표 (관리자용, 대기열 길이와 대기 시간)"""
+    return jsonify(llm_scheduler.stats())
+
 @app.route('/api/status')
 def status():
     """API 상태 확인"""
     return jsonify({
-        'api_configured': openai_client is not None,
+        'api_configured': _get_openai_client() is not None,
         'status': 'active',
         'session_id': session.get('session_id', None),
         'data_consent': session.get('data_consent', False)
@@ -289,19 +573,228 @@ def daily_meditation():
 
     return jsonify(meditations[day_index])
 
-def _build_context(conversation_history, emotion_result):
+def _start_chat_turn(data):
+    """
+    대화 한 턴의 공통 준비 단계 (동기/비동기 서빙 모드 공용)
+
+    Args:
+        data: 요청 JSON (message, user_id - 이전 대화는 서버의 대화 상태 저장소에서 조회)
+
+    Returns:
+        dict: 세션/감정 정보와 OpenAI에 보낼 메시지
+    """
+    user_message = data.get('message')
+
+    # 세션 정보
+    session_id = _get_session_id()
+    session['conversation_turn'] = session.get('conversation_turn', 0) + 1
+    emotion_tracker = tracker_registry.get(session_id)
+
+    # 감정 분석
+    with stage_latency.time('analyze'):
+        emotion_result = emotion_tracker.analyze_emotion(user_message)
+
+    turn = {
+        'user_message': user_message,
+        'user_id': data.get('user_id', 'anonymous'),
+        'session_id': session_id,
+        'conversation_turn': session['conversation_turn'],
+        'emotion_tracker': emotion_tracker,
+        'emotion_result': emotion_result,
+        'messages': None,
+        'cache_key': None,
+        'priority': _request_priority(emotion_result, session['conversation_turn']),
+        'prompt_tokens': 0,
+        'reserved_tokens': 0
+    }
+
+    history = conversation_store.get_turns(session_id)
+    turn['messages'] = _build_messages(
+        user_message, history, emotion_result, emotion_tracker, session_id
+    )
+
+    # 스케줄러 토큰 예약량 (프롬프트 + 최대 응답 길이, 끝나면 실제 사용량으로 정산)
+    turn['prompt_tokens'] = count_message_tokens(turn['messages'])
+    turn['reserved_tokens'] = turn['prompt_tokens'] + CHAT_COMPLETION_OPTIONS['max_tokens']
+
+    # 이전 대화 맥락이 없는 첫 턴만 캐시 (이후 턴의 응답은 대화마다 달라야 함)
+    if response_cache is not None and not history:
+        turn['cache_key'] = response_cache.key_for(
+            user_message, emotion_result.get('primary_emotion')
+        )
+
+    return turn
+
+def _request_priority(emotion_result, conversation_turn):
+    """
+    스케줄러 우선순위 (고통이 큰 메시지 → 이어지는 대화 → 새 대화)
+
+    Args:
+        emotion_result: 감정 분석 결과
+        conversation_turn: 세션의 대화 턴 번호 (1부터)
+
+    Returns:
+        int: PRIORITY_* 값
+    """
+    if (
+        emotion_result.get('primary_emotion') in URGENT_EMOTIONS
+        or (emotion_result.get('intensity') == 'high' and emotion_result.get('valence') == 'negative')
+    ):
+        return PRIORITY_URGENT
+    if conversation_turn > 1:
+        return PRIORITY_RETURNING
+    return PRIORITY_NORMAL
+
+def _coalesce_key(api_key, messages):
+    """동시에 들어온 같은 프롬프트를 한 번의 호출로 합치기 위한 키 (키가 다르면 합치지 않음)"""
+    payload = json.dumps([api_key_hash(api_key), messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _detect_crisis(data, endpoint):
+    """
+    위기 표현 빠른 감지 (감정 분석, 대화 상태 조회, 프롬프트 구성 전에 수행)
+
+    Args:
+        data: 요청 JSON (message, user_id)
+        endpoint: 요청 경로 (감사 기록용)
+
+    Returns:
+        dict: 위기 상황 안내 응답 필드 (위기 표현이 없으면 None)
+    """
+    user_message = data.get('message')
+    keywords = crisis_detector.detect(user_message)
+    if not keywords:
+        return None
+
+    # 감사 기록은 백그라운드에서 기록 (메시지 원문은 남기지 않음)
+    crisis_audit_log.record(
+        session_id=_get_session_id(),
+        user_id=data.get('user_id', 'anonymous'),
+        endpoint=endpoint,
+        keywords=keywords,
+        message_length=len(user_message)
+    )
+
+    return {
+        'message': CRISIS_RESPONSE,
+        'timestamp': str(datetime.now()),
+        'emotion': {'needs_crisis_support': True, 'crisis_keywords': keywords},
+        'crisis_alert': True
+    }
+
+def _get_cached_response(turn):
+    """캐시된 응답 반환 (캐시 대상이 아니거나 미스면 None)"""
+    if turn['cache_key'] is None:
+        return None
+    cached_response, _ = response_cache.get(turn['cache_key'])
+    cache_lookups.inc('response', 'miss' if cached_response is None else 'hit')
+    return cached_response
+
+def _create_completion(openai_client, messages):
+    """OpenAI 일반 응답 생성 (왕복 시간과 토큰 사용량 기록)"""
+    with stage_latency.time('upstream'):
+        response = openai_client.chat.completions.create(messages=messages, **CHAT_COMPLETION_OPTIONS)
+    _record_usage(response.usage)
+    return response
+
+def _record_usage(usage):
+    """OpenAI 응답의 토큰 사용량을 지표에 반영"""
+    if usage is None:
+        return
+    openai_tokens.inc('prompt', amount=usage.prompt_tokens)
+    openai_tokens.inc('completion', amount=usage.completion_tokens)
+
+def _used_tokens(turn, usage, chunks):
+    """스케줄러에 정산할 토큰 수 (usage가 없으면 프롬프트 추정치 + 받은 조각 수)"""
+    if usage is not None:
+        return usage.total_tokens
+    return turn['prompt_tokens'] + chunks
+
+def _finish_chat_turn(turn, buddha_response, cached=False):
+    """
+    응답 생성 이후 공통 처리 후 JSON 응답 구성
+
+    Args:
+        turn: _start_chat_turn 결과
+        buddha_response: 부처님 응답 텍스트
+        cached: 캐시에서 가져온 응답인지 여부
+
+    Returns:
+        Response: JSON 응답
+    """
+    return jsonify({'message': buddha_response, **_record_chat_turn(turn, buddha_response, cached)})
+
+def _record_chat_turn(turn, buddha_response, cached=False):
+    """
+    응답 생성 이후 공통 처리 (대화 상태 저장, 캐시 저장, 데이터 로깅)
+
+    Args:
+        turn: _start_chat_turn 결과
+        buddha_response: 부처님 응답 텍스트
+        cached: 캐시에서 가져온 응답인지 여부
+
+    Returns:
+        dict: 응답 본문 외의 응답 필드 (시각, 감정, 명상 추천, 캐시 여부)
+    """
+    # 다음 턴 맥락을 위해 대화 저장
+    with stage_latency.time('store'):
+        conversation_store.append_turn(turn['session_id'], turn['user_message'], buddha_response)
+
+    # 새로 생성한 첫 턴 응답은 캐시에 저장
+    if turn['cache_key'] is not None and not cached:
+        response_cache.put(turn['cache_key'], buddha_response)
+
+    # 데이터 로깅 (사용자 동의 시)
+    with stage_latency.time('logging'):
+        if data_logger.check_consent(turn['user_id']):
+            data_logger.log_conversation(
+                user_id=turn['user_id'],
+                session_id=turn['session_id'],
+                user_message=turn['user_message'],
+                buddha_response=buddha_response,
+                detected_emotions=turn['emotion_result'].get('all_emotions', []),
+                conversation_turn=turn['conversation_turn']
+            )
+
+    return {
+        'timestamp': str(datetime.now()),
+        'emotion': turn['emotion_result'],
+        'meditation_suggestion': turn['emotion_tracker'].suggest_meditation(),
+        'cached': cached
+    }
+
+def _build_messages(user_message, conversation_history, emotion_result, emotion_tracker, session_id=None):
+    """OpenAI에 보낼 메시지 구성 (시스템 프롬프트 + 최근 대화 턴 + 사용자 메시지)"""
+    with stage_latency.time('context_build'):
+        # 최근 턴은 원문 메시지로, 오래된 턴은 세션별 요약으로 (토큰 예산 내)
+        history_messages, history_summary = history_compactor.compact(conversation_history, session_id)
+
+        # 대화 맥락 구성
+        context = _build_context(history_summary, emotion_result, emotion_tracker, user_message)
+
+    with stage_latency.time('prompt_render'):
+        # 시스템 프롬프트 생성 (메시지/감정에 맞는 Few-shot 예시만 포함)
+        few_shot_examples = select_few_shot_examples(
+            user_message,
+            emotion_result,
+            max_examples=FEW_SHOT_MAX_EXAMPLES,
+            token_budget=FEW_SHOT_TOKEN_BUDGET
+        )
+        system_prompt = get_system_prompt(context=context, few_shot_examples=few_shot_examples)
+
+    return (
+        [{"role": "system", "content": system_prompt}]
+        + history_messages
+        + [{"role": "user", "content": user_message}]
+    )
+
+def _build_context(history_summary, emotion_result, emotion_tracker, user_message=""):
     """대화 맥락 구성"""
     context_parts = []
 
-    # 최근 대화 요약
-    if conversation_history:
-        recent = conversation_history[-3:]
-        context_parts.append(
-            "최근 대화: " + " | ".join([
-                f"사용자: {h['user'][:50]}... 부처님: {h['buddha'][:50]}..."
-                for h in recent
-            ])
-        )
+    # 메시지로 보내지 않은 이전 대화 요약
+    if history_summary:
+        context_parts.append(f"이전 대화 요약: {history_summary}")
 
     # 감정 정보
     if emotion_result:
@@ -311,13 +804,21 @@ def _build_context(conversation_history, emotion_result):
         )
 
     # 세션 정보
-    session_summary = emotion_tracker.get_session_summary()
+    session_summary = emotion_tracker.get_session_summary(include_progression=False)
     if session_summary['total_messages'] > 1:
         context_parts.append(
             f"세션 주요 감정: {session_summary.get('dominant_emotion', '중립')} "
             f"(총 {session_summary['total_messages']}번 대화)"
         )
 
+    # 메시지와 관련된 가르침 (감정 이름도 검색어로 사용)
+    query = user_message
+    if emotion_result and emotion_result.get('primary_emotion', '중립') != '중립':
+        query = f"{user_message} {emotion_result['primary_emotion']}"
+    teachings = get_relevant_teaching(query, top_k=TEACHING_TOP_K)
+    if teachings:
+        context_parts.append("참고할 가르침: " + " / ".join(teachings))
+
     return " | ".join(context_parts) if context_parts else "새로운 대화 시작"
 
 if __name__ == '__main__':
@@ -0,0 +1,427 @@
+"""
+비동기(ASGI) 서빙 모드
+/api/chat, /api/chat/stream 은 AsyncOpenAI로 처리해 한 워커가 여러 대화를 동시에 다루고,
+나머지 경로는 기존 Flask 앱에 그대로 위임
+
+대화 상태 저장소(SQLite 등)와 데이터 로깅을 건드리는 턴 준비/기록 단계는 스레드 풀에서 실행해
+이벤트 루프를 막지 않음 (요청 컨텍스트는 asyncio.to_thread가 복사해 넘기므로 세션을 그대로 사용)
+
+실행 예시:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 2
+"""
+
+import asyncio
+import io
+import sys
+import time
+
+from flask import Response, jsonify, request
+
+import app as buddha_app
+from openai_clients import close_async_clients, get_async_client
+from llm_scheduler import SchedulerBusy
+from sse import ClientDisconnected, DeltaCoalescer, sse_comment, sse_event
+
+flask_app = buddha_app.app
+
+
+async def _read_body(receive):
+    """ASGI 요청 본문 전체 읽기"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+def _build_environ(scope, body):
+    """
+    ASGI scope를 WSGI environ으로 변환 (Flask 요청/세션 처리를 그대로 재사용하기 위함)
+
+    Args:
+        scope: ASGI HTTP scope
+        body: 요청 본문
+
+    Returns:
+        dict: WSGI environ
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+
+    for name, value in scope['headers']:
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        if key in environ:
+            value = f"{environ[key]},{value}"
+        environ[key] = value
+
+    return environ
+
+
+def _encode_headers(response):
+    """Flask 응답 헤더를 ASGI 형식으로 변환"""
+    return [
+        (name.lower().encode('latin1'), value.encode('latin1'))
+        for name, value in response.headers.items()
+    ]
+
+
+async def _send_response(send, response):
+    """완성된 Flask 응답 전송"""
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': _encode_headers(response)
+    })
+    await send({'type': 'http.response.body', 'body': response.get_data()})
+
+
+async def _handle_wsgi(scope, receive, send):
+    """
+    나머지 경로를 Flask 앱에 위임
+    앱을 스레드 풀에서 실행해 응답 전체를 받은 뒤 전송 (동시 요청이 몰려도 이벤트 루프를 막지 않음)
+    """
+    environ = _build_environ(scope, await _read_body(receive))
+    response = await asyncio.to_thread(Response.from_app, flask_app, environ, True)
+    await _send_response(send, response)
+
+
+def _async_client():
+    """
+    현재 요청의 키(세션에서 설정한 키 또는 환경 변수 키)로 공유 AsyncOpenAI 클라이언트 반환
+
+    Returns:
+        openai.AsyncOpenAI: 비동기 클라이언트 (설정된 키가 없으면 None)
+    """
+    client = buddha_app._get_openai_client()
+    return get_async_client(client.api_key) if client is not None else None
+
+
+@buddha_app.profiler.sampled('chat')
+async def chat():
+    """부처님과의 대화 (일반 응답, 비동기)"""
+    data = request.get_json()
+    user_message = data.get('message')
+
+    if not user_message:
+        return jsonify({'error': '메시지가 필요합니다'}), 400
+
+    crisis = buddha_app._detect_crisis(data, '/api/chat')
+    if crisis is not None:
+        return jsonify(crisis)
+
+    client = _async_client()
+    if client is None:
+        return jsonify({'error': buddha_app._missing_client_message()}), 400
+
+    try:
+        turn = await asyncio.to_thread(buddha_app._start_chat_turn, data)
+
+        cached_response = buddha_app._get_cached_response(turn)
+        if cached_response is not None:
+            return await asyncio.to_thread(buddha_app._finish_chat_turn, turn, cached_response, cached=True)
+
+        response = await buddha_app.llm_scheduler.acall(
+            lambda: _create_completion(client, turn['messages']),
+            priority=turn['priority'],
+            tokens=turn['reserved_tokens'],
+            coalesce_key=buddha_app._coalesce_key(client.api_key, turn['messages'])
+        )
+
+        return await asyncio.to_thread(buddha_app._finish_chat_turn, turn, response.choices[0].message.content)
+
+    except SchedulerBusy:
+        buddha_app.chat_errors.inc('SchedulerBusy')
+        return jsonify({'error': buddha_app.BUSY_MESSAGE}), 503
+
+    except Exception as e:
+        buddha_app.chat_errors.inc(type(e).__name__)
+        print(f"Error in chat: {str(e)}")
+        return jsonify({'error': f'대화 생성 실패: {str(e)}'}), 500
+
+
+async def _create_completion(client, messages):
+    """OpenAI 일반 응답 생성 (왕복 시간과 토큰 사용량 기록 - buddha_app._create_completion의 비동기판)"""
+    started = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(
+            messages=messages,
+            **buddha_app.CHAT_COMPLETION_OPTIONS
+        )
+    finally:
+        buddha_app.stage_latency.observe(time.perf_counter() - started, 'upstream')
+    buddha_app._record_usage(response.usage)
+    return response
+
+
+async def _handle_chat(scope, receive, send):
+    """POST /api/chat"""
+    environ = _build_environ(scope, await _read_body(receive))
+    with flask_app.request_context(environ):
+        # before_request 훅(요청 지표 등)은 Flask 경로와 똑같이 실행
+        response = flask_app.preprocess_request()
+        if response is None:
+            response = await chat()
+        response = flask_app.make_response(response)
+        response = flask_app.process_response(response)
+    await _send_response(send, response)
+
+
+async def _stream_chat_turn(turn, client, send_frame):
+    """
+    /api/chat/stream 본문 전송 (동기 모드의 buddha_app._generate_chat_stream과 같은 처리 단계)
+
+    Args:
+        turn: buddha_app._start_chat_turn 결과
+        client: 응답을 생성할 AsyncOpenAI 클라이언트
+        send_frame: SSE 프레임 전송 코루틴 함수
+    """
+    # 자주 들어오는 첫 고민은 캐시된 응답 사용
+    cached_response = buddha_app._get_cached_response(turn)
+    if cached_response is not None:
+        await send_frame(sse_event({'content': cached_response}))
+        record = await asyncio.to_thread(buddha_app._record_chat_turn, turn, cached_response, cached=True)
+        await send_frame(sse_event({'done': True, **record}))
+        return
+
+    stream = None
+    ticket = None
+    usage = None
+    upstream_started = None
+    outcome = 'failed'
+    response_parts = []
+    buddha_app.stream_stats.start()
+
+    def open_upstream():
+        # 대기열에서 기다린 시간은 빼고 OpenAI 요청 시점부터 측정
+        nonlocal upstream_started
+        upstream_started = time.perf_counter()
+        return client.chat.completions.create(
+            messages=turn['messages'],
+            stream=True,
+            **buddha_app.STREAM_COMPLETION_OPTIONS
+        )
+
+    try:
+        stream, ticket = await buddha_app.llm_scheduler.aopen_stream(
+            open_upstream,
+            priority=turn['priority'],
+            tokens=turn['reserved_tokens']
+        )
+
+        coalescer = DeltaCoalescer(buddha_app.STREAM_COALESCE_SECONDS, buddha_app.STREAM_COALESCE_BYTES)
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            if not content:
+                continue
+            if not response_parts:
+                buddha_app.stage_latency.observe(time.perf_counter() - upstream_started, 'first_token')
+            response_parts.append(content)
+            text = coalescer.add(content)
+            if text:
+                await send_frame(sse_event({'content': text}))
+        outcome = 'completed'
+        buddha_app.stage_latency.observe(time.perf_counter() - upstream_started, 'upstream')
+        buddha_app._record_usage(usage)
+
+        text = coalescer.flush()
+        if text:
+            await send_frame(sse_event({'content': text}))
+
+        # 완료 신호 (대화 저장, 캐시, 로깅 후 감정/명상 추천 전달)
+        record = await asyncio.to_thread(buddha_app._record_chat_turn, turn, ''.join(response_parts))
+        await send_frame(sse_event({'done': True, **record}))
+
+    except (asyncio.CancelledError, ClientDisconnected):
+        # 클라이언트가 연결을 끊음 (http.disconnect 수신으로 취소되었거나 프레임 쓰기 실패)
+        if outcome != 'completed':
+            outcome = 'aborted'
+        raise
+
+    except SchedulerBusy:
+        buddha_app.chat_errors.inc('SchedulerBusy')
+        await send_frame(sse_event({'error': buddha_app.BUSY_MESSAGE}))
+
+    except Exception as e:
+        buddha_app.chat_errors.inc(type(e).__name__)
+        print(f"Error in chat_stream: {str(e)}")
+        await send_frame(sse_event({'error': f'대화 생성 실패: {str(e)}'}))
+
+    finally:
+        # OpenAI 스트림을 바로 닫아 남은 토큰 생성을 멈춤
+        if stream is not None:
+            await stream.close()
+        if ticket is not None:
+            buddha_app.llm_scheduler.release(ticket, buddha_app._used_tokens(turn, usage, len(response_parts)))
+        buddha_app.stream_stats.record(outcome, len(response_parts))
+
+
+async def _wait_for_disconnect(receive):
+    """클라이언트 연결 끊김(http.disconnect)까지 대기"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _handle_chat_stream(scope, receive, send):
+    """POST /api/chat/stream (SSE, 비동기)"""
+    environ = _build_environ(scope, await _read_body(receive))
+    with flask_app.request_context(environ):
+        # before_request 훅(요청 지표 등)은 Flask 경로와 똑같이 실행
+        early_response = flask_app.preprocess_request()
+        if early_response is not None:
+            await _send_response(send, flask_app.process_response(flask_app.make_response(early_response)))
+            return
+
+        data = request.get_json()
+        user_message = data.get('message')
+
+        if not user_message:
+            error = jsonify({'error': '메시지가 필요합니다'}), 400
+            await _send_response(send, flask_app.process_response(flask_app.make_response(error)))
+            return
+
+        # 위기 상황 감지 (안내 응답을 done 프레임 하나로 바로 전달)
+        crisis = buddha_app._detect_crisis(data, '/api/chat/stream')
+        if crisis is not None:
+            reply = Response(
+                sse_event({'done': True, **crisis}),
+                mimetype='text/event-stream',
+                headers=buddha_app.SSE_HEADERS
+            )
+            await _send_response(send, flask_app.process_response(reply))
+            return
+
+        client = _async_client()
+        if client is None:
+            error = jsonify({'error': buddha_app._missing_client_message()}), 400
+            await _send_response(send, flask_app.process_response(flask_app.make_response(error)))
+            return
+
+        try:
+            # 세션 정보, 감정 분석, 프롬프트 구성
+            turn = await asyncio.to_thread(buddha_app._start_chat_turn, data)
+        except Exception as e:
+            buddha_app.chat_errors.inc(type(e).__name__)
+            print(f"Error in chat_stream: {str(e)}")
+            error = jsonify({'error': f'대화 생성 실패: {str(e)}'}), 500
+            await _send_response(send, flask_app.process_response(flask_app.make_response(error)))
+            return
+
+        # 세션 쿠키/CORS 헤더를 먼저 확정한 뒤 본문을 흘려보냄
+        headers = flask_app.process_response(
+            Response(mimetype='text/event-stream', headers=buddha_app.SSE_HEADERS)
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                header for header in _encode_headers(headers)
+                if header[0] != b'content-length'
+            ]
+        })
+
+        send_lock = asyncio.Lock()
+        last_write = time.monotonic()
+
+        async def send_frame(frame):
+            nonlocal last_write
+            async with send_lock:
+                try:
+                    await send({
+                        'type': 'http.response.body',
+                        'body': frame.encode('utf-8'),
+                        'more_body': True
+                    })
+                except OSError as e:
+                    raise ClientDisconnected() from e
+                last_write = time.monotonic()
+
+        async def send_heartbeats():
+            # 첫 토큰을 기다리는 동안에도 프록시가 연결을 끊지 않도록 주석 프레임 전송
+            interval = buddha_app.STREAM_HEARTBEAT_SECONDS
+            while True:
+                await asyncio.sleep(max(interval - (time.monotonic() - last_write), 0))
+                if time.monotonic() - last_write >= interval:
+                    await send_frame(sse_comment())
+
+        await send_frame(sse_comment("connected"))
+
+        producer = asyncio.create_task(_stream_chat_turn(turn, client, send_frame))
+        watchers = [asyncio.create_task(_wait_for_disconnect(receive))]
+        if buddha_app.STREAM_HEARTBEAT_SECONDS > 0:
+            watchers.append(asyncio.create_task(send_heartbeats()))
+        try:
+            # 생성이 끝나거나, 연결이 끊기거나, 하트비트 쓰기가 실패할 때까지 대기
+            await asyncio.wait([producer] + watchers, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # 클라이언트가 먼저 떠났으면 생성 작업을 취소 (finally에서 OpenAI 스트림을 닫음)
+            for task in [producer] + watchers:
+                task.cancel()
+            await asyncio.gather(producer, *watchers, return_exceptions=True)
+
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _handle_lifespan(receive, send):
+    """서버 시작/종료 이벤트 처리 (종료 시 커넥션 풀 정리)"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+# 비동기로 직접 처리하는 경로
+ASYNC_ROUTES = {
+    ('POST', '/api/chat'): _handle_chat,
+    ('POST', '/api/chat/stream'): _handle_chat_stream
+}
+
+
+async def application(scope, receive, send):
+    """ASGI 진입점"""
+    if scope['type'] == 'lifespan':
+        await _handle_lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http':
+        handler = ASYNC_ROUTES.get((scope['method'], scope['path']))
+        if handler is not None:
+            await handler(scope, receive, send)
+            return
+        await _handle_wsgi(scope, receive, send)
@@ -0,0 +1,89 @@
+"""
+벤치마크 결과 비교 (릴리스 간 성능 회귀 확인)
+두 결과(load_test.py / micro_bench.py 출력 JSON, 또는 --output JSON Lines 파일의 마지막 기록)의
+지연/처리량/오류 수를 비교해 기준보다 나빠진 항목을 출력하고, 있으면 종료 코드 1로 끝냄
+
+실행 예시:
+    python benchmarks/compare_results.py baseline.json current.json --threshold 0.15
+"""
+
+import argparse
+import json
+import sys
+
+# 값이 클수록 나쁜 지표 (지연, 오류)
+HIGHER_IS_WORSE = ("mean", "p50", "p95", "p99", "mean_us", "p50_us", "p95_us", "p99_us", "errors")
+
+# 값이 작을수록 나쁜 지표 (처리량)
+LOWER_IS_WORSE = ("requests_per_second",)
+
+
+def load_result(path):
+    """결과 파일 로드 (JSON 하나 또는 JSON Lines의 마지막 기록)"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(text.splitlines()[-1])
+
+
+def flatten(result, prefix=""):
+    """중첩된 결과를 {"a.b.c": 숫자} 형태로 펼침"""
+    metrics = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare(baseline, current, threshold):
+    """
+    지표별 변화율 계산
+
+    Args:
+        baseline: 기준 결과
+        current: 비교할 결과
+        threshold: 회귀로 볼 최소 변화율 (0.1 = 10%)
+
+    Returns:
+        list: (지표, 기준값, 현재값, 변화율, 회귀 여부)
+    """
+    before = flatten(baseline)
+    after = flatten(current)
+    rows = []
+    for name in sorted(before.keys() & after.keys()):
+        metric = name.rsplit(".", 1)[-1]
+        if metric not in HIGHER_IS_WORSE and metric not in LOWER_IS_WORSE:
+            continue
+        old, new = before[name], after[name]
+        change = (new - old) / old if old else (1.0 if new else 0.0)
+        if metric in HIGHER_IS_WORSE:
+            regressed = change > threshold
+        else:
+            regressed = change < -threshold
+        rows.append((name, old, new, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크 결과 비교")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="회귀로 볼 변화율 (기본 10%%)")
+    args = parser.parse_args()
+
+    rows = compare(load_result(args.baseline), load_result(args.current), args.threshold)
+    for name, old, new, change, regressed in rows:
+        marker = "회귀" if regressed else ""
+        print(f"{name:50s} {old:>12g} → {new:>12g} {change:+8.1%} {marker}")
+
+    if any(row[4] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
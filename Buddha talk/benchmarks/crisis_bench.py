@@ -0,0 +1,114 @@
+"""
+위기 표현 감지 지연과 재현율 측정
+고정 말뭉치(benchmarks/fixtures/crisis_corpus.jsonl)로 빠른 감지기(crisis_detector),
+정규화 없이 원문에서 같은 키워드를 찾는 방식, 감정 분석 전체 실행(EmotionTracker.analyze_emotion)을
+비교해 JSON으로 출력
+
+실행 예시:
+    python benchmarks/crisis_bench.py --repeat 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crisis_detector import CRISIS_KEYWORDS, get_crisis_detector
+from emotion_tracker import EmotionTracker
+from keyword_matcher import KeywordMatcher
+
+DEFAULT_CORPUS = Path(__file__).parent / "fixtures" / "crisis_corpus.jsonl"
+
+
+def percentile(values, fraction):
+    """정렬된 값에서 분위수 계산"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def load_corpus(path):
+    """말뭉치 로드 ({"text", "label"} JSON Lines)"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def measure(detect, corpus, repeat):
+    """
+    감지 함수의 호출당 지연(마이크로초)과 분류 정확도 측정
+
+    Args:
+        detect: 메시지를 받아 위기 여부를 돌려주는 함수
+        corpus: 말뭉치
+        repeat: 말뭉치 반복 횟수
+
+    Returns:
+        dict: 지연 분포, 재현율, 정밀도, 놓친 문장
+    """
+    latencies = []
+    for _ in range(repeat):
+        for sample in corpus:
+            start = time.perf_counter()
+            detect(sample['text'])
+            latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+
+    true_positive = false_positive = false_negative = 0
+    missed = []
+    false_alarms = []
+    for sample in corpus:
+        predicted = bool(detect(sample['text']))
+        if predicted and sample['label']:
+            true_positive += 1
+        elif predicted:
+            false_positive += 1
+            false_alarms.append(sample['text'])
+        elif sample['label']:
+            false_negative += 1
+            missed.append(sample['text'])
+
+    return {
+        'mean_us': round(sum(latencies) / len(latencies), 2),
+        'p50_us': round(percentile(latencies, 0.50), 2),
+        'p99_us': round(percentile(latencies, 0.99), 2),
+        'recall': round(true_positive / ((true_positive + false_negative) or 1), 4),
+        'precision': round(true_positive / ((true_positive + false_positive) or 1), 4),
+        'missed': missed,
+        'false_alarms': false_alarms
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    detector = get_crisis_detector()
+
+    # 띄어쓰기/문장부호 정규화 없이 원문에서 키워드 찾기
+    raw_matcher = KeywordMatcher((keyword, keyword) for keyword in CRISIS_KEYWORDS)
+    # 기존 경로: 세션 트래커로 감정 분석 전체를 실행한 뒤 위기 여부 확인 (앱 기본 세션당 기록 상한)
+    tracker = EmotionTracker(max_entries=200)
+
+    def legacy_detect(message):
+        return tracker.analyze_emotion(message)['needs_crisis_support']
+
+    print(json.dumps({
+        'samples': len(corpus),
+        'positives': sum(1 for sample in corpus if sample['label']),
+        'repeat': args.repeat,
+        'crisis_detector': measure(detector.detect, corpus, args.repeat),
+        'raw_text_match': measure(raw_matcher.find, corpus, args.repeat),
+        'analyze_emotion': measure(legacy_detect, corpus, args.repeat)
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+가짜 OpenAI 서버 (오프라인 벤치마크용)
+chat.completions (일반/스트리밍)과 models 목록을 흉내내며 지연 시간과 토큰 속도를 조절 가능
+
+실행 예시:
+    python benchmarks/fake_openai_server.py --port 8900 --latency 1.5 --tokens 200 --token-rate 80
+    python benchmarks/fake_openai_server.py --port 8900 --max-concurrency 8   # 동시 요청 8개 초과 시 429
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 uvicorn asgi:application --port 5000
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 응답에 반복해서 쓸 토큰 조각
+FAKE_TOKENS = ["제자여, ", "지금 ", "이 순간 ", "숨을 ", "고르게 ", "쉬어 ", "보세요. "]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """OpenAI REST API 일부를 흉내내는 요청 핸들러"""
+
+    protocol_version = "HTTP/1.1"
+
+    # 서버 설정 (main에서 채움)
+    latency = 1.0
+    tokens = 100
+    token_rate = 50.0
+    max_concurrency = 0
+
+    # 처리 중인 응답 생성 요청 수 (max_concurrency를 넘으면 429)
+    in_flight = 0
+    in_flight_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        """요청 로그 생략 (벤치마크 중 출력 최소화)"""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": "gpt-4o", "object": "model", "created": 0, "owned_by": "fake"}]
+            })
+            return
+        self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+
+        request = self._read_json()
+        completion_tokens = min(self.tokens, request.get("max_tokens") or self.tokens)
+        prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", [])) // 2
+
+        cls = type(self)
+        with cls.in_flight_lock:
+            if cls.max_concurrency and cls.in_flight >= cls.max_concurrency:
+                rejected = True
+            else:
+                rejected = False
+                cls.in_flight += 1
+        if rejected:
+            self._send_rate_limited()
+            return
+
+        try:
+            if request.get("stream"):
+                self._stream_completion(request, prompt_tokens, completion_tokens)
+            else:
+                self._completion(request, prompt_tokens, completion_tokens)
+        finally:
+            with cls.in_flight_lock:
+                cls.in_flight -= 1
+
+    def _send_rate_limited(self):
+        """사용량 한도 초과 응답 (OpenAI 429 형식)"""
+        body = json.dumps({
+            "error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+        }).encode("utf-8")
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _completion(self, request, prompt_tokens, completion_tokens):
+        """일반 응답: 첫 토큰 지연 + 전체 토큰 생성 시간만큼 기다린 뒤 한 번에 반환"""
+        time.sleep(self.latency + completion_tokens / self.token_rate)
+        content = "".join(FAKE_TOKENS[i % len(FAKE_TOKENS)] for i in range(completion_tokens))
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    def _stream_completion(self, request, prompt_tokens, completion_tokens):
+        """스트리밍 응답: 첫 토큰 지연 후 token_rate 속도로 SSE 청크 전송 (include_usage면 마지막에 usage 청크)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = request.get("model", "gpt-4o")
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        try:
+            time.sleep(self.latency)
+            self._write_event(chunk({"role": "assistant", "content": ""}))
+            for i in range(completion_tokens):
+                self._write_event(chunk({"content": FAKE_TOKENS[i % len(FAKE_TOKENS)]}))
+                time.sleep(1 / self.token_rate)
+            self._write_event(chunk({}, "stop"))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self._write_event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                })
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 스트림을 끊음
+            self.close_connection = True
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """동시 연결 수백 개를 받을 수 있도록 backlog를 늘린 서버"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 OpenAI 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=1.0, help="첫 토큰까지 지연 (초)")
+    parser.add_argument("--tokens", type=int, default=100, help="응답 토큰 수")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="초당 생성 토큰 수")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="동시 요청 한도 (넘으면 429, 0이면 무제한)")
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.latency = args.latency
+    FakeOpenAIHandler.tokens = args.tokens
+    FakeOpenAIHandler.token_rate = args.token_rate
+    FakeOpenAIHandler.max_concurrency = args.max_concurrency
+
+    server = FakeOpenAIServer((args.host, args.port), FakeOpenAIHandler)
+    print(f"가짜 OpenAI 서버: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+감정 사전 규모별 시작 시간과 분석 지연 측정
+기본 사전(emotion_lexicon.json)에 임의의 한글 키워드를 덧붙여 키워드 수를 늘려 가며
+JSON 컴파일 시간, pickle 캐시 로드 시간, 메시지당 분석 시간(scan)을 JSON으로 출력
+
+실행 예시:
+    python benchmarks/lexicon_bench.py --sizes 0 1000 5000 --repeat 500
+    python benchmarks/lexicon_bench.py --output benchmarks/results.jsonl --label v1.2
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_lexicon import DEFAULT_LEXICON_PATH, load_emotion_lexicon
+
+from load_test import SAMPLE_MESSAGES, percentile, save_result
+
+
+def random_term(rng, words):
+    """임의의 한글 키워드 (2~4글자 단어 words개를 띄어 씀)"""
+    return ' '.join(
+        ''.join(chr(rng.randint(0xAC00, 0xD7A3)) for _ in range(rng.randint(2, 4)))
+        for _ in range(words)
+    )
+
+
+def grow_lexicon(base, extra_terms, seed=0):
+    """
+    기본 사전에 임의의 키워드 추가 (10%는 조사 변형이 붙는 두 단어 키워드)
+
+    Args:
+        base: 기본 사전 dict
+        extra_terms: 추가할 키워드 수
+        seed: 난수 시드
+
+    Returns:
+        dict: 커진 사전
+    """
+    rng = random.Random(seed)
+    data = json.loads(json.dumps(base))
+    emotions = list(data['emotions'])
+    for i in range(extra_terms):
+        term = random_term(rng, 2 if i % 10 == 0 else 1)
+        data['emotions'][emotions[i % len(emotions)]][term] = round(rng.uniform(0.3, 1.0), 2)
+    return data
+
+
+def measure(lexicon_path, cache_dir, repeat):
+    """컴파일/캐시 로드 시간(밀리초)과 메시지당 분석 시간(마이크로초)"""
+    started = time.perf_counter()
+    load_emotion_lexicon(lexicon_path, cache_dir=None)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    # 첫 호출은 캐시를 만들고, 두 번째 호출이 실제 시작 시 경로
+    load_emotion_lexicon(lexicon_path, cache_dir=cache_dir)
+    started = time.perf_counter()
+    lexicon = load_emotion_lexicon(lexicon_path, cache_dir=cache_dir)
+    cached_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for _ in range(repeat):
+        for message in SAMPLE_MESSAGES:
+            started = time.perf_counter()
+            lexicon.scan(message)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+
+    cache_files = list(Path(cache_dir).glob('*.pickle'))
+    return {
+        'terms': sum(len(terms) for terms in lexicon.emotion_keywords.values()),
+        'compile_ms': round(compile_ms, 2),
+        'cached_load_ms': round(cached_ms, 2),
+        'cache_bytes': cache_files[0].stat().st_size if cache_files else 0,
+        'scan_mean_us': round(sum(latencies) / len(latencies), 2),
+        'scan_p99_us': round(percentile(latencies, 0.99), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="감정 사전 규모별 시작 시간과 분석 지연 측정")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 5000], help="추가할 임의 키워드 수")
+    parser.add_argument("--repeat", type=int, default=500, help="예시 메시지 반복 횟수")
+    parser.add_argument("--output", help="결과를 덧붙일 JSON Lines 파일")
+    parser.add_argument("--label", help="결과에 붙일 이름 (릴리스 버전 등)")
+    args = parser.parse_args()
+
+    with open(DEFAULT_LEXICON_PATH, encoding='utf-8') as f:
+        base = json.load(f)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            lexicon_path = Path(work_dir) / f"lexicon-{size}.json"
+            with open(lexicon_path, 'w', encoding='utf-8') as f:
+                json.dump(grow_lexicon(base, size), f, ensure_ascii=False)
+            cache_dir = Path(work_dir) / f"cache-{size}"
+            results.append(measure(lexicon_path, cache_dir, args.repeat))
+
+    result = {'benchmark': 'lexicon', 'results': results}
+    if args.output:
+        save_result(args.output, result, args.label)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+API 동시 부하 측정
+가짜 OpenAI 서버를 바라보는 앱에 시나리오별 동시 요청을 보내 처리량과 지연 분포를 JSON으로 출력
+
+시나리오:
+    chat       POST /api/chat
+    stream     POST /api/chat/stream (첫 content 프레임까지 지연 포함)
+    consent    POST /api/consent (요청마다 다른 사용자)
+    analytics  GET /api/analytics
+    mixed      위 시나리오를 섞어서 (chat 4 : stream 4 : consent 1 : analytics 1)
+
+실행 예시:
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --scenario chat --requests 400 --concurrency 200
+    python benchmarks/load_test.py --scenario mixed --output benchmarks/results.jsonl --label v1.2
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+import httpx
+
+SAMPLE_MESSAGES = [
+    "직장 상사가 자꾸 저를 무시하고 힘들게 해요.",
+    "앞으로 잘 될지 너무 불안해요.",
+    "친한 친구가 저를 배신했어요.",
+    "아무것도 하기 싫고 의욕이 없어요."
+]
+
+# mixed 시나리오의 요청 순환 (실제 사용 비율에 가깝게)
+MIXED_CYCLE = ["chat"] * 4 + ["stream"] * 4 + ["consent", "analytics"]
+
+
+def percentile(values, fraction):
+    """정렬된 값에서 분위수 계산"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(values):
+    """지연 목록(초)의 평균과 분위수"""
+    values = sorted(values)
+    return {
+        "mean": round(statistics.mean(values), 4) if values else 0,
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "p99": round(percentile(values, 0.99), 4)
+    }
+
+
+def save_result(path, result, label=None):
+    """
+    결과를 JSON Lines 파일에 덧붙임 (릴리스 간 비교용 - compare_results.py)
+
+    Args:
+        path: 결과 파일 경로
+        result: 벤치마크 결과
+        label: 결과에 붙일 이름 (릴리스 버전 등)
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "label": label,
+        "commit": commit,
+        **result
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+async def send_chat(client, i):
+    response = await client.post("/api/chat", json={
+        "message": SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)],
+        "user_id": f"bench-{i}"
+    })
+    await response.aread()
+    return response.status_code, None
+
+
+async def send_stream(client, i):
+    """스트리밍 요청 (첫 content 프레임 도착 시각도 반환)"""
+    started = time.perf_counter()
+    first_content = None
+    async with client.stream("POST", "/api/chat/stream", json={
+        "message": SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)],
+        "user_id": f"bench-{i}"
+    }) as response:
+        async for line in response.aiter_lines():
+            if first_content is None and line.startswith("data: ") and '"content"' in line:
+                first_content = time.perf_counter() - started
+            if line.startswith("data: ") and ('"done"' in line or '"error"' in line):
+                if '"error"' in line:
+                    return 500, first_content
+    return response.status_code, first_content
+
+
+async def send_consent(client, i):
+    # 사용자 ID가 IP + User-Agent 해시이므로 요청마다 User-Agent를 바꿔 서로 다른 사용자로 만듦
+    response = await client.post(
+        "/api/consent",
+        json={"consent": i % 2 == 0},
+        headers={"User-Agent": f"load-test/{i}"}
+    )
+    return response.status_code, None
+
+
+async def send_analytics(client, i):
+    response = await client.get("/api/analytics")
+    return response.status_code, None
+
+
+SCENARIOS = {
+    "chat": send_chat,
+    "stream": send_stream,
+    "consent": send_consent,
+    "analytics": send_analytics
+}
+
+
+async def run(url, scenario, total_requests, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        if scenario in ("chat", "stream", "mixed"):
+            # 서버 프로세스에 API 키 설정 (가짜 서버에서는 아무 키나 허용)
+            setup = await client.post("/api/setup", json={"api_key": "sk-fake"})
+            setup.raise_for_status()
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = {}
+        first_content = []
+        errors = {}
+
+        async def one(i):
+            name = MIXED_CYCLE[i % len(MIXED_CYCLE)] if scenario == "mixed" else scenario
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    status, ttfc = await SCENARIOS[name](client, i)
+                except httpx.HTTPError:
+                    status, ttfc = None, None
+                if status != 200:
+                    errors[name] = errors.get(name, 0) + 1
+                    return
+                latencies.setdefault(name, []).append(time.perf_counter() - started)
+                if ttfc is not None:
+                    first_content.append(ttfc)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total_requests)))
+        elapsed = time.perf_counter() - started
+
+    completed = sum(len(values) for values in latencies.values())
+    result = {
+        "benchmark": "load",
+        "url": url,
+        "scenario": scenario,
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": sum(errors.values()),
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(completed / elapsed, 2) if elapsed else 0,
+        "latency_seconds": summarize([value for values in latencies.values() for value in values])
+    }
+    if first_content:
+        result["first_content_seconds"] = summarize(first_content)
+    if scenario == "mixed":
+        result["by_scenario"] = {
+            name: {
+                "completed": len(latencies.get(name, [])),
+                "errors": errors.get(name, 0),
+                "latency_seconds": summarize(latencies.get(name, []))
+            }
+            for name in sorted(set(latencies) | set(errors))
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 동시 부하 측정")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--scenario", default="chat", choices=sorted(SCENARIOS) + ["mixed"])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--output", help="결과를 덧붙일 JSON Lines 파일")
+    parser.add_argument("--label", help="결과에 붙일 이름 (릴리스 버전 등)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.scenario, args.requests, args.concurrency))
+    if args.output:
+        save_result(args.output, result, args.label)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+요청 처리 단계별 마이크로벤치마크
+감정 분석, 시스템 프롬프트 구성, 통계 조회, 동의 확인, 대화 로깅의 호출당 시간을 JSON으로 출력
+(임시 디렉토리에 대화 기록을 미리 채운 저장소로 측정하므로 conversation_data는 건드리지 않음)
+
+실행 예시:
+    python benchmarks/micro_bench.py --storage csv --records 20000
+    python benchmarks/micro_bench.py --storage sqlite --output benchmarks/results.jsonl --label v1.2
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_logger import ConversationLogger
+from emotion_tracker import EmotionTracker
+from prompts import get_system_prompt, select_few_shot_examples
+
+from load_test import SAMPLE_MESSAGES, percentile, save_result
+
+
+def time_calls(fn, iterations, warmup=50):
+    """
+    함수를 반복 호출해 호출당 시간(마이크로초) 분포 측정
+
+    Args:
+        fn: 호출 번호를 받는 함수
+        iterations: 측정 호출 수
+        warmup: 측정 전 예열 호출 수
+
+    Returns:
+        dict: 평균, p50/p95/p99 (마이크로초)
+    """
+    for i in range(warmup):
+        fn(i)
+
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+
+    return {
+        'iterations': iterations,
+        'mean_us': round(sum(timings) / len(timings), 2),
+        'p50_us': round(percentile(timings, 0.50), 2),
+        'p95_us': round(percentile(timings, 0.95), 2),
+        'p99_us': round(percentile(timings, 0.99), 2)
+    }
+
+
+def seed_logger(logger, records, users):
+    """동의한 사용자들의 대화 기록을 미리 채움"""
+    for user in range(users):
+        logger.save_consent(f"user-{user}", True)
+    for i in range(records):
+        logger.log_conversation(
+            user_id=f"user-{i % users}",
+            session_id=f"session-{i % (users * 4)}",
+            user_message=SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)],
+            buddha_response="제자여, 지금 이 순간 숨을 고르게 쉬어 보세요.",
+            detected_emotions=["불안"],
+            conversation_turn=i % 10 + 1
+        )
+    logger.flush()
+
+
+def run(storage, records, users, iterations):
+    tracker = EmotionTracker(max_entries=200)
+    emotion_results = [tracker.analyze_emotion(message) for message in SAMPLE_MESSAGES]
+
+    def build_prompt(i):
+        index = i % len(SAMPLE_MESSAGES)
+        examples = select_few_shot_examples(SAMPLE_MESSAGES[index], emotion_results[index])
+        return get_system_prompt("현재 감정: 불안", few_shot_examples=examples)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        logger = ConversationLogger(data_dir, consent_required=True, storage=storage)
+        try:
+            started = time.perf_counter()
+            seed_logger(logger, records, users)
+            seed_seconds = time.perf_counter() - started
+
+            results = {
+                'analyze_emotion': time_calls(
+                    lambda i: tracker.analyze_emotion(SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]),
+                    iterations
+                ),
+                'get_system_prompt': time_calls(build_prompt, iterations),
+                'get_statistics': time_calls(lambda i: logger.get_statistics(), iterations),
+                'check_consent': time_calls(lambda i: logger.check_consent(f"user-{i % users}"), iterations),
+                'log_conversation': time_calls(
+                    lambda i: logger.log_conversation(
+                        user_id=f"user-{i % users}",
+                        session_id="bench",
+                        user_message=SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)],
+                        buddha_response="제자여, 지금 이 순간 숨을 고르게 쉬어 보세요.",
+                        detected_emotions=["불안"]
+                    ),
+                    iterations
+                )
+            }
+        finally:
+            logger.close()
+
+    return {
+        'benchmark': 'micro',
+        'storage': storage,
+        'records': records,
+        'users': users,
+        'seed_seconds': round(seed_seconds, 3),
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="요청 처리 단계별 마이크로벤치마크")
+    parser.add_argument("--storage", default="csv", choices=["csv", "sqlite"])
+    parser.add_argument("--records", type=int, default=10000, help="미리 채울 대화 기록 수")
+    parser.add_argument("--users", type=int, default=500, help="동의한 사용자 수")
+    parser.add_argument("--iterations", type=int, default=2000, help="단계별 측정 호출 수")
+    parser.add_argument("--output", help="결과를 덧붙일 JSON Lines 파일")
+    parser.add_argument("--label", help="결과에 붙일 이름 (릴리스 버전 등)")
+    args = parser.parse_args()
+
+    result = run(args.storage, args.records, args.users, args.iterations)
+    if args.output:
+        save_result(args.output, result, args.label)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+LLM 호출 스케줄러 한도 준수 확인
+분당 요청 한도를 건 스케줄러에 즉시 끝나는 호출을 한꺼번에 넣어, 한도가 허용하는 시간 안에
+모든 요청이 허가되는지(대기 시간 초과 없이) 확인하고 결과를 JSON으로 출력
+스레드(동기)와 이벤트 루프(비동기) 대기를 모두 확인하며, 하나라도 시간 초과되면 종료 코드 1
+
+실행 예시:
+    python benchmarks/scheduler_bench.py --requests 60 --requests-per-minute 600 --max-concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_scheduler import LLMScheduler, SchedulerBusy
+
+
+def make_scheduler(args):
+    return LLMScheduler(
+        requests_per_minute=args.requests_per_minute,
+        max_concurrency=args.max_concurrency,
+        min_concurrency=1,
+        burst_seconds=args.burst_seconds,
+        max_wait_seconds=args.max_wait_seconds
+    )
+
+
+def run_threads(args):
+    """요청마다 스레드 하나로 동시에 call"""
+    scheduler = make_scheduler(args)
+    counts = {'granted': 0, 'timeouts': 0}
+    lock = threading.Lock()
+
+    def one():
+        try:
+            scheduler.call(lambda: None)
+            key = 'granted'
+        except SchedulerBusy:
+            key = 'timeouts'
+        with lock:
+            counts[key] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=one) for _ in range(args.requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict(counts, elapsed_seconds=round(time.perf_counter() - started, 3))
+
+
+def run_async(args):
+    """요청마다 코루틴 하나로 동시에 acall"""
+    scheduler = make_scheduler(args)
+
+    async def noop():
+        return None
+
+    async def one():
+        try:
+            await scheduler.acall(noop)
+            return 'granted'
+        except SchedulerBusy:
+            return 'timeouts'
+
+    async def main():
+        return await asyncio.gather(*(one() for _ in range(args.requests)))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    return {
+        'granted': results.count('granted'),
+        'timeouts': results.count('timeouts'),
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 호출 스케줄러 한도 준수 확인")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--requests-per-minute", type=int, default=600)
+    parser.add_argument("--burst-seconds", type=float, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--max-wait-seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    # 버킷이 가득 찬 상태에서 시작하므로 버킷 용량을 넘는 요청만 보충 속도대로 허가됨
+    rate = args.requests_per_minute / 60
+    burst = max(rate * args.burst_seconds, 1.0)
+    expected = max(args.requests - burst, 0) / rate
+
+    result = {
+        'benchmark': 'scheduler',
+        'requests': args.requests,
+        'requests_per_minute': args.requests_per_minute,
+        'max_concurrency': args.max_concurrency,
+        'expected_seconds': round(expected, 3),
+        'threads': run_threads(args),
+        'async': run_async(args)
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if result['threads']['timeouts'] or result['async']['timeouts']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
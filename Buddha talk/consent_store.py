@@ -0,0 +1,201 @@
+"""
+사용자 동의 정보 저장소
+메모리 인덱스로 조회하고, 변경은 append-only 저널에 기록한 뒤 주기적으로 스냅샷에 압축
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from file_locks import lock_file, unlock_file
+
+
+class ConsentStore:
+    """동의 정보 메모리 인덱스 + 저널 기반 파일 저장소"""
+
+    def __init__(self, snapshot_file, journal_file=None, refresh_interval=1.0, compact_every=1000):
+        """
+        Args:
+            snapshot_file: 압축된 동의 정보 JSON 파일 (기존 user_consents.json 형식)
+            journal_file: 변경 내역 저널 파일 (JSON Lines, 기본값: 스냅샷 이름 + .journal)
+            refresh_interval: 다른 워커의 변경을 확인하는 최소 간격 (초)
+            compact_every: 저널 항목이 이 수를 넘으면 스냅샷으로 압축
+        """
+        self.snapshot_file = Path(snapshot_file)
+        self.journal_file = Path(journal_file) if journal_file else self.snapshot_file.with_suffix('.journal')
+        self.refresh_interval = refresh_interval
+        self.compact_every = compact_every
+
+        self._consents = {}
+        self._snapshot_signature = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._refresh()
+            self._last_refresh = time.monotonic()
+
+    def get(self, user_id):
+        """
+        사용자 동의 기록 반환
+
+        Args:
+            user_id: 사용자 ID
+
+        Returns:
+            dict: 동의 기록 (없으면 None)
+        """
+        self._maybe_refresh()
+        return self._consents.get(user_id)
+
+    def has_consent(self, user_id):
+        """
+        사용자 동의 여부 (메모리 조회)
+
+        Args:
+            user_id: 사용자 ID
+
+        Returns:
+            bool: 동의 여부
+        """
+        record = self.get(user_id)
+        return bool(record and record.get('consent', False))
+
+    def set(self, user_id, record):
+        """
+        동의 기록 저장 (저널에 한 줄 추가)
+
+        Args:
+            user_id: 사용자 ID
+            record: 동의 기록 (consent, timestamp, version)
+        """
+        line = json.dumps(dict(record, user_id=user_id), ensure_ascii=False) + '\n'
+
+        with self._lock:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                lock_file(f, exclusive=True)
+                try:
+                    f.write(line)
+                    f.flush()
+                finally:
+                    unlock_file(f)
+
+            # 방금 쓴 항목과 다른 워커가 추가한 항목을 함께 반영
+            self._refresh()
+
+            if self._journal_entries >= self.compact_every:
+                self._compact()
+
+    def all(self):
+        """
+        전체 동의 기록 반환
+
+        Returns:
+            dict: {user_id: 동의 기록}
+        """
+        self._maybe_refresh()
+        return dict(self._consents)
+
+    def compact(self):
+        """저널을 스냅샷에 합치고 저널 비우기"""
+        with self._lock:
+            self._compact()
+
+    def _maybe_refresh(self):
+        """refresh_interval마다 파일 변경을 확인해 메모리 인덱스 갱신"""
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_interval:
+            return
+
+        with self._lock:
+            self._last_refresh = now
+            self._refresh()
+
+    def _refresh(self):
+        """스냅샷/저널 변경 반영 (잠금 보유 상태에서 호출)"""
+        if not self.journal_file.exists():
+            if _signature(self.snapshot_file) != self._snapshot_signature:
+                self._load_snapshot()
+            return
+
+        with open(self.journal_file, 'rb') as journal:
+            # 공유 잠금을 잡은 뒤에 확인해야 압축 도중의 상태를 읽지 않음
+            lock_file(journal, exclusive=False)
+            try:
+                journal_size = os.fstat(journal.fileno()).st_size
+                if (_signature(self.snapshot_file) != self._snapshot_signature
+                        or journal_size < self._journal_offset):
+                    # 다른 워커가 압축함
+                    self._load_snapshot()
+                if journal_size > self._journal_offset:
+                    self._apply_journal(journal)
+            finally:
+                unlock_file(journal)
+
+    def _load_snapshot(self):
+        """스냅샷을 읽어 인덱스 초기화 (저널은 처음부터 다시 적용해야 함)"""
+        consents = {}
+        if self.snapshot_file.exists():
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                consents = json.load(f)
+        self._snapshot_signature = _signature(self.snapshot_file)
+        self._consents = consents
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def _apply_journal(self, journal):
+        """
+        현재 오프셋부터 완결된 줄만 읽어 인덱스에 반영
+
+        Args:
+            journal: 열린 저널 파일 (바이너리)
+        """
+        journal.seek(self._journal_offset)
+        data = journal.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line.decode('utf-8'))
+            user_id = entry.pop('user_id')
+            self._consents[user_id] = entry
+            self._journal_entries += 1
+        self._journal_offset += end
+
+    def _compact(self):
+        """스냅샷 재작성 후 저널 비우기 (잠금 보유 상태에서 호출)"""
+        with open(self.journal_file, 'a+b') as journal:
+            lock_file(journal, exclusive=True)
+            try:
+                # 잠금을 잡은 상태에서 최신 스냅샷/저널까지 반영
+                if _signature(self.snapshot_file) != self._snapshot_signature:
+                    self._load_snapshot()
+                self._apply_journal(journal)
+
+                temp_file = self.snapshot_file.with_suffix('.tmp')
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._consents, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.snapshot_file)
+
+                journal.truncate(0)
+                self._snapshot_signature = _signature(self.snapshot_file)
+                self._journal_offset = 0
+                self._journal_entries = 0
+            finally:
+                unlock_file(journal)
+
+
+def _signature(path):
+    """파일 변경 감지용 서명 (inode, 크기, 수정 시각)"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
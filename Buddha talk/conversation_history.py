@@ -0,0 +1,209 @@
+"""
+대화 기록 압축
+최근 턴은 원문 그대로 채팅 메시지로 보내고, 오래된 턴은 세션별 요약에 점진적으로 합쳐
+대화가 길어져도 프롬프트 크기가 토큰 예산을 넘지 않게 함
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from token_counter import count_tokens
+
+_SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?。])\s+|\n+')
+
+
+def _turn_text(turn, field):
+    """기록 항목의 문자열 필드 (형식이 잘못되었으면 빈 문자열)"""
+    value = turn.get(field) if isinstance(turn, dict) else None
+    return value if isinstance(value, str) else ''
+
+
+def _first_sentence(text, max_chars):
+    """첫 문장만 max_chars 이내로 잘라 반환"""
+    sentence = _SENTENCE_END_PATTERN.split(text.strip(), 1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars] + "…"
+
+
+def _turn_fingerprint(turn):
+    """요약에 반영한 턴이 바뀌지 않았는지 확인하기 위한 해시"""
+    data = _turn_text(turn, 'user') + '\x00' + _turn_text(turn, 'buddha')
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class HistoryCompactor:
+    """토큰 예산 기반 대화 기록 압축기 (세션별 요약 캐시)"""
+
+    def __init__(
+        self,
+        token_budget=1500,
+        max_recent_turns=4,
+        summary_token_budget=300,
+        summary_line_chars=60,
+        max_sessions=10000,
+        summary_store=None
+    ):
+        """
+        Args:
+            token_budget: 최근 턴 원문 + 요약의 최대 토큰 수
+            max_recent_turns: 원문 그대로 보낼 최대 턴 수
+            summary_token_budget: 요약의 최대 토큰 수 (넘으면 오래된 줄부터 삭제)
+            summary_line_chars: 턴 하나를 요약할 때 남길 최대 글자 수
+            max_sessions: 요약을 보관할 최대 세션 수 (넘으면 가장 오래 쓰지 않은 세션부터 삭제)
+            summary_store: 요약 상태를 보관할 대화 상태 저장소 (get_summary/set_summary,
+                None이면 이 압축기의 메모리에 보관)
+        """
+        self.token_budget = token_budget
+        self.max_recent_turns = max_recent_turns
+        self.summary_token_budget = summary_token_budget
+        self.summary_line_chars = summary_line_chars
+        self.max_sessions = max_sessions
+        self.summary_store = summary_store
+
+        # summary_store가 없을 때의 요약 캐시: session_id → {'fingerprint': 마지막으로 요약에 반영한 턴 해시, 'lines': 요약 줄}
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compact(self, history, session_id=None):
+        """
+        대화 기록을 최근 턴 메시지와 이전 대화 요약으로 나눔
+
+        Args:
+            history: [{'user': ..., 'buddha': ...}, ...] (오래된 순)
+            session_id: 요약을 캐시할 세션 ID (None이면 매번 새로 요약)
+
+        Returns:
+            tuple: (최근 턴 채팅 메시지 리스트, 이전 대화 요약 문자열)
+        """
+        turns = [turn for turn in (history or []) if _turn_text(turn, 'user')]
+
+        # 최근 턴부터 거꾸로 예산 안에서 원문 유지 (요약 몫은 남겨 둠)
+        recent_budget = self.token_budget - (self.summary_token_budget if len(turns) > 1 else 0)
+        recent_tokens = 0
+        recent_count = 0
+        for turn in reversed(turns[-self.max_recent_turns:]):
+            tokens = count_tokens(_turn_text(turn, 'user')) + count_tokens(_turn_text(turn, 'buddha'))
+            if recent_tokens + tokens > recent_budget:
+                break
+            recent_tokens += tokens
+            recent_count += 1
+
+        older = turns[:len(turns) - recent_count]
+        recent = turns[len(turns) - recent_count:]
+
+        messages = []
+        for turn in recent:
+            messages.append({'role': 'user', 'content': _turn_text(turn, 'user')})
+            if _turn_text(turn, 'buddha'):
+                messages.append({'role': 'assistant', 'content': _turn_text(turn, 'buddha')})
+
+        return messages, self._summarize(older, session_id)
+
+    def forget(self, session_id):
+        """세션 요약 삭제"""
+        with self._lock:
+            if self.summary_store is not None:
+                self.summary_store.set_summary(session_id, None)
+            self._summaries.pop(session_id, None)
+
+    def _load_state(self, session_id):
+        """세션 요약 상태 조회 (잠금 보유 상태에서 호출)"""
+        if session_id is None:
+            return None
+        if self.summary_store is not None:
+            return self.summary_store.get_summary(session_id)
+        return self._summaries.get(session_id)
+
+    def _save_state(self, session_id, state):
+        """세션 요약 상태 저장 (잠금 보유 상태에서 호출)"""
+        if session_id is None:
+            return
+        if self.summary_store is not None:
+            self.summary_store.set_summary(session_id, state)
+            return
+        self._summaries[session_id] = state
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_sessions:
+            self._summaries.popitem(last=False)
+
+    def _summarize(self, older, session_id):
+        """
+        오래된 턴 요약 (세션 캐시가 있으면 새로 밀려난 턴만 추가)
+
+        Args:
+            older: 요약할 턴 목록 (오래된 순)
+            session_id: 세션 ID
+
+        Returns:
+            str: 요약 (요약할 턴이 없으면 빈 문자열)
+        """
+        if not older:
+            return ""
+
+        with self._lock:
+            state = self._load_state(session_id)
+            start = self._resume_position(state, older)
+            if start == len(older):
+                # 새로 밀려난 턴이 없으면 저장된 요약 그대로 사용
+                return " / ".join(state['lines'])
+
+            if start is None:
+                # 캐시가 없거나 기록이 달라짐 (새 대화, 클라이언트 초기화 등) → 처음부터 요약
+                state = {'fingerprint': None, 'lines': []}
+                start = 0
+
+            for turn in older[start:]:
+                state['lines'].append(self._summary_line(turn))
+            state['fingerprint'] = _turn_fingerprint(older[-1])
+
+            # 예산을 넘으면 오래된 줄부터 삭제
+            while len(state['lines']) > 1 and count_tokens("\n".join(state['lines'])) > self.summary_token_budget:
+                state['lines'].pop(0)
+
+            self._save_state(session_id, state)
+
+        return " / ".join(state['lines'])
+
+    @staticmethod
+    def _resume_position(state, older):
+        """
+        요약에 마지막으로 반영한 턴 다음 위치
+        (클라이언트가 최근 N턴만 보내 앞부분이 잘려 있어도 찾을 수 있도록 뒤에서부터 검색)
+
+        Returns:
+            int: 새로 요약할 첫 턴 위치 (찾지 못하면 None)
+        """
+        if state is None:
+            return None
+        for position in range(len(older) - 1, -1, -1):
+            if _turn_fingerprint(older[position]) == state['fingerprint']:
+                return position + 1
+        return None
+
+    def _summary_line(self, turn):
+        """턴 하나를 한 줄로 요약 (질문과 답변의 첫 문장)"""
+        user = _first_sentence(_turn_text(turn, 'user'), self.summary_line_chars)
+        buddha = _turn_text(turn, 'buddha')
+        if not buddha:
+            return f"사용자: {user}"
+        return f"사용자: {user} → 부처님: {_first_sentence(buddha, self.summary_line_chars)}"
+
+
+# 글로벌 압축기 인스턴스
+_global_compactor = None
+
+def get_history_compactor(**kwargs):
+    """
+    글로벌 대화 기록 압축기 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 처음 생성할 때 HistoryCompactor 설정
+
+    Returns:
+        HistoryCompactor: 압축기
+    """
+    global _global_compactor
+    if _global_compactor is None:
+        _global_compactor = HistoryCompactor(**kwargs)
+    return _global_compactor
@@ -0,0 +1,268 @@
+"""
+대화 통계 집계 엔진
+conversations.csv를 처음부터 다시 읽지 않고, 마지막으로 읽은 바이트 위치 이후의 행만 반영해 누적 집계
+"""
+
+import base64
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from file_locks import lock_file, unlock_file
+
+
+class HyperLogLog:
+    """고유 값 개수를 고정 메모리로 추정하는 HyperLogLog (precision 14 기준 오차 약 0.8%)"""
+
+    def __init__(self, precision=14, registers=None):
+        """
+        Args:
+            precision: 레지스터 수 = 2^precision
+            registers: 저장해 둔 레지스터 (복원 시)
+        """
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        self._alpha = 0.7213 / (1 + 1.079 / self.size)
+
+        # 추정값을 O(1)로 계산하기 위한 누적값
+        self._zeros = self.registers.count(0)
+        self._inverse_sum = sum(2.0 ** -r for r in self.registers)
+
+    def add(self, value):
+        """
+        값 추가
+
+        Args:
+            value: 문자열 값
+        """
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+
+        current = self.registers[index]
+        if rank > current:
+            if current == 0:
+                self._zeros -= 1
+            self._inverse_sum += 2.0 ** -rank - 2.0 ** -current
+            self.registers[index] = rank
+
+    def count(self):
+        """
+        고유 값 개수 추정
+
+        Returns:
+            int: 추정 개수
+        """
+        estimate = self._alpha * self.size * self.size / self._inverse_sum
+        if estimate <= 2.5 * self.size and self._zeros:
+            # 작은 범위는 linear counting이 더 정확함
+            estimate = self.size * math.log(self.size / self._zeros)
+        return int(round(estimate))
+
+    def dumps(self):
+        """레지스터를 문자열로 직렬화"""
+        return base64.b64encode(bytes(self.registers)).decode('ascii')
+
+    @classmethod
+    def loads(cls, data, precision=14):
+        """직렬화한 레지스터에서 복원"""
+        return cls(precision, base64.b64decode(data))
+
+
+class ConversationStats:
+    """conversations.csv 누적 통계 (바이트 오프셋 체크포인트 + 사이드카 스냅샷)"""
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, conversations_file, snapshot_file=None, persist_every_rows=1000, persist_interval=60.0):
+        """
+        Args:
+            conversations_file: 대화 기록 CSV 경로
+            snapshot_file: 집계 스냅샷 경로 (기본값: CSV 이름 + .stats.json)
+            persist_every_rows: 이 수만큼 새 행을 반영하면 스냅샷 저장
+            persist_interval: 마지막 저장 후 이 시간이 지나면 스냅샷 저장 (초)
+        """
+        self.conversations_file = Path(conversations_file)
+        self.snapshot_file = (
+            Path(snapshot_file) if snapshot_file
+            else self.conversations_file.with_suffix('.stats.json')
+        )
+        self.persist_every_rows = persist_every_rows
+        self.persist_interval = persist_interval
+
+        self._lock = threading.Lock()
+        self._reset()
+        self._load_snapshot()
+
+    def _reset(self):
+        """집계 초기화 (CSV를 처음부터 다시 읽어야 할 때)"""
+        self._offset = 0
+        self._file_id = None
+        self._fieldnames = None
+        self._total_conversations = 0
+        self._total_message_length = 0
+        self._total_response_length = 0
+        self._sessions = HyperLogLog()
+        self._daily = {}
+        self._emotions = {}
+        self._turns = {}
+        self._unsaved_rows = 0
+        self._last_persist = time.monotonic()
+
+    def refresh(self):
+        """마지막 체크포인트 이후 CSV에 추가된 행만 읽어 집계에 반영"""
+        with self._lock:
+            if not self.conversations_file.exists():
+                return
+
+            with open(self.conversations_file, 'rb') as f:
+                # 기록기는 배치 단위로 배타 잠금을 잡으므로 공유 잠금 상태에서는 행이 잘려 있지 않음
+                lock_file(f, exclusive=False)
+                try:
+                    stat = os.fstat(f.fileno())
+                    if stat.st_ino != self._file_id or stat.st_size < self._offset:
+                        # 파일이 교체되었거나 잘림 → 처음부터 다시 집계
+                        self._reset()
+                        self._file_id = stat.st_ino
+                    if stat.st_size == self._offset:
+                        return
+                    f.seek(self._offset)
+                    data = f.read(stat.st_size - self._offset)
+                finally:
+                    unlock_file(f)
+
+            self._apply(data)
+            self._offset += len(data)
+
+            if (self._unsaved_rows >= self.persist_every_rows
+                    or time.monotonic() - self._last_persist >= self.persist_interval):
+                self._persist()
+
+    def _apply(self, data):
+        """
+        새로 읽은 CSV 바이트를 파싱해 집계 갱신
+
+        Args:
+            data: 체크포인트 이후의 CSV 바이트
+        """
+        reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+        if self._fieldnames is None:
+            self._fieldnames = next(reader, None)
+            if self._fieldnames is None:
+                return
+
+        fields = {name: index for index, name in enumerate(self._fieldnames)}
+        for values in reader:
+            if not values:
+                continue
+            row = {name: values[index] for name, index in fields.items() if index < len(values)}
+
+            self._total_conversations += 1
+            self._total_message_length += int(row.get('message_length') or 0)
+            self._total_response_length += int(row.get('response_length') or 0)
+            self._sessions.add(row.get('session_id', ''))
+
+            day = row.get('timestamp', '')[:10]
+            self._daily[day] = self._daily.get(day, 0) + 1
+
+            for emotion in filter(None, row.get('detected_emotions', '').split(',')):
+                self._emotions[emotion] = self._emotions.get(emotion, 0) + 1
+
+            turn = row.get('conversation_turn', '')
+            self._turns[turn] = self._turns.get(turn, 0) + 1
+
+            self._unsaved_rows += 1
+
+    def get_statistics(self):
+        """
+        누적 통계 반환
+
+        Returns:
+            dict: 통계 정보
+        """
+        self.refresh()
+        with self._lock:
+            total = self._total_conversations
+            return {
+                'total_conversations': total,
+                'total_sessions': self._sessions.count() if total else 0,
+                'avg_message_length': self._total_message_length / total if total > 0 else 0,
+                'avg_response_length': self._total_response_length / total if total > 0 else 0,
+                'daily_conversations': dict(sorted(self._daily.items())),
+                'emotion_histogram': dict(
+                    sorted(self._emotions.items(), key=lambda item: (-item[1], item[0]))
+                ),
+                'turn_distribution': dict(
+                    sorted(self._turns.items(), key=lambda item: _turn_sort_key(item[0]))
+                )
+            }
+
+    def persist(self):
+        """현재 집계를 스냅샷 파일에 저장"""
+        with self._lock:
+            self._persist()
+
+    def _persist(self):
+        """스냅샷 저장 (잠금 보유 상태에서 호출, 임시 파일 후 교체)"""
+        snapshot = {
+            'version': self.SNAPSHOT_VERSION,
+            'offset': self._offset,
+            'file_id': self._file_id,
+            'fieldnames': self._fieldnames,
+            'total_conversations': self._total_conversations,
+            'total_message_length': self._total_message_length,
+            'total_response_length': self._total_response_length,
+            'sessions_hll': self._sessions.dumps(),
+            'daily': self._daily,
+            'emotions': self._emotions,
+            'turns': self._turns
+        }
+        temp_file = self.snapshot_file.with_name(f"{self.snapshot_file.name}.{os.getpid()}.tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temp_file, self.snapshot_file)
+
+        self._unsaved_rows = 0
+        self._last_persist = time.monotonic()
+
+    def _load_snapshot(self):
+        """스냅샷이 현재 CSV와 맞으면 복원 (재시작 시 CSV 끝부분만 읽게 됨)"""
+        if not self.snapshot_file.exists() or not self.conversations_file.exists():
+            return
+
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        stat = os.stat(self.conversations_file)
+        if (snapshot.get('version') != self.SNAPSHOT_VERSION
+                or snapshot.get('file_id') != stat.st_ino
+                or snapshot.get('offset', 0) > stat.st_size):
+            return
+
+        self._offset = snapshot['offset']
+        self._file_id = snapshot['file_id']
+        self._fieldnames = snapshot['fieldnames']
+        self._total_conversations = snapshot['total_conversations']
+        self._total_message_length = snapshot['total_message_length']
+        self._total_response_length = snapshot['total_response_length']
+        self._sessions = HyperLogLog.loads(snapshot['sessions_hll'])
+        self._daily = snapshot['daily']
+        self._emotions = snapshot['emotions']
+        self._turns = snapshot['turns']
+
+
+def _turn_sort_key(turn):
+    """턴 번호를 숫자 순서로 정렬하기 위한 키"""
+    return (0, int(turn), '') if turn.isdigit() else (1, 0, turn)
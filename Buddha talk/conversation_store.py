@@ -0,0 +1,255 @@
+"""
+서버 측 대화 상태 저장소
+세션 ID별로 대화 턴과 이전 대화 요약 상태를 보관해 클라이언트가 대화 기록을 다시 보내지 않게 함
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+from storage import connect_sqlite
+
+
+class ConversationStore:
+    """세션별 대화 상태 저장소 인터페이스"""
+
+    def get_turns(self, session_id):
+        """세션의 대화 턴 목록 ([{'user', 'buddha'}], 오래된 순)"""
+        raise NotImplementedError
+
+    def append_turn(self, session_id, user_message, buddha_response):
+        """대화 턴 추가 (max_turns를 넘으면 오래된 턴부터 삭제)"""
+        raise NotImplementedError
+
+    def get_summary(self, session_id):
+        """이전 대화 요약 상태 (없으면 None)"""
+        raise NotImplementedError
+
+    def set_summary(self, session_id, state):
+        """이전 대화 요약 상태 저장 (JSON으로 직렬화 가능한 dict)"""
+        raise NotImplementedError
+
+    def clear(self, session_id):
+        """세션의 대화 상태 삭제"""
+        raise NotImplementedError
+
+
+class MemoryConversationStore(ConversationStore):
+    """프로세스 메모리 저장소 (LRU + 유휴 시간 기반 정리, 워커 하나일 때 사용)"""
+
+    def __init__(self, max_sessions=10000, max_turns=50, idle_ttl_seconds=86400):
+        """
+        Args:
+            max_sessions: 보관할 최대 세션 수 (초과 시 가장 오래 안 쓴 세션부터 제거)
+            max_turns: 세션당 보관할 최대 턴 수
+            idle_ttl_seconds: 이 시간 동안 접근이 없으면 세션 제거
+        """
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.idle_ttl_seconds = idle_ttl_seconds
+
+        self._sessions = OrderedDict()  # session_id -> {'turns', 'summary', 'last_access'}
+        self._lock = threading.Lock()
+
+    def _session(self, session_id, create=False):
+        """세션 상태 반환 (잠금 보유 상태에서 호출, 접근 시각 갱신)"""
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        state = self._sessions.get(session_id)
+        if state is None:
+            if not create:
+                return None
+            state = {'turns': deque(maxlen=self.max_turns), 'summary': None}
+            self._sessions[session_id] = state
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        state['last_access'] = now
+        self._sessions.move_to_end(session_id)
+        return state
+
+    def _evict_idle(self, now):
+        """유휴 시간이 지난 세션 제거 (가장 오래된 것부터 확인)"""
+        while self._sessions:
+            state = next(iter(self._sessions.values()))
+            if now - state['last_access'] < self.idle_ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def get_turns(self, session_id):
+        with self._lock:
+            state = self._session(session_id)
+            return list(state['turns']) if state else []
+
+    def append_turn(self, session_id, user_message, buddha_response):
+        with self._lock:
+            self._session(session_id, create=True)['turns'].append(
+                {'user': user_message, 'buddha': buddha_response}
+            )
+
+    def get_summary(self, session_id):
+        with self._lock:
+            state = self._session(session_id)
+            return state['summary'] if state else None
+
+    def set_summary(self, session_id, state):
+        with self._lock:
+            self._session(session_id, create=True)['summary'] = state
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        """보관 현황 (세션 수, 전체 턴 수)"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'turns': sum(len(state['turns']) for state in self._sessions.values())
+            }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite(WAL) 저장소 (여러 워커가 같은 세션 상태를 공유)"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS session_turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        user_message TEXT NOT NULL,
+        buddha_response TEXT NOT NULL,
+        created REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_session_turns_session ON session_turns(session_id, id);
+    CREATE INDEX IF NOT EXISTS idx_session_turns_created ON session_turns(created);
+
+    CREATE TABLE IF NOT EXISTS session_summaries (
+        session_id TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_session_summaries_updated ON session_summaries(updated);
+    """
+
+    def __init__(
+        self,
+        db_path,
+        max_turns=50,
+        idle_ttl_seconds=86400,
+        sweep_interval_seconds=300,
+        busy_timeout_ms=5000
+    ):
+        """
+        Args:
+            db_path: SQLite 데이터베이스 파일 경로
+            max_turns: 세션당 보관할 최대 턴 수
+            idle_ttl_seconds: 이 시간 동안 갱신이 없으면 세션 삭제
+            sweep_interval_seconds: 오래된 세션 정리 주기
+            busy_timeout_ms: 다른 워커가 쓰기 잠금을 잡고 있을 때 기다릴 시간
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_turns = max_turns
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._local = threading.local()
+        self._last_sweep = time.monotonic()
+
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self):
+        """스레드(및 프로세스)별 연결 반환"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect_sqlite(self.db_path, self.busy_timeout_ms)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_turns(self, session_id):
+        rows = self._connection().execute(
+            "SELECT user_message, buddha_response FROM session_turns WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        )
+        return [{'user': row['user_message'], 'buddha': row['buddha_response']} for row in rows]
+
+    def append_turn(self, session_id, user_message, buddha_response):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO session_turns (session_id, user_message, buddha_response, created) "
+                "VALUES (?, ?, ?, ?)",
+                (session_id, user_message, buddha_response, now)
+            )
+            # 최근 max_turns개만 남김 (session_id, id 인덱스 범위 검색)
+            conn.execute(
+                "DELETE FROM session_turns WHERE session_id = ? AND id <= ("
+                "SELECT id FROM session_turns WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (session_id, session_id, self.max_turns)
+            )
+        self._maybe_sweep(now)
+
+    def get_summary(self, session_id):
+        row = self._connection().execute(
+            "SELECT state FROM session_summaries WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        return json.loads(row['state']) if row else None
+
+    def set_summary(self, session_id, state):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO session_summaries (session_id, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                (session_id, json.dumps(state, ensure_ascii=False), time.time())
+            )
+
+    def clear(self, session_id):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM session_summaries WHERE session_id = ?", (session_id,))
+
+    def _maybe_sweep(self, now):
+        """sweep_interval마다 유휴 시간이 지난 세션 삭제"""
+        if time.monotonic() - self._last_sweep < self.sweep_interval_seconds:
+            return
+        self._last_sweep = time.monotonic()
+
+        cutoff = now - self.idle_ttl_seconds
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "DELETE FROM session_turns WHERE session_id IN ("
+                "SELECT session_id FROM session_turns GROUP BY session_id HAVING MAX(created) < ?)",
+                (cutoff,)
+            )
+            conn.execute("DELETE FROM session_summaries WHERE updated < ?", (cutoff,))
+
+
+def create_conversation_store(backend, data_dir="conversation_data", **options):
+    """
+    설정에 맞는 대화 상태 저장소 생성
+
+    Args:
+        backend: 'memory' 또는 'sqlite'
+        data_dir: SQLite 파일을 둘 디렉토리
+        **options: 저장소별 설정 (max_turns, idle_ttl_seconds 등)
+
+    Returns:
+        ConversationStore: 저장소
+    """
+    if backend == 'memory':
+        return MemoryConversationStore(**options)
+    if backend == 'sqlite':
+        return SQLiteConversationStore(Path(data_dir) / "sessions.db", **options)
+    raise ValueError(f"알 수 없는 대화 상태 저장소: {backend}")
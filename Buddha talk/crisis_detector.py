@@ -0,0 +1,216 @@
+"""
+위기 표현 빠른 감지
+자살/자해 표현을 감정 분석, 프롬프트 구성, OpenAI 호출보다 먼저 확인해 안내 응답을 바로 돌려줌
+
+키워드별 정규식을 미리 컴파일해 메시지 어디서든 찾음 (띄어쓰지 않은 "정말죽고싶어", 문장부호가 낀 "죽.고.싶")
+키워드 글자 사이의 띄어쓰기("자 살")는 키워드가 어절 시작일 때만 허용해,
+다른 단어에 걸친 오탐("여자 살이" → 자살, "남자 해변" → 자해)을 막음
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from file_locks import lock_file, unlock_file
+from storage import BackgroundBatchWriter
+
+# 위기 표현 키워드 (앞 단어와 붙여 써도, 글자 사이에 문장부호가 있어도 인정)
+# 띄어 쓴 키워드("유서 쓰")는 단어 사이에 조사가 와도 인정 ("유서를 써", "손목을 그었") - 혼자 쓰이면
+# 일상 표현과 겹치는 단어("칼국수", "유서 깊은", "배고파 죽을래")는 이렇게 구체적인 표현으로만 등록
+CRISIS_KEYWORDS = [
+    "자살", "죽고싶", "죽어버리", "살기싫", "살기가싫", "사라지고싶",
+    "자해", "투신", "목매", "끝내고싶",
+    "죽고만싶", "살고싶지않", "극단적선택", "뛰어내리",
+    "칼 들고", "칼 긋", "칼 그었", "칼 찌르", "칼 찔러", "칼 찔렀",
+    "손목 긋", "손목 그었", "손목 그어", "손목 자르", "손목 잘라", "손목 잘랐",
+    "유서 쓰", "유서 써", "유서 남기", "유서 남겼", "차라리 죽"
+]
+
+# 띄어 쓴 키워드의 단어 사이에 올 수 있는 조사
+CRISIS_PARTICLES = ["을", "를", "이", "가", "은", "는", "도", "로", "으로", "만"]
+
+# 정규화 시 지울 문자 (공백, 문장부호, 기호, 밑줄)
+_IGNORED_PATTERN = re.compile(r'[\W_]+')
+
+# 키워드 글자 사이에 끼어도 되는 문자 (어절 시작에서는 띄어쓰기 포함, 어절 중간에서는 문장부호만)
+_GAP = r'[\W_]*'
+_TIGHT_GAP = r'(?:[^\w\s]|_)*'
+
+# 첫 글자 바로 뒤에서 본 어절 시작 조건 (첫 글자 앞이 없거나 글자가 아님)
+# 첫 글자를 먼저 맞춘 뒤 확인해야 정규식이 키워드 첫 글자로 후보 위치를 빠르게 거름
+_AFTER_WORD_START = r'(?<![^\W_].)'
+
+
+def normalize_for_crisis(text: str) -> str:
+    """
+    위기 표현 키워드의 대표 형태 (유니코드 정규화 후 공백/문장부호 제거 - 감지 결과와 감사 기록에 사용)
+
+    Args:
+        text: 원문
+
+    Returns:
+        str: 정규화된 문자열
+    """
+    return _IGNORED_PATTERN.sub('', unicodedata.normalize('NFKC', text))
+
+
+def _keyword_pattern(keyword: str) -> str:
+    """
+    키워드 정규식 조각
+    어절 시작에서는 글자 사이 띄어쓰기/문장부호를, 어디서든 글자 사이 문장부호를 허용
+    (띄어 쓴 단어 사이에는 둘 다 띄어쓰기와 조사 허용)
+
+    Args:
+        keyword: 위기 표현 키워드
+
+    Returns:
+        str: 정규식 조각
+    """
+    particles = '|'.join(map(re.escape, sorted(CRISIS_PARTICLES, key=len, reverse=True)))
+    between_words = _GAP + f'(?:{particles})?' + _GAP
+    words = [
+        list(map(re.escape, _IGNORED_PATTERN.sub('', word)))
+        for word in unicodedata.normalize('NFKC', keyword).split()
+    ]
+    words = [chars for chars in words if chars]
+
+    def rest(gap):
+        return between_words.join(gap.join(chars) for chars in words)[len(words[0][0]):]
+
+    return f'{words[0][0]}(?:{_AFTER_WORD_START}{rest(_GAP)}|{rest(_TIGHT_GAP)})'
+
+
+class CrisisDetector:
+    """위기 표현 감지기 (키워드별 정규식을 하나로 합쳐 미리 컴파일)"""
+
+    def __init__(self, keywords=CRISIS_KEYWORDS):
+        """
+        Args:
+            keywords: 위기 표현 키워드 목록
+        """
+        patterns = {}
+        for keyword in keywords:
+            normalized = normalize_for_crisis(keyword)
+            if normalized:
+                patterns.setdefault(normalized, _keyword_pattern(keyword))
+        self.keywords = sorted(patterns)
+        self._group_keywords = {f'k{i}': keyword for i, keyword in enumerate(patterns)}
+        self._pattern = re.compile('|'.join(
+            f'(?P<{group}>{patterns[keyword]})' for group, keyword in self._group_keywords.items()
+        ))
+
+    def detect(self, message: str) -> List[str]:
+        """
+        메시지에서 위기 표현 찾기
+
+        Args:
+            message: 사용자 메시지
+
+        Returns:
+            list: 감지된 키워드 (정규화된 형태, 가나다순, 없으면 빈 리스트)
+        """
+        if not message:
+            return []
+        text = unicodedata.normalize('NFKC', message)
+        return sorted({self._group_keywords[match.lastgroup] for match in self._pattern.finditer(text)})
+
+    def is_crisis(self, message: str) -> bool:
+        """위기 표현이 있는지 여부"""
+        return bool(self.detect(message))
+
+
+class CrisisAuditLog:
+    """
+    위기 감지 감사 기록 (JSON Lines)
+    요청 처리 중에는 큐에 넣기만 하고 백그라운드 스레드에서 묶어 기록 (워커 간 파일 잠금, 배치마다 fsync)
+    메시지 원문은 남기지 않고 감지된 키워드와 메시지 길이만 기록
+    """
+
+    def __init__(self, path, flush_interval=0.2):
+        """
+        Args:
+            path: 기록 파일 경로
+            flush_interval: 항목이 모이지 않아도 기록할 최대 대기 시간 (초)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writer = BackgroundBatchWriter(
+            self._write_batch,
+            name="crisis-audit-writer",
+            flush_interval=flush_interval
+        )
+
+    def record(self, session_id, user_id, endpoint, keywords, message_length):
+        """
+        위기 감지 기록 예약 (디스크 I/O 없이 즉시 반환)
+
+        Args:
+            session_id: 세션 ID
+            user_id: 사용자 ID
+            endpoint: 감지한 경로 (/api/chat 등)
+            keywords: 감지된 키워드 목록
+            message_length: 메시지 글자 수
+        """
+        self._writer.write({
+            'timestamp': datetime.now().isoformat(),
+            'session_id': session_id,
+            'user_id': user_id,
+            'endpoint': endpoint,
+            'keywords': list(keywords),
+            'message_length': message_length
+        })
+
+    def flush(self):
+        """대기 중인 기록을 모두 파일에 씀"""
+        self._writer.flush()
+
+    def _write_batch(self, entries):
+        """기록 스레드에서 한 번의 write로 파일 끝에 추가"""
+        data = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                lock_file(f, exclusive=True)
+                try:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                finally:
+                    unlock_file(f)
+
+
+# 글로벌 감지기 인스턴스 (import 시점에 한 번 컴파일)
+_global_detector = CrisisDetector()
+
+def get_crisis_detector():
+    """
+    글로벌 위기 표현 감지기 반환
+
+    Returns:
+        CrisisDetector: 감지기
+    """
+    return _global_detector
+
+
+# 글로벌 감사 기록 인스턴스
+_global_audit_log = None
+
+def get_crisis_audit_log(**kwargs):
+    """
+    글로벌 위기 감지 감사 기록 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 처음 생성할 때 CrisisAuditLog 설정 (path 필수)
+
+    Returns:
+        CrisisAuditLog: 감사 기록
+    """
+    global _global_audit_log
+    if _global_audit_log is None:
+        _global_audit_log = CrisisAuditLog(**kwargs)
+    return _global_audit_log
@@ -1,67 +1,36 @@
 """
 사용자 대화 데이터 로깅 시스템
-CSV 형식으로 질문-답변 데이터를 저장하고 분석
+CSV 또는 SQLite 저장소에 질문-답변 데이터를 저장하고 분석
 """
 
-import csv
-import os
 from datetime import datetime
 from pathlib import Path
 import hashlib
 import json
 
+from storage import create_storage
+from training_export import export_conversations
+
+
 class ConversationLogger:
-    """대화 데이터를 CSV 파일에 로깅하는 클래스"""
+    """대화 데이터를 저장소(CSV 또는 SQLite)에 로깅하는 클래스"""
 
-    def __init__(self, data_dir="conversation_data", consent_required=True):
+    def __init__(self, data_dir="conversation_data", consent_required=True, storage="csv", **storage_options):
         """
         Args:
             data_dir: 데이터를 저장할 디렉토리
             consent_required: 사용자 동의가 필요한지 여부
+            storage: 저장소 종류 ('csv', 'sqlite') 또는 Storage 인스턴스
+            **storage_options: 저장소 설정 (batch_size, flush_interval, fsync_interval 등)
         """
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         self.consent_required = consent_required
 
-        # CSV 파일 경로
-        self.conversations_file = self.data_dir / "conversations.csv"
-        self.analytics_file = self.data_dir / "analytics.csv"
-        self.consent_file = self.data_dir / "user_consents.json"
-
-        # CSV 헤더 초기화
-        self._initialize_csv_files()
-
-    def _initialize_csv_files(self):
-        """CSV 파일 헤더 초기화"""
-        # 대화 기록 CSV
-        if not self.conversations_file.exists():
-            with open(self.conversations_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp',
-                    'user_id',
-                    'session_id',
-                    'user_message',
-                    'buddha_response',
-                    'message_length',
-                    'response_length',
-                    'detected_emotions',
-                    'conversation_turn'
-                ])
-
-        # 분석 데이터 CSV
-        if not self.analytics_file.exists():
-            with open(self.analytics_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'date',
-                    'session_id',
-                    'total_messages',
-                    'avg_message_length',
-                    'session_duration_minutes',
-                    'primary_emotion',
-                    'emotion_progression'
-                ])
+        # 대화/분석/동의 데이터 저장소
+        if isinstance(storage, str):
+            storage = create_storage(storage, self.data_dir, **storage_options)
+        self.storage = storage
 
     def save_consent(self, user_id, consent_given):
         """
@@ -71,19 +40,11 @@ class ConversationLogger:
             user_id: 사용자 고유 ID (해시된 값)
             consent_given: 동의 여부
         """
-        consents = {}
-        if self.consent_file.exists():
-            with open(self.consent_file, 'r', encoding='utf-8') as f:
-                consents = json.load(f)
-
-        consents[user_id] = {
+        self.storage.save_consent(user_id, {
             'consent': consent_given,
             'timestamp': datetime.now().isoformat(),
             'version': '1.0'  # 개인정보처리방침 버전
-        }
-
-        with open(self.consent_file, 'w', encoding='utf-8') as f:
-            json.dump(consents, f, ensure_ascii=False, indent=2)
+        })
 
     def check_consent(self, user_id):
         """
@@ -98,13 +59,8 @@ class ConversationLogger:
         if not self.consent_required:
             return True
 
-        if not self.consent_file.exists():
-            return False
-
-        with open(self.consent_file, 'r', encoding='utf-8') as f:
-            consents = json.load(f)
-
-        return consents.get(user_id, {}).get('consent', False)
+        record = self.storage.get_consent(user_id)
+        return bool(record and record.get('consent', False))
 
     def generate_user_id(self, ip_address=None, user_agent=None):
         """
@@ -131,7 +87,7 @@ class ConversationLogger:
         conversation_turn=1
     ):
         """
-        대화 내용을 CSV에 로깅
+        대화 내용을 저장소에 로깅
 
         Args:
             user_id: 사용자 ID
@@ -151,19 +107,17 @@ class ConversationLogger:
         user_message_cleaned = self._anonymize_message(user_message)
         buddha_response_cleaned = self._anonymize_message(buddha_response)
 
-        with open(self.conversations_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                timestamp,
-                user_id,
-                session_id,
-                user_message_cleaned,
-                buddha_response_cleaned,
-                len(user_message),
-                len(buddha_response),
-                ','.join(detected_emotions) if detected_emotions else '',
-                conversation_turn
-            ])
+        self.storage.log_conversation({
+            'timestamp': timestamp,
+            'user_id': user_id,
+            'session_id': session_id,
+            'user_message': user_message_cleaned,
+            'buddha_response': buddha_response_cleaned,
+            'message_length': len(user_message),
+            'response_length': len(buddha_response),
+            'detected_emotions': ','.join(detected_emotions) if detected_emotions else '',
+            'conversation_turn': conversation_turn
+        })
 
     def _anonymize_message(self, message):
         """
@@ -211,101 +165,107 @@ class ConversationLogger:
         """
         date = datetime.now().date().isoformat()
 
-        with open(self.analytics_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                date,
-                session_id,
-                total_messages,
-                avg_message_length,
-                session_duration_minutes,
-                primary_emotion or 'unknown',
-                emotion_progression or ''
-            ])
-
-    def export_for_training(self, output_file="training_data.csv", min_quality_score=0):
+        self.storage.log_session_analytics({
+            'date': date,
+            'session_id': session_id,
+            'total_messages': total_messages,
+            'avg_message_length': avg_message_length,
+            'session_duration_minutes': session_duration_minutes,
+            'primary_emotion': primary_emotion or 'unknown',
+            'emotion_progression': emotion_progression or ''
+        })
+
+    def flush(self):
+        """대기 중인 로그를 모두 저장소에 기록"""
+        self.storage.flush()
+
+    def close(self):
+        """남은 로그를 기록하고 저장소 정리"""
+        self.storage.close()
+
+    def get_user_conversations(self, user_id, limit=None):
         """
-        모델 학습용 데이터 추출
+        사용자별 대화 기록 조회
 
         Args:
-            output_file: 출력 파일 경로
-            min_quality_score: 최소 품질 점수 (미래 확장용)
+            user_id: 사용자 ID
+            limit: 최근 대화 최대 개수 (None이면 전체)
 
         Returns:
-            str: 생성된 파일 경로
+            list: 대화 기록 (오래된 순)
         """
-        if not self.conversations_file.exists():
-            return None
+        return self.storage.find_conversations(user_id=user_id, limit=limit)
 
-        output_path = self.data_dir / output_file
+    def get_session_conversations(self, session_id, limit=None):
+        """
+        세션별 대화 기록 조회
+
+        Args:
+            session_id: 세션 ID
+            limit: 최근 대화 최대 개수 (None이면 전체)
+
+        Returns:
+            list: 대화 기록 (오래된 순)
+        """
+        return self.storage.find_conversations(session_id=session_id, limit=limit)
 
-        with open(self.conversations_file, 'r', encoding='utf-8') as infile:
-            reader = csv.DictReader(infile)
+    def export_for_training(self, output_file="training_data.csv", min_quality_score=0, output_format=None, **options):
+        """
+        모델 학습용 데이터 추출 (대화 기록을 한 행씩 흘려보내므로 로그 크기와 무관하게 메모리 일정)
 
-            with open(output_path, 'w', newline='', encoding='utf-8') as outfile:
-                writer = csv.writer(outfile)
-                writer.writerow(['user_question', 'buddha_answer', 'emotions'])
+        Args:
+            output_file: 출력 파일 경로 (데이터 디렉토리 기준, 압축 확장자 제외)
+            min_quality_score: 최소 품질 점수 (training_export.quality_score 참고)
+            output_format: 'csv' 또는 'jsonl' (None이면 output_file 확장자로 결정)
+            **options: training_export.export_conversations 옵션
+                (start_date, end_date, emotions, min_turn, max_turn, compression, max_shard_bytes 등)
 
-                for row in reader:
-                    # 품질 필터링 (예: 너무 짧은 대화 제외)
-                    if int(row['message_length']) < 5:
-                        continue
+        Returns:
+            str: 생성된 파일 경로 (max_shard_bytes를 지정하면 파일 경로 리스트)
+        """
+        output_path = self.data_dir / output_file
+        if output_format is None:
+            output_format = 'jsonl' if output_path.suffix == '.jsonl' else 'csv'
 
-                    writer.writerow([
-                        row['user_message'],
-                        row['buddha_response'],
-                        row['detected_emotions']
-                    ])
+        result = export_conversations(
+            self.storage,
+            output_path,
+            output_format=output_format,
+            min_quality_score=min_quality_score,
+            **options
+        )
 
-        return str(output_path)
+        if options.get('max_shard_bytes') is not None:
+            return result['files']
+        return result['files'][0]
 
     def get_statistics(self):
         """
-        저장된 데이터 통계 반환
+        저장된 데이터 통계 반환 (누적 집계 기반, 전체 기록을 다시 읽지 않음)
 
         Returns:
-            dict: 통계 정보
+            dict: 통계 정보 (일별 대화 수, 감정 분포, 턴 분포 포함)
         """
-        if not self.conversations_file.exists():
-            return {
-                'total_conversations': 0,
-                'total_sessions': 0,
-                'avg_conversation_length': 0
-            }
-
-        total_conversations = 0
-        sessions = set()
-        total_message_length = 0
-
-        with open(self.conversations_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                total_conversations += 1
-                sessions.add(row['session_id'])
-                total_message_length += int(row['message_length'])
-
-        return {
-            'total_conversations': total_conversations,
-            'total_sessions': len(sessions),
-            'avg_message_length': total_message_length / total_conversations if total_conversations > 0 else 0
-        }
+        return self.storage.get_statistics()
 
 
 # 글로벌 로거 인스턴스
 _global_logger = None
 
-def get_logger(data_dir="conversation_data", consent_required=True):
+def get_logger(data_dir="conversation_data", consent_required=True, storage="csv", **storage_options):
     """
     글로벌 로거 인스턴스 반환 (싱글톤 패턴)
 
     Args:
         data_dir: 데이터 디렉토리
         consent_required: 동의 필요 여부
+        storage: 저장소 종류 ('csv', 'sqlite')
+        **storage_options: 저장소 설정
 
     Returns:
         ConversationLogger: 로거 인스턴스
     """
     global _global_logger
     if _global_logger is None:
-        _global_logger = ConversationLogger(data_dir, consent_required)
+        _global_logger = ConversationLogger(data_dir, consent_required, storage, **storage_options)
     return _global_logger
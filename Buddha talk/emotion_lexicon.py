@@ -0,0 +1,351 @@
+"""
+감정 키워드 사전
+emotion_lexicon.json의 키워드/가중치/부정 표현을 하나의 오토마톤으로 컴파일하고, 컴파일 결과를 pickle 캐시로 저장해
+다음 시작부터는 JSON 파싱과 오토마톤 구성 없이 바로 불러옴 (사전 내용이나 컴파일 코드가 바뀌면 캐시를 새로 만듦)
+
+사전 형식:
+    emotions   {감정: {키워드: 가중치}} - 여러 감정에 있는 키워드("힘들")는 가장 큰 가중치를 비율대로 나눠 한 번만 반영
+    intensity  modifiers {강도 표현: 배율}, high/low 경계 점수, mass_gain (감정 가중치 합이 1을 넘을 때 1당 강도 증가율)
+    negation   prefixes(키워드 앞: "안 불안해"), suffixes(키워드 뒤: "불안하지 않아", "걱정이 없어")
+    particles  띄어 쓴 키워드("화 나") 사이에 끼어도 되는 조사 ("화가 나", "화나"도 같은 키워드로 인정)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from keyword_matcher import KeywordMatcher
+
+# 기본 사전 파일
+DEFAULT_LEXICON_PATH = Path(__file__).with_name('emotion_lexicon.json')
+
+# 기본 캐시 디렉토리 (바이트코드 캐시와 같은 위치)
+DEFAULT_CACHE_DIR = Path(__file__).with_name('__pycache__')
+
+# 캐시 키에 함께 넣을 컴파일 코드 (바뀌면 이전 캐시를 쓰지 않음)
+_COMPILER_SOURCES = (Path(__file__), Path(__file__).with_name('keyword_matcher.py'))
+
+# 부정 접미 표현 앞에 올 수 있는 어미/조사 글자 수 ("불안[하지] 않아", "걱정[이] 없어")
+NEGATION_SUFFIX_GAP = 3
+
+# 정규화 시 공백으로 바꿀 문자 (문장부호, 기호, 밑줄, 연속 공백)
+_IGNORED_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_for_lexicon(text: str) -> str:
+    """
+    키워드 비교용 정규화 (유니코드 정규화, 소문자, 문장부호와 연속 공백을 공백 하나로)
+
+    Args:
+        text: 원문
+
+    Returns:
+        str: 정규화된 문자열
+    """
+    return _IGNORED_PATTERN.sub(' ', unicodedata.normalize('NFKC', text).lower()).strip()
+
+
+def _phrase_pattern(phrase: str) -> str:
+    """띄어 쓴 표현을 띄어쓰기 유무와 상관없이 찾는 정규식 조각"""
+    return r'\s?'.join(re.escape(word) for word in phrase.split())
+
+
+class EmotionLexicon:
+    """컴파일된 감정 키워드 사전 (가중치, 부정 표현, 조사/띄어쓰기 무시)"""
+
+    def __init__(
+        self,
+        emotions: Dict[str, Dict[str, float]],
+        modifiers: Optional[Dict[str, float]] = None,
+        particles: Iterable[str] = (),
+        negation_prefixes: Iterable[str] = (),
+        negation_suffixes: Iterable[str] = (),
+        high: float = 1.3,
+        low: float = 0.75,
+        mass_gain: float = 0.2
+    ):
+        """
+        Args:
+            emotions: {감정: {키워드: 가중치}} (감정 순서가 결과 순서)
+            modifiers: {강도 표현: 배율}
+            particles: 띄어 쓴 키워드 사이에 올 수 있는 조사
+            negation_prefixes: 키워드 앞에 오면 부정이 되는 표현
+            negation_suffixes: 키워드 뒤에 오면 부정이 되는 표현
+            high: 강도 점수가 이 값 이상이면 high
+            low: 강도 점수가 이 값 미만이면 low
+            mass_gain: 감정 가중치 합이 1을 넘을 때 1당 강도 점수 증가율
+        """
+        self.emotions = list(emotions)
+        self.high = high
+        self.low = low
+        self.mass_gain = mass_gain
+
+        # 키워드 → {감정: 가중치}
+        weights_by_term: Dict[str, Dict[str, float]] = {}
+        for emotion, terms in emotions.items():
+            for term, weight in terms.items():
+                term = normalize_for_lexicon(term)
+                if term and weight > 0:
+                    weights_by_term.setdefault(term, {})[emotion] = float(weight)
+
+        # 여러 감정에 걸친 키워드는 가장 큰 가중치를 감정별 비율로 나눔 (중복 집계 방지)
+        self._term_weights: Dict[str, Tuple[Tuple[str, float], ...]] = {}
+        for term, weights in weights_by_term.items():
+            scale = max(weights.values()) / sum(weights.values())
+            self._term_weights[term] = tuple((emotion, weight * scale) for emotion, weight in weights.items())
+
+        self.emotion_keywords: Dict[str, List[str]] = {emotion: [] for emotion in self.emotions}
+        for term, weights in self._term_weights.items():
+            for emotion, _ in weights:
+                self.emotion_keywords[emotion].append(term)
+
+        self._modifiers: Dict[str, float] = {}
+        for term, weight in (modifiers or {}).items():
+            term = normalize_for_lexicon(term)
+            if term and weight > 0:
+                self._modifiers[term] = float(weight)
+
+        # 띄어 쓴 키워드는 단어별로 오토마톤에 넣고 스캔할 때 이어 붙임 (조사 변형을 펼치지 않아 사전 크기에 비례)
+        particles = [particle for particle in map(normalize_for_lexicon, particles) if particle]
+        self._joints = frozenset(['', ' '] + particles + [particle + ' ' for particle in particles])
+        self._max_joint = max(map(len, self._joints))
+        keyword_labels = []
+        for kind, terms in (('emotion', self._term_weights), ('modifier', self._modifiers)):
+            for term in terms:
+                words = term.split()
+                keyword_labels.extend(
+                    (word, (kind, term, index, len(words))) for index, word in enumerate(words)
+                )
+        self._matcher = KeywordMatcher(keyword_labels)
+
+        prefixes = [prefix for prefix in map(normalize_for_lexicon, negation_prefixes) if prefix]
+        suffixes = [suffix for suffix in map(normalize_for_lexicon, negation_suffixes) if suffix]
+        self._prefix_window = max((len(prefix) for prefix in prefixes), default=0) + 1
+        self._negation_before = re.compile(
+            r'(?<!\S)(?:' + '|'.join(map(_phrase_pattern, prefixes)) + r')\s?$'
+        ) if prefixes else None
+        self._negation_after = re.compile(
+            r'\S{0,%d}?\s?(?:%s)' % (NEGATION_SUFFIX_GAP, '|'.join(map(_phrase_pattern, suffixes)))
+        ) if suffixes else None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'EmotionLexicon':
+        """
+        사전 파일 내용으로 컴파일
+
+        Args:
+            data: emotion_lexicon.json 형식의 dict
+
+        Returns:
+            EmotionLexicon: 컴파일된 사전
+        """
+        if not data.get('emotions'):
+            raise ValueError("감정 사전에 emotions 항목이 없습니다")
+        negation = data.get('negation', {})
+        intensity = data.get('intensity', {})
+        return cls(
+            data['emotions'],
+            modifiers=intensity.get('modifiers'),
+            particles=data.get('particles', ()),
+            negation_prefixes=negation.get('prefixes', ()),
+            negation_suffixes=negation.get('suffixes', ()),
+            high=intensity.get('high', 1.3),
+            low=intensity.get('low', 0.75),
+            mass_gain=intensity.get('mass_gain', 0.2)
+        )
+
+    def _join_words(self, text: str, occurrences: List[List[Tuple[int, int]]]) -> List[Tuple[int, int]]:
+        """
+        띄어 쓴 키워드의 단어별 등장 위치를 이어 붙여 키워드 전체의 위치 계산
+        단어 사이는 비었거나 공백/조사만 있어야 함 ("화나", "화 나", "화가 나", "화가나")
+
+        Args:
+            text: 정규화된 메시지
+            occurrences: 단어 순서별 [(시작, 끝)]
+
+        Returns:
+            list: [(시작, 끝)]
+        """
+        spans = []
+        for start, end in occurrences[0]:
+            for following in occurrences[1:]:
+                end = next((
+                    word_end for word_start, word_end in following
+                    if end <= word_start <= end + self._max_joint and text[end:word_start] in self._joints
+                ), None)
+                if end is None:
+                    break
+            else:
+                spans.append((start, end))
+        return spans
+
+    @staticmethod
+    def _leftmost_longest(spans: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+        """겹치는 매칭 중 가장 왼쪽에서 시작하는 가장 긴 것만 남김 ("좋아질" 안의 "좋아"는 제외)"""
+        selected = []
+        last_end = 0
+        for start, end, term in sorted(spans, key=lambda span: (span[0], span[0] - span[1])):
+            if start >= last_end:
+                selected.append((start, end, term))
+                last_end = end
+        return selected
+
+    def _is_negated(self, text: str, start: int, end: int) -> bool:
+        """키워드 앞뒤에 부정 표현이 있는지 ("안 불안해", "불안하지 않아", "걱정이 없어")"""
+        if self._negation_before is not None and self._negation_before.search(
+                text, max(0, start - self._prefix_window), start):
+            return True
+        return self._negation_after is not None and self._negation_after.match(text, end) is not None
+
+    def scan(self, message: str) -> Tuple[Dict[str, float], float]:
+        """
+        메시지를 한 번 훑어 감정별 가중치 합과 강도 배율 계산
+        같은 키워드는 여러 번 나와도 한 번만, 부정된 키워드는 빼고 반영
+
+        Args:
+            message: 사용자 메시지
+
+        Returns:
+            tuple: ({감정: 가중치 합} (사전 순서), 강도 배율 (강도 표현이 없으면 1.0))
+        """
+        if not message:
+            return {}, 1.0
+        text = normalize_for_lexicon(message)
+
+        spans = {'emotion': [], 'modifier': []}
+        words = {}
+        labels = self._matcher.labels
+        for start, keyword in self._matcher.finditer(text):
+            end = start + len(keyword)
+            for kind, term, index, count in labels[keyword]:
+                if count == 1:
+                    spans[kind].append((start, end, term))
+                else:
+                    words.setdefault((kind, term), [[] for _ in range(count)])[index].append((start, end))
+        for (kind, term), occurrences in words.items():
+            if all(occurrences):
+                spans[kind].extend((start, end, term) for start, end in self._join_words(text, occurrences))
+
+        # 처음 등장한 순서를 유지해 합산 순서(부동소수점 결과)가 항상 같게
+        terms = {}
+        for start, end, term in self._leftmost_longest(spans['emotion']):
+            if term not in terms and not self._is_negated(text, start, end):
+                terms[term] = True
+
+        masses: Dict[str, float] = {}
+        for term in terms:
+            for emotion, weight in self._term_weights[term]:
+                masses[emotion] = masses.get(emotion, 0.0) + weight
+
+        modifier = 1.0
+        for term in dict.fromkeys(term for _, _, term in self._leftmost_longest(spans['modifier'])):
+            modifier *= self._modifiers[term]
+
+        return {emotion: masses[emotion] for emotion in self.emotions if emotion in masses}, modifier
+
+    def intensity_score(self, mass: float, modifier: float) -> float:
+        """
+        강도 점수 (강도 표현 배율 × 감정 가중치 합에 따른 가산, 감정 키워드가 없으면 배율만)
+
+        Args:
+            mass: 감정 가중치 합
+            modifier: 강도 배율
+
+        Returns:
+            float: 강도 점수 (1.0이 보통)
+        """
+        return modifier * (1 + self.mass_gain * (max(mass, 1.0) - 1))
+
+    def intensity_level(self, score: float) -> str:
+        """
+        강도 점수를 단계로 변환
+
+        Args:
+            score: 강도 점수
+
+        Returns:
+            str: high, medium, low
+        """
+        if score >= self.high:
+            return "high"
+        if score < self.low:
+            return "low"
+        return "medium"
+
+
+def load_emotion_lexicon(path=DEFAULT_LEXICON_PATH, cache_dir=DEFAULT_CACHE_DIR) -> EmotionLexicon:
+    """
+    감정 사전 불러오기 (캐시가 있으면 pickle에서 바로, 없으면 JSON을 컴파일해 캐시에 저장)
+
+    Args:
+        path: 사전 JSON 파일
+        cache_dir: 컴파일 결과 캐시 디렉토리 (None이면 캐시를 쓰지 않음)
+            pickle을 불러오므로 다른 사용자가 쓸 수 없는 디렉토리여야 함
+
+    Returns:
+        EmotionLexicon: 컴파일된 사전
+    """
+    data = Path(path).read_bytes()
+    if cache_dir is None:
+        return EmotionLexicon.from_dict(json.loads(data))
+
+    digest = hashlib.sha256(data)
+    for source in _COMPILER_SOURCES:
+        digest.update(source.read_bytes())
+    cache_path = Path(cache_dir) / f"emotion_lexicon.{digest.hexdigest()[:16]}.pickle"
+
+    try:
+        with open(cache_path, 'rb') as f:
+            lexicon = pickle.load(f)
+        if isinstance(lexicon, EmotionLexicon):
+            return lexicon
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # 손상되었거나 호환되지 않는 캐시 → 새로 컴파일
+        print(f"감정 사전 캐시 무시: {e}")
+
+    lexicon = EmotionLexicon.from_dict(json.loads(data))
+    _write_cache(cache_path, lexicon)
+    return lexicon
+
+
+def _write_cache(cache_path: Path, lexicon: EmotionLexicon):
+    """컴파일 결과를 원자적으로 저장하고 이전 캐시 삭제 (저장할 수 없는 환경이면 건너뜀)"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(lexicon, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        for old_path in cache_path.parent.glob('emotion_lexicon.*.pickle'):
+            if old_path != cache_path:
+                old_path.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"감정 사전 캐시 저장 실패: {e}")
+
+
+# 글로벌 사전 인스턴스
+_global_lexicon = None
+
+def get_emotion_lexicon() -> EmotionLexicon:
+    """
+    글로벌 감정 사전 반환 (싱글톤 패턴)
+    EMOTION_LEXICON_PATH로 다른 사전 파일을, EMOTION_LEXICON_CACHE_DIR로 캐시 위치를 지정 (빈 값이면 캐시 끔)
+
+    Returns:
+        EmotionLexicon: 컴파일된 사전
+    """
+    global _global_lexicon
+    if _global_lexicon is None:
+        cache_dir = os.environ.get('EMOTION_LEXICON_CACHE_DIR', str(DEFAULT_CACHE_DIR))
+        _global_lexicon = load_emotion_lexicon(
+            os.environ.get('EMOTION_LEXICON_PATH') or DEFAULT_LEXICON_PATH,
+            cache_dir or None
+        )
+    return _global_lexicon
@@ -3,68 +3,120 @@
 사용자 메시지에서 감정을 추출하고 대화 흐름 분석
 """
 
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Tuple, Optional
 from datetime import datetime
 import json
-from collections import Counter
+import threading
+import time
+from collections import OrderedDict, deque
+
+from crisis_detector import CRISIS_KEYWORDS as _CRISIS_KEYWORDS, get_crisis_detector
+from emotion_lexicon import get_emotion_lexicon
 
 class EmotionTracker:
     """사용자의 감정 상태를 추적하고 분석하는 클래스"""
 
-    # 감정 키워드 사전
-    EMOTION_KEYWORDS = {
-        "슬픔": [
-            "슬프", "우울", "눈물", "외로", "쓸쓸", "허전", "공허",
-            "상실", "그리움", "아쉬움", "애처로", "비참", "암울"
-        ],
-        "분노": [
-            "화", "짜증", "분노", "열받", "미움", "원망", "억울",
-            "불쾌", "약올", "배신", "복수", "증오"
-        ],
-        "불안": [
-            "불안", "걱정", "두렵", "무서", "초조", "긴장", "떨림",
-            "공포", "혼란", "패닉", "조급", "근심"
-        ],
-        "스트레스": [
-            "스트레스", "힘들", "지쳐", "피곤", "압박", "부담", "벅차",
-            "버거", "견딜", "감당", "포기", "한계"
-        ],
-        "자기비난": [
-            "부족", "못나", "한심", "쓸모없", "실패", "자책", "후회",
-            "죄책감", "미안", "창피", "부끄", "수치"
-        ],
-        "고통": [
-            "아프", "고통", "괴롭", "힘들", "견디", "극복", "상처",
-            "트라우마", "악몽", "시달"
-        ],
-        "외로움": [
-            "외로", "혼자", "고립", "단절", "소외", "버림", "이해받지",
-            "무시", "따돌림"
-        ],
-        "행복": [
-            "행복", "기쁘", "즐거", "감사", "만족", "뿌듯", "설레",
-            "좋아", "사랑", "평화", "편안"
-        ],
-        "희망": [
-            "희망", "기대", "긍정", "나아질", "좋아질", "발전", "성장",
-            "가능", "할 수 있"
-        ]
-    }
-
-    # 고통 강도 키워드
-    INTENSITY_KEYWORDS = {
-        "high": ["너무", "정말", "진짜", "완전", "엄청", "극도로", "심하게", "못 견딜"],
-        "medium": ["좀", "조금", "약간", "꽤", "상당히"],
-        "low": ["살짝", "가끔", "때때로", "조금씩"]
-    }
-
-    def __init__(self):
-        self.session_emotions = []  # 세션별 감정 기록
+    # 감정 키워드 사전 (emotion_lexicon.json을 컴파일한 것 - 키워드별 가중치, 부정 표현, 강도 표현 포함)
+    LEXICON = get_emotion_lexicon()
+
+    # 감정별 키워드 (사전 순서, 참고용)
+    EMOTION_KEYWORDS = LEXICON.emotion_keywords
+
+    # 위기 상황 키워드 (자살, 자해 등 - 띄어쓰기/문장부호 변형을 허용하는 crisis_detector에서 관리)
+    CRISIS_KEYWORDS = _CRISIS_KEYWORDS
+
+    @classmethod
+    def _scan(cls, message: str) -> Tuple[Dict[str, float], float]:
+        """
+        메시지를 한 번만 훑어 감정별 가중치 합과 강도 배율 계산
+
+        Args:
+            message: 사용자 메시지
+
+        Returns:
+            tuple: ({감정: 가중치 합}, 강도 배율)
+        """
+        return cls.LEXICON.scan(message)
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Args:
+            max_entries: 세션당 보관할 최대 감정 기록 수 (None이면 무제한, 1 이상)
+        """
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f"max_entries는 1 이상이어야 합니다: {max_entries}")
+        self.max_entries = max_entries
+        self.session_emotions = deque(maxlen=max_entries)  # 세션별 감정 기록
         self.session_start_time = datetime.now()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        """세션 요약용 누적 카운터 초기화"""
+        # 감정/valence별 등장 위치 (보관 중인 기록 기준, 오래된 순)
+        self._emotion_positions: Dict[str, deque] = {}
+        self._valence_positions: Dict[str, deque] = {}
+        self._progression = deque(maxlen=self.max_entries)
+        self._sequence = 0
+
+    def _record(self, result: Dict[str, any]):
+        """
+        감정 기록 추가 및 누적 카운터 갱신
+
+        Args:
+            result: analyze_emotion 결과
+        """
+        if self.max_entries is not None and len(self.session_emotions) == self.max_entries:
+            # 가장 오래된 기록이 밀려나므로 카운터에서도 제외
+            evicted = self.session_emotions[0]
+            self._forget(self._emotion_positions, evicted["primary_emotion"])
+            self._forget(self._valence_positions, evicted["valence"])
+
+        self.session_emotions.append(result)
+        self._progression.append(result["primary_emotion"])
+        self._emotion_positions.setdefault(result["primary_emotion"], deque()).append(self._sequence)
+        self._valence_positions.setdefault(result["valence"], deque()).append(self._sequence)
+        self._sequence += 1
+
+    @staticmethod
+    def _forget(positions: Dict[str, deque], key: str):
+        """가장 오래된 등장 위치 하나 제거 (남은 것이 없으면 키 삭제)"""
+        positions[key].popleft()
+        if not positions[key]:
+            del positions[key]
+
+    @staticmethod
+    def _ordered_counts(positions: Dict[str, deque]) -> Dict[str, int]:
+        """
+        처음 등장한 순서대로 정렬된 빈도 반환 (Counter와 같은 순서)
+
+        Args:
+            positions: 키별 등장 위치
+
+        Returns:
+            dict: {키: 빈도}
+        """
+        ordered = sorted(positions.items(), key=lambda item: item[1][0])
+        return {key: len(seen) for key, seen in ordered}
+
+    @staticmethod
+    def _most_common(positions: Dict[str, deque], default: str) -> str:
+        """
+        가장 많이 등장한 키 반환 (동률이면 먼저 등장한 키)
+
+        Args:
+            positions: 키별 등장 위치
+            default: 기록이 없을 때 반환할 값
+
+        Returns:
+            str: 최빈 키
+        """
+        if not positions:
+            return default
+        return min(positions.items(), key=lambda item: (-len(item[1]), item[1][0]))[0]
 
     def analyze_emotion(self, message: str) -> Dict[str, any]:
         """
-        메시지에서 감정 분석
+        메시지에서 감정 분석 후 세션 기록에 추가
 
         Args:
             message: 사용자 메시지
@@ -72,60 +124,78 @@ class EmotionTracker:
         Returns:
             dict: 감정 분석 결과
         """
-        detected_emotions = []
-        emotion_scores = {}
+        result = self.score(message)
+
+        # 세션 기록에 추가
+        self._record(result)
+
+        return result
+
+    @classmethod
+    def score(cls, message: str) -> Dict[str, any]:
+        """
+        세션 기록 없이 메시지 하나의 감정 분석 (상태를 바꾸지 않으므로 여러 스레드/프로세스에서 호출 가능)
 
-        # 각 감정별 키워드 매칭
-        for emotion, keywords in self.EMOTION_KEYWORDS.items():
-            score = 0
-            for keyword in keywords:
-                if keyword in message:
-                    score += 1
-            if score > 0:
-                emotion_scores[emotion] = score
-                detected_emotions.append(emotion)
+        Args:
+            message: 사용자 메시지
+
+        Returns:
+            dict: 감정 분석 결과 (analyze_emotion과 같은 형식)
+        """
+        # 감정/강도 키워드를 한 번에 매칭 (사전 순서 유지)
+        hits = cls._scan(message)
+        masses, _ = hits
+        detected_emotions = list(masses)
+
+        # 감정별 점수는 전체 가중치 합 대비 비율 (합계 1)
+        total = sum(masses.values())
+        emotion_scores = {emotion: round(mass / total, 3) for emotion, mass in masses.items()}
 
         # 고통 강도 분석
-        intensity = self._analyze_intensity(message)
+        intensity_score = cls._intensity_score(hits)
+        intensity = cls.LEXICON.intensity_level(intensity_score)
 
-        # 주요 감정 추출 (가장 높은 스코어)
-        primary_emotion = max(emotion_scores, key=emotion_scores.get) if emotion_scores else "중립"
+        # 주요 감정 추출 (가장 높은 가중치 합, 동률이면 사전 순서상 앞의 감정)
+        primary_emotion = max(masses, key=masses.get) if masses else "중립"
 
         # 긍정/부정 판단
-        valence = self._analyze_valence(detected_emotions)
+        valence = cls._analyze_valence(detected_emotions)
 
-        result = {
+        return {
             "primary_emotion": primary_emotion,
             "all_emotions": detected_emotions,
             "emotion_scores": emotion_scores,
             "intensity": intensity,
+            "intensity_score": round(intensity_score, 3),
             "valence": valence,  # positive, negative, neutral
-            "needs_crisis_support": self._check_crisis_keywords(message),
+            "needs_crisis_support": cls._check_crisis_keywords(message),
             "timestamp": datetime.now().isoformat()
         }
 
-        # 세션 기록에 추가
-        self.session_emotions.append(result)
-
-        return result
-
-    def _analyze_intensity(self, message: str) -> str:
+    @classmethod
+    def _analyze_intensity(cls, message: str, hits: Tuple[Dict[str, float], float] = None) -> str:
         """
         감정의 강도 분석
 
         Args:
             message: 메시지
+            hits: 이미 계산된 매칭 결과 (없으면 새로 스캔)
 
         Returns:
             str: high, medium, low
         """
-        for intensity, keywords in self.INTENSITY_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in message:
-                    return intensity
-        return "medium"
-
-    def _analyze_valence(self, emotions: List[str]) -> str:
+        if hits is None:
+            hits = cls._scan(message)
+        return cls.LEXICON.intensity_level(cls._intensity_score(hits))
+
+    @classmethod
+    def _intensity_score(cls, hits: Tuple[Dict[str, float], float]) -> float:
+        """강도 표현 배율과 감정 가중치 합으로 강도 점수 계산 (1.0이 보통)"""
+        masses, modifier = hits
+        return cls.LEXICON.intensity_score(sum(masses.values()), modifier)
+
+    @staticmethod
+    def _analyze_valence(emotions: List[str]) -> str:
         """
         감정의 긍정/부정 판단
 
@@ -148,9 +218,10 @@ class EmotionTracker:
         else:
             return "neutral"
 
-    def _check_crisis_keywords(self, message: str) -> bool:
+    @staticmethod
+    def _check_crisis_keywords(message: str) -> bool:
         """
-        위기 상황 키워드 체크 (자살, 자해 등)
+        위기 상황 키워드 체크 (자살, 자해 등 - "죽고 싶어"처럼 띄어 써도 감지)
 
         Args:
             message: 메시지
@@ -158,12 +229,7 @@ class EmotionTracker:
         Returns:
             bool: 위기 상황 여부
         """
-        crisis_keywords = [
-            "자살", "죽고싶", "죽어버리", "살기싫", "사라지고싶",
-            "자해", "칼", "손목", "투신", "목매", "끝내고싶"
-        ]
-
-        return any(keyword in message for keyword in crisis_keywords)
+        return get_crisis_detector().is_crisis(message)
 
     def get_emotion_progression(self) -> List[str]:
         """
@@ -172,11 +238,23 @@ class EmotionTracker:
         Returns:
             list: 감정 변화 리스트
         """
-        return [emotion["primary_emotion"] for emotion in self.session_emotions]
+        return list(self._progression)
 
-    def get_session_summary(self) -> Dict[str, any]:
+    def get_dominant_emotion(self) -> str:
         """
-        현재 세션의 감정 요약
+        세션 동안 가장 많이 나타난 감정 반환
+
+        Returns:
+            str: 주요 감정 (기록이 없으면 중립)
+        """
+        return self._most_common(self._emotion_positions, "중립")
+
+    def get_session_summary(self, include_progression: bool = True) -> Dict[str, any]:
+        """
+        현재 세션의 감정 요약 (누적 카운터 기반)
+
+        Args:
+            include_progression: 감정 변화 추이 포함 여부
 
         Returns:
             dict: 세션 요약 정보
@@ -191,26 +269,24 @@ class EmotionTracker:
             }
 
         # 가장 많이 나타난 감정
-        all_primary_emotions = [e["primary_emotion"] for e in self.session_emotions]
-        emotion_counter = Counter(all_primary_emotions)
-        dominant_emotion = emotion_counter.most_common(1)[0][0] if emotion_counter else "중립"
+        dominant_emotion = self.get_dominant_emotion()
 
         # 전체 valence 계산
-        valences = [e["valence"] for e in self.session_emotions]
-        valence_counter = Counter(valences)
-        overall_valence = valence_counter.most_common(1)[0][0] if valence_counter else "neutral"
+        overall_valence = self._most_common(self._valence_positions, "neutral")
 
         # 세션 지속 시간
         duration = (datetime.now() - self.session_start_time).total_seconds() / 60
 
-        return {
+        summary = {
             "total_messages": len(self.session_emotions),
             "dominant_emotion": dominant_emotion,
-            "emotion_distribution": dict(emotion_counter),
+            "emotion_distribution": self._ordered_counts(self._emotion_positions),
             "overall_valence": overall_valence,
-            "session_duration_minutes": round(duration, 2),
-            "emotion_progression": self.get_emotion_progression()
+            "session_duration_minutes": round(duration, 2)
         }
+        if include_progression:
+            summary["emotion_progression"] = self.get_emotion_progression()
+        return summary
 
     def suggest_meditation(self) -> Dict[str, str]:
         """
@@ -226,8 +302,7 @@ class EmotionTracker:
                 "duration": "5-10분"
             }
 
-        summary = self.get_session_summary()
-        dominant_emotion = summary["dominant_emotion"]
+        dominant_emotion = self.get_dominant_emotion()
 
         meditation_map = {
             "분노": {
@@ -274,21 +349,156 @@ class EmotionTracker:
 
     def reset_session(self):
         """새로운 세션 시작 (데이터 초기화)"""
-        self.session_emotions = []
+        self.session_emotions = deque(maxlen=self.max_entries)
         self.session_start_time = datetime.now()
+        self._reset_counters()
+
+
+def analyze_batch(messages: Iterable[str]) -> List[Dict[str, any]]:
+    """
+    여러 메시지를 세션 기록 없이 한 번에 분석 (과거 대화 재채점, 백필용)
+
+    Args:
+        messages: 사용자 메시지들
+
+    Returns:
+        list: 메시지 순서대로의 감정 분석 결과 (EmotionTracker.score와 같은 형식)
+    """
+    return [EmotionTracker.score(message) for message in messages]
+
+
+class TrackerRegistry:
+    """세션 ID별 EmotionTracker 보관소 (LRU + 유휴 시간 기반 정리)"""
+
+    def __init__(
+        self,
+        max_sessions=10000,
+        idle_ttl_seconds=3600,
+        max_entries_per_session=200,
+        max_total_entries=200000,
+        sweep_interval_seconds=60
+    ):
+        """
+        Args:
+            max_sessions: 동시에 보관할 최대 세션 수 (초과 시 가장 오래 안 쓴 세션부터 제거)
+            idle_ttl_seconds: 이 시간 동안 접근이 없으면 세션 제거
+            max_entries_per_session: 세션당 보관할 최대 감정 기록 수 (1 이상)
+            max_total_entries: 전체 세션의 감정 기록 합계 상한 (메모리 상한)
+            sweep_interval_seconds: 전체 기록 수 점검 주기
+        """
+        if max_entries_per_session < 1:
+            raise ValueError(
+                f"세션당 감정 기록 수(TRACKER_MAX_ENTRIES_PER_SESSION)는 1 이상이어야 합니다: {max_entries_per_session}"
+            )
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_entries_per_session = max_entries_per_session
+        self.max_total_entries = max_total_entries
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        self._trackers = OrderedDict()  # session_id -> (tracker, 마지막 접근 시각)
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get(self, session_id: str) -> EmotionTracker:
+        """
+        세션의 트래커 반환 (없으면 생성)
+
+        Args:
+            session_id: 세션 ID
+
+        Returns:
+            EmotionTracker: 해당 세션 전용 트래커
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._trackers.pop(session_id, None)
+            tracker = entry[0] if entry else EmotionTracker(self.max_entries_per_session)
+            self._trackers[session_id] = (tracker, now)
+
+            self._evict_idle(now)
+            while len(self._trackers) > self.max_sessions:
+                self._trackers.popitem(last=False)
+
+            if now - self._last_sweep >= self.sweep_interval_seconds:
+                self._enforce_total_entries()
+                self._last_sweep = now
+
+        return tracker
+
+    def discard(self, session_id: str):
+        """
+        세션 트래커 제거
+
+        Args:
+            session_id: 세션 ID
+        """
+        with self._lock:
+            self._trackers.pop(session_id, None)
+
+    def _evict_idle(self, now: float):
+        """유휴 시간이 지난 세션 제거 (가장 오래된 것부터 확인)"""
+        while self._trackers:
+            _, last_access = next(iter(self._trackers.values()))
+            if now - last_access < self.idle_ttl_seconds:
+                break
+            self._trackers.popitem(last=False)
+
+    def _enforce_total_entries(self):
+        """전체 감정 기록 수가 상한을 넘으면 오래된 세션부터 제거"""
+        total = sum(len(tracker.session_emotions) for tracker, _ in self._trackers.values())
+        while total > self.max_total_entries and len(self._trackers) > 1:
+            _, (tracker, _) = self._trackers.popitem(last=False)
+            total -= len(tracker.session_emotions)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        보관 현황 반환
+
+        Returns:
+            dict: 세션 수와 전체 감정 기록 수
+        """
+        with self._lock:
+            return {
+                "sessions": len(self._trackers),
+                "total_entries": sum(
+                    len(tracker.session_emotions) for tracker, _ in self._trackers.values()
+                )
+            }
 
 
 # 글로벌 트래커 인스턴스
 _global_tracker = None
+_global_registry = None
 
-def get_tracker():
+def get_tracker(session_id: Optional[str] = None):
     """
-    글로벌 감정 트래커 반환
+    감정 트래커 반환
+
+    Args:
+        session_id: 세션 ID (주어지면 세션별 트래커, 없으면 글로벌 트래커)
 
     Returns:
         EmotionTracker: 트래커 인스턴스
     """
     global _global_tracker
+    if session_id is not None:
+        return get_registry().get(session_id)
     if _global_tracker is None:
         _global_tracker = EmotionTracker()
     return _global_tracker
+
+def get_registry(**kwargs):
+    """
+    글로벌 세션 트래커 보관소 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 최초 생성 시 TrackerRegistry에 전달할 설정
+
+    Returns:
+        TrackerRegistry: 보관소 인스턴스
+    """
+    global _global_registry
+    if _global_registry is None:
+        _global_registry = TrackerRegistry(**kwargs)
+    return _global_registry
@@ -0,0 +1,32 @@
+"""
+파일 잠금 유틸리티
+여러 gunicorn 워커가 같은 데이터 파일을 다룰 때 사용하는 flock 래퍼
+"""
+
+try:
+    import fcntl  # POSIX 전용
+except ImportError:
+    fcntl = None
+
+
+def lock_file(f, exclusive=True):
+    """
+    파일 잠금 (fcntl이 없는 환경에서는 생략)
+
+    Args:
+        f: 열린 파일 객체
+        exclusive: 배타 잠금 여부 (False면 공유 잠금)
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def unlock_file(f):
+    """
+    파일 잠금 해제
+
+    Args:
+        f: 열린 파일 객체
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
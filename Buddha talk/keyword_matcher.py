@@ -0,0 +1,119 @@
+"""
+다중 키워드 매칭 엔진
+Aho-Corasick 오토마톤으로 여러 키워드 사전을 한 번의 선형 스캔으로 검색
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """키워드마다 라벨을 달아 두고, 메시지를 한 번만 훑어 등장한 키워드를 찾는 클래스"""
+
+    def __init__(self, keyword_labels: Iterable[Tuple[str, Hashable]]):
+        """
+        Args:
+            keyword_labels: (키워드, 라벨) 쌍의 목록
+                같은 키워드가 여러 라벨에 속할 수 있음 (예: "힘들" → 스트레스, 고통)
+        """
+        self.labels: Dict[str, List[Hashable]] = {}
+        for keyword, label in keyword_labels:
+            if not keyword:
+                continue
+            self.labels.setdefault(keyword, []).append(label)
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[str, ...]] = [()]
+        self._build()
+
+    def _build(self):
+        """트라이 구성 후 BFS로 실패 링크와 출력 집합 계산"""
+        for keyword in self.labels:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state] = self._output[state] + (keyword,)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def find(self, text: str) -> Set[str]:
+        """
+        텍스트에 등장한 키워드 집합 반환 (겹치는 키워드 포함)
+
+        Args:
+            text: 검색할 텍스트
+
+        Returns:
+            set: 등장한 키워드
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found = set()
+        state = 0
+
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return found
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        텍스트에 등장한 키워드를 위치와 함께 모두 반환 (겹치는 키워드, 반복 등장 포함)
+
+        Args:
+            text: 검색할 텍스트
+
+        Yields:
+            tuple: (시작 위치, 키워드) - 끝 위치 순
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                yield end - len(keyword), keyword
+
+    def match(self, text: str) -> Dict[Hashable, int]:
+        """
+        라벨별로 등장한 서로 다른 키워드 수 반환
+
+        Args:
+            text: 검색할 텍스트
+
+        Returns:
+            dict: {라벨: 매칭된 키워드 수}
+        """
+        counts: Dict[Hashable, int] = {}
+        for keyword in self.find(text):
+            for label in self.labels[keyword]:
+                counts[label] = counts.get(label, 0) + 1
+        return counts
@@ -0,0 +1,504 @@
+"""
+LLM 호출 스케줄러
+모든 OpenAI 응답 생성 호출 앞에서 요청을 조율해, 트래픽이 몰려도 429 오류로 무너지지 않고
+예측 가능한 대기 시간 안에 처리
+
+- 분당 요청 수/토큰 수 토큰 버킷 (OpenAI 사용량 한도에 맞춤)
+- 우선순위 대기열 (고통이 큰 메시지 → 이어지는 대화 → 새 대화, 같은 순위는 먼저 온 순)
+- 적응형 동시 실행 한도 (429를 받으면 절반으로, 성공하면 조금씩 늘림)
+- 429 재시도 (지터를 준 지수 백오프, Retry-After 헤더 존중)
+- 같은 프롬프트가 동시에 들어오면 한 번만 호출하고 결과 공유 (single-flight)
+
+동기(Flask 워커 스레드)와 비동기(ASGI 이벤트 루프) 호출 모두 같은 대기열을 사용
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import openai
+
+# 우선순위 (작을수록 먼저)
+PRIORITY_URGENT = 0      # 고통이 큰 메시지 (위기에 가까운 상황)
+PRIORITY_RETURNING = 1   # 이어지는 대화
+PRIORITY_NORMAL = 2      # 새 대화
+
+
+class SchedulerBusy(Exception):
+    """대기열이 가득 찼거나 대기 시간이 한도를 넘음"""
+
+
+class TokenBucket:
+    """분당 한도를 초당 보충량으로 나눠 채우는 토큰 버킷 (한도가 0이면 제한 없음)"""
+
+    def __init__(self, per_minute, burst_seconds=10):
+        """
+        Args:
+            per_minute: 분당 한도 (0이면 제한 없음)
+            burst_seconds: 한꺼번에 쓸 수 있는 양 (이 시간 동안 보충되는 양만큼)
+        """
+        self.per_minute = per_minute
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount, now):
+        """
+        amount를 꺼낼 수 있을 때까지 남은 시간 (초)
+        버킷보다 큰 요청은 버킷이 가득 찼을 때 허용 (모자란 만큼은 이후 보충에서 갚음)
+        """
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount):
+        if self.per_minute:
+            self.level -= amount
+
+    def refund(self, amount):
+        if self.per_minute:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    """대기열 항목 (허가되면 실행 권한, 끝나면 release로 반납)"""
+
+    __slots__ = ('priority', 'sequence', 'tokens', 'enqueued', 'granted', 'wake')
+
+    def __init__(self, priority, sequence, tokens, wake):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.wake = wake
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+def _usage_tokens(response):
+    """응답에 기록된 실제 사용 토큰 수 (없으면 None)"""
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', None)
+
+
+class LLMScheduler:
+    """OpenAI 호출 스케줄러 (토큰 버킷 + 우선순위 대기열 + 적응형 동시 실행 한도)"""
+
+    def __init__(
+        self,
+        requests_per_minute=0,
+        tokens_per_minute=0,
+        max_concurrency=64,
+        min_concurrency=4,
+        burst_seconds=10,
+        max_queue_size=1000,
+        max_wait_seconds=30,
+        max_retries=3,
+        backoff_base_seconds=0.5,
+        backoff_max_seconds=8.0
+    ):
+        """
+        Args:
+            requests_per_minute: 분당 최대 요청 수 (0이면 제한 없음)
+            tokens_per_minute: 분당 최대 토큰 수 (프롬프트 + max_tokens로 예약, 끝나면 실제 사용량으로 정산)
+            max_concurrency: 동시에 실행할 최대 요청 수
+            min_concurrency: 429를 받아 한도를 줄일 때의 하한
+            burst_seconds: 토큰 버킷이 한꺼번에 허용하는 양 (이 시간 동안 보충되는 양)
+            max_queue_size: 대기열 최대 길이 (넘으면 바로 SchedulerBusy)
+            max_wait_seconds: 대기열 최대 대기 시간 (넘으면 SchedulerBusy)
+            max_retries: 429 재시도 횟수
+            backoff_base_seconds: 첫 재시도 전 최대 대기 시간 (재시도마다 두 배)
+            backoff_max_seconds: 재시도 대기 시간 상한
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+        self._requests = TokenBucket(requests_per_minute, burst_seconds)
+        self._tokens = TokenBucket(tokens_per_minute, burst_seconds)
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+        # 합치기 키 → 먼저 온 호출의 결과 Future
+        self._coalesced = {}
+
+        self._wait_samples = deque(maxlen=1024)
+        self._metrics = {
+            'granted': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'coalesced': 0,
+            'rate_limited': 0,
+            'retries': 0,
+            'max_queue_depth': 0,
+            'total_wait_seconds': 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # 동기 호출
+
+    def call(self, fn, priority=PRIORITY_NORMAL, tokens=0, coalesce_key=None):
+        """
+        허가를 받은 뒤 fn() 실행 (429면 백오프 후 재시도)
+
+        Args:
+            fn: OpenAI 호출 함수 (인자 없음)
+            priority: 우선순위 (PRIORITY_*)
+            tokens: 예약할 토큰 수 (프롬프트 + max_tokens)
+            coalesce_key: 같은 키의 호출이 진행 중이면 그 결과를 공유 (None이면 합치지 않음)
+
+        Returns:
+            fn()의 결과
+        """
+        if coalesce_key is None:
+            return self._run(fn, priority, tokens)[0]
+
+        future, leader = self._join(coalesce_key)
+        if not leader:
+            return future.result()
+        return self._lead(future, coalesce_key, lambda: self._run(fn, priority, tokens)[0])
+
+    def open_stream(self, fn, priority=PRIORITY_NORMAL, tokens=0):
+        """
+        스트리밍 호출 시작 (스트림이 끝날 때까지 실행 권한 유지)
+
+        Args:
+            fn: 스트림을 여는 OpenAI 호출 함수
+            priority: 우선순위
+            tokens: 예약할 토큰 수
+
+        Returns:
+            tuple: (스트림, 스트림이 끝나면 release에 넘길 Ticket)
+        """
+        return self._run(fn, priority, tokens, hold=True)
+
+    def acquire(self, priority=PRIORITY_NORMAL, tokens=0):
+        """
+        실행 허가를 받을 때까지 대기
+
+        Returns:
+            Ticket: 허가된 항목
+
+        Raises:
+            SchedulerBusy: 대기열이 가득 찼거나 대기 시간 초과
+        """
+        event = threading.Event()
+        ticket = self._enqueue(priority, tokens, event.set)
+        while True:
+            timeout = self._poll(ticket)
+            if timeout is None:
+                return ticket
+            event.wait(timeout)
+            event.clear()
+
+    def release(self, ticket, used_tokens=None, rate_limited=False):
+        """
+        실행 권한 반납
+
+        Args:
+            ticket: acquire 결과
+            used_tokens: 실제 사용 토큰 수 (예약보다 적으면 차액을 버킷에 돌려줌)
+            rate_limited: 429를 받았는지 여부 (동시 실행 한도를 절반으로 줄임)
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if used_tokens is not None and used_tokens < ticket.tokens:
+                self._tokens.refund(ticket.tokens - used_tokens)
+            if rate_limited:
+                self._metrics['rate_limited'] += 1
+                self._limit = max(float(self.min_concurrency), self._limit / 2)
+            else:
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+            self._dispatch()
+
+    def _run(self, fn, priority, tokens, hold=False):
+        """허가 → 실행 → 429면 반납 후 백오프 재시도 (hold면 성공 시 권한을 유지한 채 반환)"""
+        for attempt in itertools.count():
+            ticket = self.acquire(priority, tokens)
+            try:
+                result = fn()
+            except openai.RateLimitError as e:
+                self.release(ticket, rate_limited=True)
+                if attempt >= self.max_retries:
+                    raise
+                self._count_retry()
+                time.sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                self.release(ticket)
+                raise
+
+            if hold:
+                return result, ticket
+            self.release(ticket, _usage_tokens(result))
+            return result, None
+
+    # ------------------------------------------------------------------
+    # 비동기 호출 (ASGI)
+
+    async def acall(self, fn, priority=PRIORITY_NORMAL, tokens=0, coalesce_key=None):
+        """call의 비동기 버전 (fn은 코루틴을 반환하는 함수)"""
+        if coalesce_key is None:
+            return (await self._arun(fn, priority, tokens))[0]
+
+        future, leader = self._join(coalesce_key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = (await self._arun(fn, priority, tokens))[0]
+        except BaseException as e:
+            self._finish_lead(future, coalesce_key, error=e)
+            raise
+        self._finish_lead(future, coalesce_key, result=result)
+        return result
+
+    async def aopen_stream(self, fn, priority=PRIORITY_NORMAL, tokens=0):
+        """open_stream의 비동기 버전"""
+        return await self._arun(fn, priority, tokens, hold=True)
+
+    async def aacquire(self, priority=PRIORITY_NORMAL, tokens=0):
+        """acquire의 비동기 버전 (이벤트 루프를 막지 않음)"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        ticket = self._enqueue(priority, tokens, lambda: loop.call_soon_threadsafe(event.set))
+        try:
+            while True:
+                timeout = self._poll(ticket)
+                if timeout is None:
+                    return ticket
+                try:
+                    await asyncio.wait_for(event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except asyncio.CancelledError:
+            # 기다리던 요청이 취소됨 (클라이언트 연결 끊김 등) → 대기열에서 빼거나 받은 권한 반납
+            with self._lock:
+                granted = ticket.granted
+                if not granted:
+                    self._remove(ticket)
+            if granted:
+                self.release(ticket)
+            raise
+
+    async def _arun(self, fn, priority, tokens, hold=False):
+        """_run의 비동기 버전"""
+        for attempt in itertools.count():
+            ticket = await self.aacquire(priority, tokens)
+            try:
+                result = await fn()
+            except openai.RateLimitError as e:
+                self.release(ticket, rate_limited=True)
+                if attempt >= self.max_retries:
+                    raise
+                self._count_retry()
+                await asyncio.sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                self.release(ticket)
+                raise
+
+            if hold:
+                return result, ticket
+            self.release(ticket, _usage_tokens(result))
+            return result, None
+
+    # ------------------------------------------------------------------
+    # 지표
+
+    def stats(self):
+        """
+        대기열/처리 지표
+
+        Returns:
+            dict: 현재 대기열 길이, 실행 중인 요청 수, 동시 실행 한도, 누적 지표, 최근 대기 시간 분포
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['queue_depth'] = len(self._queue)
+            metrics['in_flight'] = self._in_flight
+            metrics['concurrency_limit'] = int(self._limit)
+            samples = sorted(self._wait_samples)
+
+        granted = metrics['granted']
+        metrics['average_wait_seconds'] = metrics.pop('total_wait_seconds') / granted if granted else 0.0
+        for name, fraction in (('p50', 0.5), ('p99', 0.99)):
+            metrics[f'{name}_wait_seconds'] = samples[int(fraction * (len(samples) - 1))] if samples else 0.0
+        metrics['max_wait_seconds'] = samples[-1] if samples else 0.0
+        return metrics
+
+    # ------------------------------------------------------------------
+    # 내부 구현
+
+    def _enqueue(self, priority, tokens, wake):
+        """대기열에 추가 (가득 찼으면 SchedulerBusy)"""
+        with self._lock:
+            if len(self._queue) >= self.max_queue_size:
+                self._metrics['rejected'] += 1
+                raise SchedulerBusy("대기 중인 요청이 너무 많습니다")
+            ticket = Ticket(priority, next(self._sequence), tokens, wake)
+            heapq.heappush(self._queue, ticket)
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], len(self._queue))
+            self._dispatch()
+        return ticket
+
+    def _poll(self, ticket):
+        """
+        허가 여부 확인
+
+        Returns:
+            float: 다시 확인할 때까지 기다릴 시간 (허가되었으면 None)
+
+        Raises:
+            SchedulerBusy: 대기 시간 초과
+        """
+        with self._lock:
+            if ticket.granted:
+                return None
+            delay = self._dispatch(poller=ticket)
+            if ticket.granted:
+                return None
+
+            remaining = ticket.enqueued + self.max_wait_seconds - time.monotonic()
+            if remaining <= 0:
+                self._remove(ticket)
+                self._metrics['timeouts'] += 1
+                raise SchedulerBusy("대기 시간이 한도를 넘었습니다")
+
+            # 토큰 보충을 기다리는 맨 앞 항목만 타이머로 깨어나고, 나머지는 반납/허가 신호를 기다림
+            if delay is not None and self._queue and self._queue[0] is ticket:
+                return min(delay, remaining)
+            return remaining
+
+    def _dispatch(self, poller=None):
+        """
+        대기열 앞에서부터 실행 가능한 만큼 허가 (잠금 보유 상태에서 호출)
+        맨 앞 항목이 토큰 보충을 기다려야 하면 그 항목을 깨워 보충 타이머를 맡김
+        (앞 항목이 허가되어 새로 맨 앞이 되었거나, 동시 실행 한도 때문에 타이머 없이 자고 있을 수 있음)
+
+        Args:
+            poller: 지금 _poll 중인 항목 (스스로 타이머를 잡으므로 깨우지 않음)
+
+        Returns:
+            float: 맨 앞 항목이 토큰 보충을 기다려야 하는 시간 (동시 실행 한도 때문이거나 대기열이 비었으면 None)
+        """
+        now = time.monotonic()
+        while self._queue:
+            if self._in_flight >= int(self._limit):
+                return None
+
+            head = self._queue[0]
+            delay = max(self._requests.delay(1, now), self._tokens.delay(head.tokens, now))
+            if delay > 0:
+                if head is not poller:
+                    head.wake()
+                return delay
+
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(head.tokens)
+            self._in_flight += 1
+
+            waited = now - head.enqueued
+            self._wait_samples.append(waited)
+            self._metrics['granted'] += 1
+            self._metrics['total_wait_seconds'] += waited
+
+            head.granted = True
+            head.wake()
+        return None
+
+    def _remove(self, ticket):
+        """허가되지 않은 항목을 대기열에서 제거 (잠금 보유 상태에서 호출)"""
+        was_head = bool(self._queue) and self._queue[0] is ticket
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        if was_head and self._queue:
+            # 새 맨 앞 항목이 토큰 보충 타이머를 이어받도록 깨움
+            self._queue[0].wake()
+
+    def _join(self, key):
+        """같은 키의 진행 중인 호출에 합류 (없으면 새로 맡음)"""
+        with self._lock:
+            future = self._coalesced.get(key)
+            if future is not None:
+                self._metrics['coalesced'] += 1
+                return future, False
+            future = Future()
+            self._coalesced[key] = future
+            return future, True
+
+    def _lead(self, future, key, run):
+        """합치기 대표 호출 실행 후 결과를 합류한 호출들과 공유"""
+        try:
+            result = run()
+        except BaseException as e:
+            self._finish_lead(future, key, error=e)
+            raise
+        self._finish_lead(future, key, result=result)
+        return result
+
+    def _finish_lead(self, future, key, result=None, error=None):
+        with self._lock:
+            self._coalesced.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _count_retry(self):
+        with self._lock:
+            self._metrics['retries'] += 1
+
+    def _backoff(self, attempt, error):
+        """재시도 전 대기 시간 (full jitter 지수 백오프, Retry-After가 있으면 그 이상)"""
+        delay = self._random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            delay = max(delay, min(float(retry_after), self.backoff_max_seconds))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+
+# 글로벌 스케줄러 인스턴스
+_global_scheduler = None
+
+def get_llm_scheduler(**kwargs):
+    """
+    글로벌 LLM 호출 스케줄러 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 처음 생성할 때 LLMScheduler 설정
+
+    Returns:
+        LLMScheduler: 스케줄러
+    """
+    global _global_scheduler
+    if _global_scheduler is None:
+        _global_scheduler = LLMScheduler(**kwargs)
+    return _global_scheduler
@@ -0,0 +1,441 @@
+"""
+Prometheus 형식 지표
+요청/처리 단계별 지연 히스토그램과 토큰/캐시/오류 카운터를 프로세스 메모리에 모으고 텍스트 형식으로 출력
+
+워커가 여러 개면 각 워커가 공유 디렉토리(METRICS_DIR)에 자기 지표 스냅샷을 주기적으로 쓰고,
+/metrics는 모든 워커의 스냅샷을 합쳐 출력 (어느 워커가 요청을 받아도 같은 전체 지표)
+
+스냅샷은 서버 실행(마스터 프로세스)별 하위 디렉토리에 프로세스마다 다른 이름으로 기록하고,
+종료된 워커의 스냅샷은 retired.json에 더해 둠 (재시작된 워커나 PID 재사용으로 카운터가 줄지 않음)
+이전 실행의 디렉토리는 합산하지 않고, 그 마스터가 종료되었으면 시작할 때 지움
+"""
+
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from file_locks import lock_file, unlock_file
+
+# 히스토그램 기본 구간 (초) - 수 밀리초 단위의 전처리부터 수십 초 걸리는 OpenAI 응답까지
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class Counter:
+    """단조 증가 카운터 (라벨 값 조합별)"""
+
+    type_name = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = registry._lock
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        """
+        카운터 증가
+
+        Args:
+            *labels: 라벨 값 (labelnames 순서)
+            amount: 증가량
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _snapshot(self):
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    @staticmethod
+    def _merge(into, value):
+        return (into or 0) + value
+
+
+class _Timer:
+    """with 블록 실행 시간을 히스토그램에 기록"""
+
+    __slots__ = ('_histogram', '_labels', '_started')
+
+    def __init__(self, histogram, labels):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._started, *self._labels)
+        return False
+
+
+class Histogram:
+    """구간별 누적 분포 히스토그램 (라벨 값 조합별 구간 개수, 합계, 관측 수)"""
+
+    type_name = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = registry._lock
+        self._values = {}
+
+    def observe(self, value, *labels):
+        """
+        관측값 기록
+
+        Args:
+            value: 관측값 (초)
+            *labels: 라벨 값 (labelnames 순서)
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # [구간별 개수..., +Inf 개수, 합계]
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def time(self, *labels):
+        """
+        with 블록 실행 시간 측정
+
+        Args:
+            *labels: 라벨 값 (labelnames 순서)
+
+        Returns:
+            컨텍스트 매니저
+        """
+        return _Timer(self, labels)
+
+    def _snapshot(self):
+        return [[list(labels), list(entry)] for labels, entry in self._values.items()]
+
+    @staticmethod
+    def _merge(into, value):
+        if into is None:
+            return list(value)
+        return [a + b for a, b in zip(into, value)]
+
+
+class MetricsRegistry:
+    """
+    지표 보관소
+    directory를 주면 백그라운드 스레드가 flush_interval마다 이 프로세스의 스냅샷을
+    {directory}/boot-{마스터 PID}-{마스터 시작 시각}/{pid}-{토큰}.json으로 기록
+    """
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        """
+        Args:
+            directory: 워커 간 공유 스냅샷 디렉토리 (None이면 이 프로세스 지표만 출력)
+            flush_interval: 스냅샷 기록 주기 (초)
+        """
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._flusher = None
+
+        if self.directory is not None:
+            self._init_process()
+            self._start_flusher()
+            atexit.register(self.write_snapshot)
+
+    def counter(self, name, documentation, labelnames=()):
+        """카운터 등록 (같은 이름이면 기존 카운터 반환)"""
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """히스토그램 등록 (같은 이름이면 기존 히스토그램 반환)"""
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def snapshot(self):
+        """
+        이 프로세스의 지표 스냅샷
+
+        Returns:
+            dict: {이름: {type, help, labelnames, buckets, values}}
+        """
+        with self._lock:
+            return {
+                metric.name: {
+                    'type': metric.type_name,
+                    'help': metric.documentation,
+                    'labelnames': list(metric.labelnames),
+                    'buckets': list(getattr(metric, 'buckets', ())),
+                    'values': metric._snapshot()
+                }
+                for metric in self._metrics.values()
+            }
+
+    def _init_process(self):
+        """이 프로세스의 스냅샷 위치 결정 (시작할 때와 fork 직후) 후 종료된 이전 실행의 디렉토리 정리"""
+        master_pid = os.getppid()
+        self._boot_dir = self.directory / f"boot-{master_pid}-{_process_started(master_pid) or 0}"
+        self._boot_dir.mkdir(parents=True, exist_ok=True)
+        self._process = {
+            'pid': os.getpid(),
+            'started': _process_started(os.getpid()),
+            'token': uuid.uuid4().hex[:12]
+        }
+        self._snapshot_path = self._boot_dir / f"{self._process['pid']}-{self._process['token']}.json"
+
+        for path in self.directory.iterdir():
+            if path == self._boot_dir:
+                continue
+            if path.is_dir() and path.name.startswith('boot-'):
+                try:
+                    _, pid, started = path.name.split('-', 2)
+                    alive = _process_alive(int(pid), None if started == '0' else started)
+                except ValueError:
+                    continue
+                if not alive:
+                    shutil.rmtree(path, ignore_errors=True)
+            elif path.suffix in ('.json', '.tmp'):
+                # 예전 형식({pid}.json) 스냅샷
+                path.unlink(missing_ok=True)
+
+    def write_snapshot(self):
+        """이 프로세스의 스냅샷을 공유 디렉토리에 기록 (원자적 교체)"""
+        if self.directory is None:
+            return
+        self._boot_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._snapshot_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self._process, metrics=self.snapshot()), f, ensure_ascii=False)
+        os.replace(tmp_path, self._snapshot_path)
+
+    def collect(self):
+        """
+        출력할 전체 지표 (공유 디렉토리가 있으면 모든 워커의 스냅샷을 합침)
+
+        Returns:
+            dict: snapshot과 같은 형식
+        """
+        if self.directory is None:
+            return self.snapshot()
+
+        # 이 워커의 최신 값을 먼저 기록하고 종료된 워커의 스냅샷은 retired.json에 더한 뒤 모두 합산
+        self.write_snapshot()
+        merged = {}
+        live = []
+        dead = []
+        for path in sorted(self._boot_dir.glob('*.json')):
+            if path.name == RETIRED_FILE:
+                continue
+            snapshot = _read_json(path)
+            if snapshot is None:
+                continue
+            if path != self._snapshot_path and not _process_alive(snapshot['pid'], snapshot.get('started')):
+                dead.append(path)
+            else:
+                live.append((path.name, snapshot['metrics']))
+
+        retired = self._retire(dead) if dead else _read_json(self._boot_dir / RETIRED_FILE)
+        if retired:
+            # 읽은 직후 종료되어 다른 워커가 이미 더한 스냅샷은 빼고 합산
+            folded = set(retired['folded'])
+            live = [(name, snapshot) for name, snapshot in live if name not in folded]
+            _merge_snapshot(merged, retired['metrics'])
+        for _, snapshot in live:
+            _merge_snapshot(merged, snapshot)
+
+        return _finish_merge(merged)
+
+    def _retire(self, paths):
+        """
+        종료된 워커의 스냅샷을 retired.json에 더하고 삭제 (여러 워커가 동시에 해도 한 번만 더해짐)
+
+        Args:
+            paths: 종료된 워커의 스냅샷 경로 목록
+
+        Returns:
+            dict: 갱신된 retired.json 내용 ({folded: 더한 스냅샷 이름 목록, metrics: 합계})
+        """
+        retired_path = self._boot_dir / RETIRED_FILE
+        with open(self._boot_dir / 'retired.lock', 'a') as lock:
+            lock_file(lock, exclusive=True)
+            try:
+                retired = _read_json(retired_path) or {'folded': [], 'metrics': {}}
+                folded = set(retired['folded'])
+                merged = {}
+                _merge_snapshot(merged, retired['metrics'])
+                for path in paths:
+                    snapshot = _read_json(path)
+                    if snapshot is not None and path.name not in folded:
+                        _merge_snapshot(merged, snapshot['metrics'])
+                        folded.add(path.name)
+                retired = {'folded': sorted(folded), 'metrics': _finish_merge(merged)}
+
+                # 기록을 먼저 교체한 뒤 스냅샷을 지우므로 중간에 멈춰도 두 번 더해지지 않음
+                tmp_path = retired_path.with_suffix('.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(retired, f, ensure_ascii=False)
+                os.replace(tmp_path, retired_path)
+                for path in paths:
+                    path.unlink(missing_ok=True)
+            finally:
+                unlock_file(lock)
+        return retired
+
+    def render(self):
+        """
+        Prometheus 텍스트 형식(0.0.4) 출력
+
+        Returns:
+            str: /metrics 응답 본문
+        """
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric['labelnames']
+            for labels, value in sorted(metric['values']):
+                pairs = list(zip(labelnames, labels))
+                if metric['type'] == 'counter':
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                    continue
+
+                cumulative = 0
+                bounds = [_format_value(bound) for bound in metric['buckets']] + ['+Inf']
+                for bound, count in zip(bounds, value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(pairs + [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+    def _start_flusher(self):
+        """스냅샷 기록 스레드 시작"""
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                print(f"지표 스냅샷 기록 실패: {e}")
+
+    def _reset_after_fork(self):
+        """fork된 자식 프로세스에서 부모의 값을 비우고 자기 스냅샷 위치와 기록 스레드를 새로 준비"""
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric._lock = self._lock
+            metric._values = {}
+        if self.directory is not None:
+            self._init_process()
+            self._start_flusher()
+
+
+# 종료된 워커들의 지표 합계 파일 이름
+RETIRED_FILE = 'retired.json'
+
+
+def _process_started(pid):
+    """
+    프로세스 시작 시각 (/proc의 starttime - PID가 재사용되어도 다른 프로세스와 구분)
+
+    Returns:
+        str: 시작 시각 (/proc가 없는 환경이면 None)
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            return f.read().rsplit(b')', 1)[1].split()[19].decode()
+    except (OSError, IndexError):
+        return None
+
+
+def _process_alive(pid, started):
+    """같은 프로세스(PID와 시작 시각이 모두 같음)가 아직 실행 중인지 확인"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return started is None or _process_started(pid) in (None, started)
+
+
+def _read_json(path):
+    """JSON 파일 읽기 (없거나 쓰는 중이면 None)"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge_snapshot(merged, snapshot):
+    """스냅샷 값을 merged({이름: 지표, values는 {라벨 튜플: 값}})에 더함"""
+    for name, metric in snapshot.items():
+        target = merged.setdefault(name, dict(metric, values={}))
+        merge = Histogram._merge if metric['type'] == 'histogram' else Counter._merge
+        for labels, value in metric['values']:
+            key = tuple(labels)
+            target['values'][key] = merge(target['values'].get(key), value)
+
+
+def _finish_merge(merged):
+    """_merge_snapshot 결과를 snapshot과 같은 형식으로"""
+    for metric in merged.values():
+        metric['values'] = [[list(labels), value] for labels, value in metric['values'].items()]
+    return merged
+
+
+def _format_labels(pairs):
+    """라벨 목록을 {name="value",...} 형식으로"""
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+def _escape_label_value(value):
+    """라벨 값의 역슬래시, 따옴표, 줄바꿈 이스케이프"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    """정수로 떨어지는 값은 정수로 출력"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# 글로벌 지표 보관소
+_global_registry = None
+
+def get_metrics_registry(**kwargs):
+    """
+    글로벌 지표 보관소 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 처음 생성할 때 MetricsRegistry 설정
+
+    Returns:
+        MetricsRegistry: 지표 보관소
+    """
+    global _global_registry
+    if _global_registry is None:
+        _global_registry = MetricsRegistry(**kwargs)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_global_registry._reset_after_fork)
+    return _global_registry
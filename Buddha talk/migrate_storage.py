@@ -0,0 +1,94 @@
+"""
+대화 데이터 마이그레이션 도구
+conversation_data/의 CSV/JSON 파일(대화 기록, 세션 분석, 사용자 동의)을 SQLite 저장소로 가져오기
+
+실행 예시:
+    python migrate_storage.py --data-dir conversation_data
+    python migrate_storage.py --data-dir conversation_data --db /var/lib/buddha/buddha_talk.db --append
+"""
+
+import argparse
+import sys
+from itertools import islice
+from pathlib import Path
+
+from storage import CSVStorage, SQLiteStorage
+
+
+def _batches(rows, size):
+    """이터러블을 size개씩 묶어서 반환"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def migrate(data_dir, db_path, batch_size=1000, append=False):
+    """
+    CSV/JSON 데이터를 SQLite 저장소로 복사
+
+    Args:
+        data_dir: 기존 CSV/JSON 데이터 디렉토리
+        db_path: 대상 SQLite 데이터베이스 경로
+        batch_size: 한 트랜잭션에 넣을 행 수
+        append: 대상에 이미 데이터가 있어도 추가할지 여부
+
+    Returns:
+        dict: 테이블별로 가져온 행 수
+    """
+    source = CSVStorage(data_dir)
+    target = SQLiteStorage(db_path)
+
+    if not append and target.get_statistics()['total_conversations'] > 0:
+        raise RuntimeError(f"{db_path}에 이미 대화 기록이 있습니다 (추가하려면 --append)")
+
+    counts = {'conversations': 0, 'session_analytics': 0, 'user_consents': 0}
+    try:
+        for batch in _batches(source.iter_conversations(), batch_size):
+            target.write_conversations(batch)
+            counts['conversations'] += len(batch)
+
+        for batch in _batches(source.iter_session_analytics(), batch_size):
+            target.write_session_analytics(batch)
+            counts['session_analytics'] += len(batch)
+
+        # 스냅샷과 저널을 합친 최신 동의 상태
+        for user_id, record in source.all_consents().items():
+            target.save_consent(user_id, record)
+            counts['user_consents'] += 1
+    finally:
+        source.close()
+        target.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV/JSON 대화 데이터를 SQLite로 마이그레이션")
+    parser.add_argument("--data-dir", default="conversation_data", help="기존 데이터 디렉토리")
+    parser.add_argument("--db", help="대상 SQLite 파일 (기본값: <data-dir>/buddha_talk.db)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--append", action="store_true", help="대상에 데이터가 있어도 추가")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+    if not data_dir.is_dir():
+        parser.error(f"데이터 디렉토리가 없습니다: {data_dir}")
+    db_path = Path(args.db) if args.db else data_dir / "buddha_talk.db"
+
+    try:
+        counts = migrate(data_dir, db_path, args.batch_size, args.append)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"✅ 마이그레이션 완료: {db_path}")
+    for table, count in counts.items():
+        print(f"   - {table}: {count}개")
+    print("   STORAGE_BACKEND=sqlite로 설정하면 앱이 이 데이터베이스를 사용합니다.")
+
+
+if __name__ == "__main__":
+    main()
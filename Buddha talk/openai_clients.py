@@ -0,0 +1,267 @@
+"""
+OpenAI 클라이언트 관리
+프로세스 단위로 공유되는 HTTP 커넥션 풀과 동기/비동기 클라이언트 생성
+
+- 기본 클라이언트: 워커 프로세스가 시작될 때 환경 변수 OPENAI_API_KEY로 생성
+- 사용자가 /api/setup으로 입력한 키: 키 해시별 클라이언트를 크기 제한 풀(LRU)에 보관
+- 키 확인: 모델 목록 조회(토큰 비용 없음) 결과를 키 해시별로 캐시
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+import openai
+
+# 커넥션 풀 설정 (환경 변수로 조정)
+MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 200))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 100))
+KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY_SECONDS', 30))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_CONNECT_TIMEOUT_SECONDS', 5))
+READ_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_READ_TIMEOUT_SECONDS', 60))
+# SDK 재시도 (기본 0 - 429 재시도와 동시 실행 한도 조정은 llm_scheduler가 맡으므로, SDK가 429를 먼저 재시도하면
+# 스케줄러 한 번의 호출이 여러 번의 요청이 되고 한도 조정도 늦어짐)
+MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 0))
+# 연결 실패 재시도 (요청이 서버에 닿기 전의 연결 오류만 재시도하므로 429/중복 요청과 무관)
+CONNECT_RETRIES = int(os.environ.get('OPENAI_CONNECT_RETRIES', 2))
+
+# 프로세스당 보관할 API 키별 클라이언트 수 (사용자가 직접 입력한 키 포함)
+CLIENT_POOL_SIZE = int(os.environ.get('OPENAI_CLIENT_POOL_SIZE', 100))
+
+# 키 확인 결과 캐시 시간 (유효한 키는 길게, 거부된 키는 짧게)
+KEY_VALIDATION_TTL_SECONDS = float(os.environ.get('OPENAI_KEY_VALIDATION_TTL_SECONDS', 3600))
+KEY_REJECTION_TTL_SECONDS = float(os.environ.get('OPENAI_KEY_REJECTION_TTL_SECONDS', 60))
+MAX_CACHED_VALIDATIONS = 1024
+
+
+class ClientPool:
+    """API 키 해시별 클라이언트 풀 (최대 개수를 넘으면 가장 오래 쓰지 않은 클라이언트부터 제거)"""
+
+    def __init__(self, factory, max_clients=CLIENT_POOL_SIZE):
+        """
+        Args:
+            factory: API 키로 클라이언트를 만드는 함수
+            max_clients: 보관할 최대 클라이언트 수
+        """
+        self.factory = factory
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, api_key):
+        """키에 해당하는 클라이언트 반환 (없으면 생성)"""
+        key = api_key_hash(api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self.factory(api_key)
+                self._clients[key] = client
+                # 제거된 클라이언트는 진행 중인 요청이 있을 수 있으므로 닫지 않고 참조만 놓음
+                while len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            self._clients.move_to_end(key)
+            return client
+
+    def find(self, key):
+        """키 해시로 클라이언트 조회 (없으면 None)"""
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+            return client
+
+    def discard(self, key):
+        """키 해시에 해당하는 클라이언트 제거"""
+        with self._lock:
+            self._clients.pop(key, None)
+
+    def drain(self):
+        """모든 클라이언트를 꺼내고 풀 비우기"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        return clients
+
+    def reset(self):
+        """잠금과 보관 목록 초기화 (fork된 자식 프로세스에서 부모의 커넥션을 쓰지 않도록)"""
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+
+def _pool_limits():
+    """커넥션 풀 한도"""
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+def _timeout():
+    """요청 타임아웃 (연결은 짧게, 응답 생성은 길게)"""
+    return httpx.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+
+
+def api_key_hash(api_key):
+    """API 키 원문 대신 캐시 키/세션 값으로 쓸 해시값"""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def create_client(api_key):
+    """
+    튜닝된 커넥션 풀을 가진 OpenAI 클라이언트 생성 (동기 서빙 모드)
+
+    Args:
+        api_key: OpenAI API 키
+
+    Returns:
+        openai.OpenAI: 동기 클라이언트
+    """
+    return openai.OpenAI(
+        api_key=api_key,
+        max_retries=MAX_RETRIES,
+        http_client=httpx.Client(
+            transport=httpx.HTTPTransport(limits=_pool_limits(), retries=CONNECT_RETRIES),
+            timeout=_timeout()
+        )
+    )
+
+
+def create_async_client(api_key):
+    """
+    튜닝된 커넥션 풀을 가진 AsyncOpenAI 클라이언트 생성
+
+    Args:
+        api_key: OpenAI API 키
+
+    Returns:
+        openai.AsyncOpenAI: 비동기 클라이언트
+    """
+    return openai.AsyncOpenAI(
+        api_key=api_key,
+        max_retries=MAX_RETRIES,
+        http_client=httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(limits=_pool_limits(), retries=CONNECT_RETRIES),
+            timeout=_timeout()
+        )
+    )
+
+
+# API 키 해시별 클라이언트 (하나의 풀을 모든 대화가 공유)
+_clients = ClientPool(create_client)
+_async_clients = ClientPool(create_async_client)
+
+# API 키 해시 → (만료 시각, 확인 결과)
+_validations = OrderedDict()
+_validations_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """
+    API 키별로 공유되는 OpenAI 클라이언트 반환 (없으면 생성)
+
+    Args:
+        api_key: OpenAI API 키
+
+    Returns:
+        openai.OpenAI: 동기 클라이언트
+    """
+    return _clients.get(api_key)
+
+
+def get_async_client(api_key):
+    """
+    API 키별로 공유되는 AsyncOpenAI 클라이언트 반환 (없으면 생성)
+
+    Args:
+        api_key: OpenAI API 키
+
+    Returns:
+        openai.AsyncOpenAI: 비동기 클라이언트
+    """
+    return _async_clients.get(api_key)
+
+
+def find_client(key_hash):
+    """
+    /api/setup에서 등록된 키의 클라이언트 조회
+
+    Args:
+        key_hash: api_key_hash 결과 (세션에 저장된 값)
+
+    Returns:
+        openai.OpenAI: 동기 클라이언트 (이 프로세스에 없으면 None)
+    """
+    return _clients.find(key_hash)
+
+
+def get_default_client():
+    """
+    환경 변수 OPENAI_API_KEY로 만든 프로세스 기본 클라이언트
+
+    Returns:
+        openai.OpenAI: 동기 클라이언트 (키가 설정되지 않았으면 None)
+    """
+    api_key = os.environ.get('OPENAI_API_KEY')
+    return get_client(api_key) if api_key else None
+
+
+def validate_api_key(api_key):
+    """
+    API 키 확인 (모델 목록 조회 - 응답 생성 비용 없음, 결과는 키 해시별로 캐시)
+
+    Args:
+        api_key: OpenAI API 키
+
+    Returns:
+        tuple: (유효 여부, 오류 메시지 - 유효하면 None)
+    """
+    key = api_key_hash(api_key)
+    with _validations_lock:
+        cached = _validations.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            _validations.move_to_end(key)
+            return cached[1]
+
+    try:
+        get_client(api_key).models.list()
+        result, ttl = (True, None), KEY_VALIDATION_TTL_SECONDS
+    except (openai.AuthenticationError, openai.PermissionDeniedError) as e:
+        # 거부된 키는 풀에서 빼고 잠시 동안 같은 결과를 재사용
+        _clients.discard(key)
+        result, ttl = (False, str(e)), KEY_REJECTION_TTL_SECONDS
+    except openai.OpenAIError as e:
+        # 네트워크 오류 등 일시적인 실패는 캐시하지 않음
+        _clients.discard(key)
+        return False, str(e)
+
+    with _validations_lock:
+        _validations[key] = (time.monotonic() + ttl, result)
+        _validations.move_to_end(key)
+        while len(_validations) > MAX_CACHED_VALIDATIONS:
+            _validations.popitem(last=False)
+    return result
+
+
+def close_clients():
+    """모든 동기 클라이언트의 커넥션 풀 정리 (서버 종료 시)"""
+    for client in _clients.drain():
+        client.close()
+
+
+async def close_async_clients():
+    """모든 비동기 클라이언트의 커넥션 풀 정리 (서버 종료 시)"""
+    for client in _async_clients.drain():
+        await client.close()
+
+
+def _reset_after_fork():
+    """fork된 워커는 부모 프로세스의 커넥션 풀을 물려받지 않고 새로 만듦 (gunicorn --preload)"""
+    _clients.reset()
+    _async_clients.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,272 @@
+"""
+표본 프로파일링
+운영 중 지연이 튈 때 재배포 없이 일부 요청만 cProfile로 기록해 실제 병목(감정 분석, 프롬프트 구성, 로깅 등)을 찾기 위함
+
+켜짐 여부와 표본 비율은 환경 변수로 시작값을 정하고, 관리자 API로 바꾸면 프로파일 디렉토리의 설정 파일을 통해
+실행 중인 모든 워커에 반영됨 (프로세스 시작 전에 쓰인 설정 파일은 무시 - 재시작하면 환경 변수 값으로 돌아감)
+프로파일은 요청마다 .prof 파일로 남기고 최대 개수를 넘으면 오래된 것부터 삭제
+"""
+
+import cProfile
+import functools
+import inspect
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 워커 간 공유 설정 파일 이름 (프로파일 디렉토리 안)
+CONFIG_FILE = "profiling.json"
+
+# 설정 파일 변경 확인 주기 (초)
+CONFIG_CHECK_INTERVAL = 1.0
+
+
+class RequestProfiler:
+    """
+    요청 표본 프로파일러
+    표본으로 뽑힌 요청만 cProfile로 감싸 기록 (프로세스당 한 번에 하나 - 동시에 켜진 프로파일러끼리 섞이지 않게)
+    """
+
+    def __init__(self, output_dir, enabled=False, sample_rate=0.01, max_files=50):
+        """
+        Args:
+            output_dir: 프로파일 파일과 공유 설정 파일 디렉토리
+            enabled: 시작 시 켜짐 여부
+            sample_rate: 프로파일링할 요청 비율 (0~1)
+            max_files: 보관할 최대 프로파일 파일 수
+        """
+        self.output_dir = Path(output_dir)
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+
+        self._active = threading.Lock()
+        self._sequence = 0
+        self._config_path = self.output_dir / CONFIG_FILE
+        self._config_mtime = None
+        self._next_config_check = 0.0
+        # 이 시각 이전에 쓰인 설정 파일은 지난 실행의 것이므로 환경 변수 값을 우선
+        self._started = time.time()
+
+    def configure(self, enabled=None, sample_rate=None):
+        """
+        켜짐 여부/표본 비율 변경 (설정 파일에 기록해 다른 워커도 CONFIG_CHECK_INTERVAL 안에 반영)
+
+        Args:
+            enabled: 켜짐 여부 (True/False, None이면 유지)
+            sample_rate: 표본 비율 (숫자, None이면 유지)
+
+        Returns:
+            dict: 변경된 설정
+
+        Raises:
+            ValueError: enabled가 bool이 아니거나 sample_rate가 0~1 사이의 숫자가 아님
+        """
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError("enabled는 true 또는 false여야 합니다")
+        if sample_rate is not None and (
+                isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float))):
+            raise ValueError("sample_rate는 숫자여야 합니다")
+        if sample_rate is not None and not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate는 0과 1 사이여야 합니다")
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = float(sample_rate)
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._config_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'enabled': self.enabled, 'sample_rate': self.sample_rate}, f)
+        os.replace(tmp_path, self._config_path)
+        self._config_mtime = self._config_path.stat().st_mtime
+        return self.settings()
+
+    def settings(self):
+        """현재 설정"""
+        self._refresh_config()
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'max_files': self.max_files,
+            'output_dir': str(self.output_dir)
+        }
+
+    def sampled(self, name):
+        """
+        표본으로 뽑힌 호출만 프로파일링하는 데코레이터 (일반 함수와 코루틴 함수 모두 지원)
+
+        Args:
+            name: 프로파일 파일 이름에 붙일 구분자 (예: 'chat')
+        """
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    profile = self._start()
+                    if profile is None:
+                        return await fn(*args, **kwargs)
+                    try:
+                        # 비동기 모드에서는 await 동안 같은 스레드에서 실행된 다른 요청의 처리도 함께 기록되고,
+                        # 스레드 풀로 넘긴 단계(턴 준비/기록)는 기록되지 않음
+                        return await fn(*args, **kwargs)
+                    finally:
+                        self._finish(profile, name)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                profile = self._start()
+                if profile is None:
+                    return fn(*args, **kwargs)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._finish(profile, name)
+            return wrapper
+        return decorator
+
+    def summary(self, limit=20, sort='cumulative'):
+        """
+        보관 중인 프로파일을 합친 요약
+
+        Args:
+            limit: 출력할 함수 수
+            sort: 정렬 기준 ('cumulative', 'tottime', 'calls')
+
+        Returns:
+            dict: 설정, 프로파일 파일 목록(최신순), 함수별 호출 수/자체 시간/누적 시간 상위 목록
+        """
+        sort_keys = {'cumulative': 3, 'tottime': 2, 'calls': 1}
+        if sort not in sort_keys:
+            raise ValueError(f"알 수 없는 정렬 기준: {sort}")
+
+        files = self._profile_files()
+        result = {**self.settings(), 'profiles': len(files), 'files': [path.name for path in reversed(files)]}
+        if not files:
+            result['functions'] = []
+            return result
+
+        stats = pstats.Stats(*(str(path) for path in files))
+        rows = []
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append((
+                f"{os.path.basename(filename)}:{line}({function})",
+                calls,
+                tottime,
+                cumtime
+            ))
+        rows.sort(key=lambda row: row[sort_keys[sort]], reverse=True)
+
+        result['total_seconds'] = round(stats.total_tt, 6)
+        result['functions'] = [
+            {
+                'function': function,
+                'calls': calls,
+                'total_seconds': round(tottime, 6),
+                'cumulative_seconds': round(cumtime, 6),
+                'per_profile_ms': round(cumtime / len(files) * 1000, 3)
+            }
+            for function, calls, tottime, cumtime in rows[:limit]
+        ]
+        return result
+
+    def _start(self):
+        """표본으로 뽑혔으면 프로파일링 시작 (아니면 None)"""
+        self._refresh_config()
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            # 다른 요청을 프로파일링 중이면 이번 요청은 건너뜀
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 다른 프로파일링 도구가 이미 켜져 있음
+            self._active.release()
+            return None
+        return profile
+
+    def _finish(self, profile, name):
+        """프로파일링을 멈추고 파일로 기록한 뒤 오래된 파일 정리"""
+        try:
+            profile.disable()
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._sequence += 1
+            timestamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            profile.dump_stats(str(self.output_dir / f"{name}-{timestamp}-{os.getpid()}-{self._sequence}.prof"))
+            self._rotate()
+        except OSError as e:
+            print(f"프로파일 기록 실패: {e}")
+        finally:
+            self._active.release()
+
+    def _profile_files(self):
+        """보관 중인 프로파일 파일 (오래된 순)"""
+        if not self.output_dir.exists():
+            return []
+        files = []
+        for path in self.output_dir.glob('*.prof'):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        return [path for _, path in sorted(files)]
+
+    def _rotate(self):
+        """최대 개수를 넘는 오래된 프로파일 삭제 (다른 워커가 먼저 지웠으면 무시)"""
+        files = self._profile_files()
+        for path in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _refresh_config(self):
+        """다른 워커가 관리자 API로 바꾼 설정 반영 (CONFIG_CHECK_INTERVAL마다 설정 파일 확인)"""
+        now = time.monotonic()
+        if now < self._next_config_check:
+            return
+        self._next_config_check = now + CONFIG_CHECK_INTERVAL
+        try:
+            mtime = self._config_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime == self._config_mtime:
+            return
+        if mtime < self._started:
+            self._config_mtime = mtime
+            return
+        try:
+            with open(self._config_path, encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._config_mtime = mtime
+        self.enabled = bool(config.get('enabled', self.enabled))
+        self.sample_rate = float(config.get('sample_rate', self.sample_rate))
+
+
+# 글로벌 프로파일러 인스턴스
+_global_profiler = None
+
+def get_profiler(**kwargs):
+    """
+    글로벌 요청 프로파일러 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 처음 생성할 때 RequestProfiler 설정 (output_dir 필수)
+
+    Returns:
+        RequestProfiler: 프로파일러
+    """
+    global _global_profiler
+    if _global_profiler is None:
+        _global_profiler = RequestProfiler(**kwargs)
+    return _global_profiler
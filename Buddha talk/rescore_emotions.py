@@ -0,0 +1,151 @@
+"""
+감정 재채점 도구
+감정 키워드 사전을 바꾼 뒤 conversations.csv의 사용자 메시지를 다시 분석해 detected_emotions 열을 새로 채운 CSV로 저장
+
+입력은 청크 단위로 읽어 여러 프로세스에 나눠 분석하고, 결과는 입력 순서대로 바로 기록함
+(분석 중인 청크는 워커 수의 2배까지만 두므로 파일 크기와 상관없이 메모리 사용량이 일정)
+
+실행 예시:
+    python rescore_emotions.py --input conversation_data/conversations.csv
+    python rescore_emotions.py --input conversation_data/conversations.csv --output rescored.csv --workers 8
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from emotion_tracker import analyze_batch
+from migrate_storage import _batches
+
+
+def _rescore_chunk(messages):
+    """
+    메시지 청크를 분석해 detected_emotions 열 값 목록 반환 (워커 프로세스에서 실행)
+
+    Args:
+        messages: 사용자 메시지 목록
+
+    Returns:
+        list: 메시지 순서대로의 쉼표로 구분된 감정 목록
+    """
+    return [','.join(result['all_emotions']) for result in analyze_batch(messages)]
+
+
+def _same_file(a, b):
+    """두 경로가 같은 파일을 가리키는지 확인 (출력 파일이 아직 없으면 경로로 비교)"""
+    a, b = Path(a), Path(b)
+    if a.exists() and b.exists():
+        return os.path.samefile(a, b)
+    return a.resolve() == b.resolve()
+
+
+def rescore(input_path, output_path, workers=None, chunk_size=1000):
+    """
+    대화 기록 CSV의 detected_emotions 열을 현재 키워드 사전으로 다시 채움
+    임시 파일에 다 쓴 뒤 교체하므로 중간에 실패해도 출력 파일이 반쯤 쓰인 채로 남지 않음
+    입력 파일을 직접 덮어쓰지는 않음 (실행 중인 앱이 그 사이에 추가한 대화가 사라지므로)
+
+    Args:
+        input_path: 입력 CSV (conversations.csv 형식)
+        output_path: 출력 CSV (입력과 다른 파일)
+        workers: 분석 프로세스 수 (None이면 CPU 수, 1이면 현재 프로세스에서 처리)
+        chunk_size: 한 번에 워커로 보낼 행 수
+
+    Returns:
+        dict: 처리한 행 수, 감정이 바뀐 행 수, 소요 시간
+    """
+    workers = workers or os.cpu_count() or 1
+    output_path = Path(output_path)
+    if _same_file(input_path, output_path):
+        raise RuntimeError(f"입력 파일을 직접 덮어쓸 수 없습니다: {output_path} (다른 출력 파일을 지정하세요)")
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    counts = {'rows': 0, 'changed': 0}
+    started = time.perf_counter()
+
+    with open(input_path, 'r', newline='', encoding='utf-8') as src, \
+            open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+        reader = csv.DictReader(src)
+        fieldnames = reader.fieldnames
+        if not fieldnames or 'user_message' not in fieldnames:
+            raise RuntimeError(f"{input_path}에 user_message 열이 없습니다")
+        if 'detected_emotions' not in fieldnames:
+            fieldnames = fieldnames + ['detected_emotions']
+
+        writer = csv.DictWriter(dst, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+
+        def write_chunk(rows, emotions):
+            for row, value in zip(rows, emotions):
+                if row.get('detected_emotions') != value:
+                    counts['changed'] += 1
+                row['detected_emotions'] = value
+            writer.writerows(rows)
+            counts['rows'] += len(rows)
+
+        def messages_of(rows):
+            return [row.get('user_message') or '' for row in rows]
+
+        try:
+            if workers == 1:
+                for rows in _batches(reader, chunk_size):
+                    write_chunk(rows, _rescore_chunk(messages_of(rows)))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    # 워커에는 메시지만 보내고 원본 행은 기록할 때까지 여기서 보관 (제출 순서대로 기록)
+                    pending = deque()
+                    for rows in _batches(reader, chunk_size):
+                        pending.append((rows, executor.submit(_rescore_chunk, messages_of(rows))))
+                        if len(pending) >= workers * 2:
+                            rows, future = pending.popleft()
+                            write_chunk(rows, future.result())
+                    while pending:
+                        rows, future = pending.popleft()
+                        write_chunk(rows, future.result())
+        except BaseException:
+            dst.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    os.replace(tmp_path, output_path)
+    counts['seconds'] = round(time.perf_counter() - started, 3)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="대화 기록의 감정(detected_emotions)을 현재 키워드 사전으로 재채점")
+    parser.add_argument("--input", default="conversation_data/conversations.csv", help="입력 대화 기록 CSV")
+    parser.add_argument("--output", help="출력 CSV (기본값: <input>과 같은 위치의 *.rescored.csv)")
+    parser.add_argument("--workers", type=int, help="분석 프로세스 수 (기본값: CPU 수)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="워커에 한 번에 보낼 행 수")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.is_file():
+        parser.error(f"입력 파일이 없습니다: {input_path}")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers는 1 이상이어야 합니다")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size는 1 이상이어야 합니다")
+    output_path = Path(args.output) if args.output else input_path.with_suffix('.rescored.csv')
+    if _same_file(input_path, output_path):
+        parser.error("--output은 --input과 다른 파일이어야 합니다 (앱을 멈춘 뒤 결과 파일로 교체하세요)")
+
+    try:
+        counts = rescore(input_path, output_path, args.workers, args.chunk_size)
+    except (RuntimeError, OSError, csv.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    rate = counts['rows'] / counts['seconds'] if counts['seconds'] else 0
+    print(f"✅ 재채점 완료: {output_path}")
+    print(f"   - 행: {counts['rows']}개 (감정이 바뀐 행 {counts['changed']}개)")
+    print(f"   - 소요 시간: {counts['seconds']}초 ({rate:,.0f}행/초)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+응답 캐시
+자주 들어오는 첫 고민("불안해요", "직장 상사가 힘들게 해요")에 대한 부처님 응답을 재사용해
+OpenAI 호출 지연과 비용을 줄임
+
+- 정확 일치: 정규화한 메시지 + 주요 감정 해시
+- 유사 일치: 문자 n-gram 벡터의 코사인 유사도 (로컬 역색인으로 후보만 비교)
+- TTL 만료, 크기 제한 LRU 제거, 일정 비율의 적중은 새로 생성해 응답 다양성 유지
+"""
+
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+_NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_message(message):
+    """
+    캐시 키용 메시지 정규화 (유니코드 정규화, 소문자, 문장부호/공백 정리)
+
+    Args:
+        message: 사용자 메시지
+
+    Returns:
+        str: 정규화된 메시지
+    """
+    text = unicodedata.normalize('NFKC', message).lower()
+    return ' '.join(_NON_WORD_PATTERN.sub(' ', text).split())
+
+
+def embed_message(normalized):
+    """
+    정규화된 메시지를 문자 2-gram/3-gram 빈도 벡터로 변환 (L2 정규화된 희소 벡터)
+
+    Args:
+        normalized: normalize_message 결과
+
+    Returns:
+        dict: {n-gram: 가중치}
+    """
+    text = normalized.replace(' ', '')
+    features = Counter()
+    for n in (2, 3):
+        for i in range(len(text) - n + 1):
+            features[text[i:i + n]] += 1
+    if not features and text:
+        features[text] = 1
+
+    norm = math.sqrt(sum(value * value for value in features.values()))
+    return {feature: value / norm for feature, value in features.items()} if norm else {}
+
+
+class ResponseCache:
+    """정확 일치 + 유사도 기반 응답 캐시 (TTL, LRU)"""
+
+    def __init__(
+        self,
+        max_entries=5000,
+        ttl_seconds=3600,
+        similarity_threshold=0.7,
+        resample_rate=0.2,
+        max_variants=3,
+        max_message_length=200
+    ):
+        """
+        Args:
+            max_entries: 최대 캐시 항목 수 (넘으면 가장 오래 쓰지 않은 항목 제거)
+            ttl_seconds: 항목 유효 시간 (초)
+            similarity_threshold: 유사 일치로 인정할 최소 코사인 유사도
+            resample_rate: 적중해도 새로 생성할 비율 (0~1, 새 응답은 변형으로 추가)
+            max_variants: 한 항목에 보관할 응답 변형 수
+            max_message_length: 이보다 긴 메시지는 캐시하지 않음
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.resample_rate = resample_rate
+        self.max_variants = max_variants
+        self.max_message_length = max_message_length
+
+        # (감정, 정규화 메시지) → {'responses', 'created', 'vector'}
+        self._entries = OrderedDict()
+        # (감정, n-gram) → 해당 n-gram을 가진 항목 키 집합
+        self._index = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+        self._metrics = {
+            'exact_hits': 0,
+            'similar_hits': 0,
+            'misses': 0,
+            'resampled': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+
+    def key_for(self, message, primary_emotion):
+        """
+        캐시 키 생성 (캐시하지 않을 메시지면 None)
+
+        Args:
+            message: 사용자 메시지
+            primary_emotion: 감지된 주요 감정
+
+        Returns:
+            tuple: (감정, 정규화 메시지)
+        """
+        if not message or len(message) > self.max_message_length:
+            return None
+        normalized = normalize_message(message)
+        if not normalized:
+            return None
+        return (primary_emotion or '중립', normalized)
+
+    def get(self, key):
+        """
+        캐시된 응답 조회
+
+        Args:
+            key: key_for 결과
+
+        Returns:
+            tuple: (응답, 'exact' 또는 'similar') - 없거나 재생성할 차례면 (None, None)
+        """
+        if key is None:
+            return None, None
+
+        with self._lock:
+            now = time.monotonic()
+            match_type = 'exact'
+            entry_key = key if self._live_entry(key, now) else None
+
+            if entry_key is None:
+                match_type = 'similar'
+                entry_key = self._find_similar(key, now)
+
+            if entry_key is None:
+                self._metrics['misses'] += 1
+                return None, None
+
+            if self._random.random() < self.resample_rate:
+                # 새 응답을 만들어 변형으로 추가하도록 미스로 처리
+                self._metrics['resampled'] += 1
+                return None, None
+
+            self._entries.move_to_end(entry_key)
+            self._metrics[f'{match_type}_hits'] += 1
+            return self._random.choice(self._entries[entry_key]['responses']), match_type
+
+    def put(self, key, response):
+        """
+        응답 저장 (이미 있는 항목이면 응답 변형으로 추가)
+
+        Args:
+            key: key_for 결과
+            response: 부처님 응답
+        """
+        if key is None or not response:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key) if self._live_entry(key, now) else None
+
+            if entry is not None:
+                entry['responses'].append(response)
+                del entry['responses'][:-self.max_variants]
+                entry['created'] = now
+                self._entries.move_to_end(key)
+            else:
+                vector = embed_message(key[1])
+                self._entries[key] = {'responses': [response], 'created': now, 'vector': vector}
+                for feature in vector:
+                    self._index.setdefault((key[0], feature), set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    self._remove(next(iter(self._entries)))
+                    self._metrics['evictions'] += 1
+
+            self._metrics['stores'] += 1
+
+    def stats(self):
+        """
+        캐시 적중/미스 지표
+
+        Returns:
+            dict: 지표와 현재 크기, 적중률
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['size'] = len(self._entries)
+        lookups = metrics['exact_hits'] + metrics['similar_hits'] + metrics['misses'] + metrics['resampled']
+        hits = metrics['exact_hits'] + metrics['similar_hits']
+        metrics['hit_rate'] = hits / lookups if lookups else 0.0
+        return metrics
+
+    def clear(self):
+        """모든 항목 삭제"""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def _live_entry(self, key, now):
+        """만료되지 않은 항목인지 확인 (만료되었으면 제거, 잠금 보유 상태에서 호출)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if now - entry['created'] > self.ttl_seconds:
+            self._remove(key)
+            self._metrics['expirations'] += 1
+            return False
+        return True
+
+    def _find_similar(self, key, now):
+        """
+        같은 감정의 항목 중 가장 유사한 항목 키 (역색인으로 n-gram이 겹치는 후보만 비교)
+
+        Args:
+            key: 조회 키
+            now: 현재 시각 (monotonic)
+
+        Returns:
+            tuple: 유사 항목 키 (없으면 None)
+        """
+        emotion = key[0]
+        vector = embed_message(key[1])
+
+        # 후보별 내적 누적 (벡터가 정규화되어 있으므로 내적 = 코사인 유사도)
+        scores = {}
+        for feature, weight in vector.items():
+            for candidate in self._index.get((emotion, feature), ()):
+                candidate_weight = self._entries[candidate]['vector'][feature]
+                scores[candidate] = scores.get(candidate, 0.0) + weight * candidate_weight
+
+        best_key = None
+        best_score = 0.0
+        for candidate, score in scores.items():
+            if score < self.similarity_threshold:
+                continue
+            # 동점이면 정규화 메시지 순으로 골라 결과가 일정하게 함
+            if best_key is None or score > best_score or (score == best_score and candidate < best_key):
+                if self._live_entry(candidate, now):
+                    best_key, best_score = candidate, score
+        return best_key
+
+    def _remove(self, key):
+        """항목과 역색인 제거 (잠금 보유 상태에서 호출)"""
+        entry = self._entries.pop(key)
+        for feature in entry['vector']:
+            keys = self._index.get((key[0], feature))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(key[0], feature)]
+
+
+# 글로벌 캐시 인스턴스
+_global_cache = None
+
+def get_response_cache(**kwargs):
+    """
+    글로벌 응답 캐시 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 처음 생성할 때 ResponseCache 설정
+
+    Returns:
+        ResponseCache: 응답 캐시
+    """
+    global _global_cache
+    if _global_cache is None:
+        _global_cache = ResponseCache(**kwargs)
+    return _global_cache
@@ -0,0 +1,190 @@
+"""
+SSE(Server-Sent Events) 스트리밍 도우미
+토큰 조각을 시간/바이트 기준으로 묶어 프레임 수를 줄이고, 연결 유지용 하트비트 주석을 만듦
+클라이언트가 중간에 떠난 스트림 수와 생성을 멈춰 아낀 토큰 수도 집계
+"""
+
+import json
+import threading
+import time
+
+
+class ClientDisconnected(Exception):
+    """응답을 쓰는 도중 클라이언트 연결이 끊김"""
+
+
+def sse_event(payload):
+    """
+    SSE data 프레임 생성 (한글은 이스케이프하지 않아 프레임 크기를 줄임)
+
+    Args:
+        payload: JSON으로 직렬화할 dict
+
+    Returns:
+        str: SSE 프레임
+    """
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def sse_comment(text="ping"):
+    """
+    SSE 주석 프레임 (브라우저는 무시하며 프록시 유휴 타임아웃을 막는 하트비트로 사용)
+
+    Args:
+        text: 주석 내용
+
+    Returns:
+        str: SSE 주석 프레임
+    """
+    return f": {text}\n\n"
+
+
+class DeltaCoalescer:
+    """
+    토큰 조각 묶음기
+    첫 조각은 바로 내보내 첫 토큰 지연을 늘리지 않고, 이후 조각은 max_delay가 지나거나
+    max_bytes가 쌓이면 한 프레임으로 내보냄
+    """
+
+    def __init__(self, max_delay=0.05, max_bytes=64):
+        """
+        Args:
+            max_delay: 마지막으로 내보낸 뒤 이 시간(초)이 지나면 내보냄 (0이면 묶지 않음)
+            max_bytes: 모인 조각이 이 크기(UTF-8 바이트)를 넘으면 내보냄
+        """
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+
+        self._parts = []
+        self._size = 0
+        self._last_flush = None
+
+    def add(self, text):
+        """
+        조각 추가
+
+        Args:
+            text: 토큰 조각
+
+        Returns:
+            str: 내보낼 문자열 (아직 모으는 중이면 None)
+        """
+        self._parts.append(text)
+        self._size += len(text.encode('utf-8'))
+
+        now = time.monotonic()
+        if (
+            self._last_flush is None
+            or self._size >= self.max_bytes
+            or now - self._last_flush >= self.max_delay
+        ):
+            return self.flush(now)
+        return None
+
+    def flush(self, now=None):
+        """
+        모인 조각 모두 내보내기
+
+        Returns:
+            str: 모인 문자열 (없으면 None)
+        """
+        self._last_flush = time.monotonic() if now is None else now
+        if not self._parts:
+            return None
+        text = ''.join(self._parts)
+        self._parts = []
+        self._size = 0
+        return text
+
+
+class StreamStats:
+    """
+    스트리밍 응답 지표
+    완료/중단/실패 수와 토큰 수를 집계하고, 중단으로 아낀 토큰을 추정
+    (토큰 수는 OpenAI 스트림 조각 수 - 조각 하나가 대략 토큰 하나)
+    """
+
+    OUTCOMES = ('completed', 'aborted', 'failed')
+
+    def __init__(self, max_tokens=800):
+        """
+        Args:
+            max_tokens: 응답 최대 토큰 수 (완료된 응답이 아직 없을 때 추정 기준)
+        """
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._metrics = {
+            'started': 0,
+            'completed': 0,
+            'aborted': 0,
+            'failed': 0,
+            'completion_tokens': 0,
+            'aborted_tokens': 0,
+            'tokens_saved': 0
+        }
+
+    def start(self):
+        """스트림 시작 기록"""
+        with self._lock:
+            self._metrics['started'] += 1
+
+    def record(self, outcome, tokens):
+        """
+        스트림 종료 기록
+
+        Args:
+            outcome: 'completed', 'aborted'(클라이언트 연결 끊김), 'failed'(오류)
+            tokens: 종료 전까지 받은 토큰 수
+        """
+        if outcome not in self.OUTCOMES:
+            raise ValueError(f"알 수 없는 스트림 결과: {outcome}")
+
+        with self._lock:
+            self._metrics[outcome] += 1
+            if outcome == 'completed':
+                self._metrics['completion_tokens'] += tokens
+            elif outcome == 'aborted':
+                # 끝까지 생성했다면 받았을 토큰 = 완료된 응답의 평균 길이 (없으면 최대 토큰 수)
+                expected = self._average_completion_tokens() or self.max_tokens
+                self._metrics['aborted_tokens'] += tokens
+                self._metrics['tokens_saved'] += max(round(expected) - tokens, 0)
+
+    def stats(self):
+        """
+        지표 조회
+
+        Returns:
+            dict: 지표와 진행 중인 스트림 수, 중단 비율, 평균 응답 토큰 수
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['average_completion_tokens'] = self._average_completion_tokens()
+        finished = sum(metrics[outcome] for outcome in self.OUTCOMES)
+        metrics['active'] = metrics['started'] - finished
+        metrics['abort_rate'] = metrics['aborted'] / finished if finished else 0.0
+        return metrics
+
+    def _average_completion_tokens(self):
+        """완료된 응답의 평균 토큰 수 (잠금 보유 상태에서 호출)"""
+        if not self._metrics['completed']:
+            return 0.0
+        return self._metrics['completion_tokens'] / self._metrics['completed']
+
+
+# 글로벌 지표 인스턴스
+_global_stream_stats = None
+
+def get_stream_stats(**kwargs):
+    """
+    글로벌 스트리밍 지표 반환 (싱글톤 패턴)
+
+    Args:
+        **kwargs: 처음 생성할 때 StreamStats 설정
+
+    Returns:
+        StreamStats: 스트리밍 지표
+    """
+    global _global_stream_stats
+    if _global_stream_stats is None:
+        _global_stream_stats = StreamStats(**kwargs)
+    return _global_stream_stats
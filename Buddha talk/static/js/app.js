@@ -5,8 +5,7 @@
 
 class BuddhaChat {
     constructor() {
-        this.apiKey = null;
-        this.conversationHistory = [];
+        this.apiConfigured = false;
         this.userId = null;
         this.sessionId = null;
         this.initializeElements();
@@ -70,6 +69,8 @@ class BuddhaChat {
             const response = await fetch('/api/status');
             const data = await response.json();
 
+            // 서버 환경 변수에 키가 있으면 바로 대화 가능
+            this.apiConfigured = data.api_configured;
             if (!data.api_configured) {
                 this.showModal();
             }
@@ -152,7 +153,7 @@ class BuddhaChat {
             const data = await response.json();
 
             if (response.ok) {
-                this.apiKey = apiKey;
+                this.apiConfigured = true;
                 this.hideModal();
                 this.addSystemMessage('API 키가 성공적으로 설정되었습니다. 이제 부처님과 대화할 수 있습니다!');
             } else {
@@ -174,7 +175,7 @@ class BuddhaChat {
             return;
         }
 
-        if (!this.apiKey) {
+        if (!this.apiConfigured) {
             this.showModal();
             return;
         }
@@ -191,47 +192,24 @@ class BuddhaChat {
         try {
             const userId = localStorage.getItem('userId') || 'anonymous';
 
-            const response = await fetch('/api/chat', {
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
                     message: message,
-                    history: this.conversationHistory,
                     user_id: userId
                 })
             });
 
-            const data = await response.json();
-
-            if (response.ok) {
-                // 위기 상황 감지
-                if (data.crisis_alert) {
-                    this.addMessage(data.message, 'buddha', true);
-                } else {
-                    // 부처님 응답 추가
-                    this.addMessage(data.message, 'buddha');
-
-                    // 명상 추천 표시 (선택적)
-                    if (data.meditation_suggestion) {
-                        this.showMeditationSuggestion(data.meditation_suggestion);
-                    }
-                }
-
-                // 대화 기록에 추가
-                this.conversationHistory.push({
-                    user: message,
-                    buddha: data.message
-                });
-
-                // 대화 기록이 너무 길어지면 최근 10개만 유지
-                if (this.conversationHistory.length > 10) {
-                    this.conversationHistory = this.conversationHistory.slice(-10);
-                }
-            } else {
+            if (!response.ok) {
+                const data = await response.json();
                 this.addSystemMessage(`오류가 발생했습니다: ${data.error}`);
+                return;
             }
+
+            await this.readChatStream(response);
         } catch (error) {
             console.error('메시지 전송 실패:', error);
             this.addSystemMessage('부처님과의 연결에 문제가 발생했습니다. 잠시 후 다시 시도해주세요.');
@@ -242,6 +220,55 @@ class BuddhaChat {
         }
     }
 
+    async readChatStream(response) {
+        // SSE 프레임을 받는 대로 부처님 응답에 이어 붙임
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let responseText = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const frames = buffer.split('\n\n');
+            buffer = frames.pop();
+
+            for (const frame of frames) {
+                // 하트비트 등 주석 프레임(':'로 시작)은 무시
+                if (!frame.startsWith('data: ')) continue;
+                const data = JSON.parse(frame.slice(6));
+
+                if (data.error) {
+                    this.addSystemMessage(`오류가 발생했습니다: ${data.error}`);
+                    return;
+                }
+
+                if (data.content) {
+                    if (responseText === null) {
+                        // 첫 토큰이 오면 로딩 표시를 내리고 응답 말풍선 생성
+                        this.hideLoading();
+                        responseText = this.addMessage('', 'buddha');
+                    }
+                    responseText.textContent += data.content;
+                    this.scrollToBottom();
+                }
+
+                if (data.done) {
+                    // 위기 상황 감지
+                    if (data.crisis_alert) {
+                        this.addMessage(data.message, 'buddha', true);
+                    } else if (data.meditation_suggestion) {
+                        // 명상 추천 표시 (선택적)
+                        this.showMeditationSuggestion(data.meditation_suggestion);
+                    }
+                    return;
+                }
+            }
+        }
+    }
+
     addMessage(content, sender, isCrisis = false) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -271,6 +298,7 @@ class BuddhaChat {
 
         this.chatMessages.appendChild(messageDiv);
         this.scrollToBottom();
+        return p;
     }
 
     addSystemMessage(content) {
@@ -0,0 +1,672 @@
+"""
+대화 데이터 저장소
+대화 기록, 세션 분석, 사용자 동의를 저장하는 인터페이스와 CSV/JSON, SQLite(WAL) 구현
+"""
+
+import atexit
+import csv
+import io
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from consent_store import ConsentStore
+from conversation_stats import ConversationStats, _turn_sort_key
+from file_locks import lock_file, unlock_file
+
+# 대화 기록 필드 (CSV 헤더 순서)
+CONVERSATION_FIELDS = [
+    'timestamp',
+    'user_id',
+    'session_id',
+    'user_message',
+    'buddha_response',
+    'message_length',
+    'response_length',
+    'detected_emotions',
+    'conversation_turn'
+]
+
+# 세션 분석 필드 (CSV 헤더 순서)
+ANALYTICS_FIELDS = [
+    'date',
+    'session_id',
+    'total_messages',
+    'avg_message_length',
+    'session_duration_minutes',
+    'primary_emotion',
+    'emotion_progression'
+]
+
+
+def connect_sqlite(db_path, busy_timeout_ms=5000):
+    """
+    여러 워커가 함께 쓰는 SQLite 연결 생성 (WAL 모드, 잠금 대기)
+
+    Args:
+        db_path: 데이터베이스 파일 경로
+        busy_timeout_ms: 다른 워커가 쓰기 잠금을 잡고 있을 때 기다릴 시간
+
+    Returns:
+        sqlite3.Connection: 연결 (행은 sqlite3.Row)
+    """
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    return conn
+
+
+class BackgroundBatchWriter:
+    """항목을 큐에 모아 백그라운드 스레드에서 묶어서 기록하는 클래스"""
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        write_batch,
+        name,
+        max_queue_size=10000,
+        batch_size=100,
+        flush_interval=1.0,
+        on_flush=None
+    ):
+        """
+        Args:
+            write_batch: 항목 리스트를 한 번에 기록하는 함수
+            name: 기록 스레드 이름
+            max_queue_size: 대기 큐 최대 크기 (가득 차면 호출한 쪽에서 직접 기록)
+            batch_size: 한 번에 기록할 최대 항목 수
+            flush_interval: 항목이 모이지 않아도 기록할 최대 대기 시간 (초)
+            on_flush: 배치를 기록한 뒤 기록 스레드에서 호출할 함수
+        """
+        self.write_batch = write_batch
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        """기록 스레드 시작 (fork 이후 워커에서도 다시 시작되도록 pid 확인)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def write(self, item):
+        """
+        항목 기록 예약 (디스크 I/O 없이 즉시 반환)
+
+        Args:
+            item: 기록할 항목
+        """
+        if self._closed:
+            self.write_batch([item])
+            return
+
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # 큐가 가득 차면 유실 대신 호출한 쪽에서 직접 기록
+            self.write_batch([item])
+
+    def flush(self):
+        """대기 중인 항목이 모두 기록될 때까지 대기"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """남은 항목을 모두 기록하고 스레드 종료"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self):
+        """큐에서 항목을 모아 크기/시간 기준으로 배치 기록"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not self._STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is self._STOP
+            items = batch[:-1] if stop else batch
+            try:
+                if items:
+                    self.write_batch(items)
+                    if self.on_flush is not None:
+                        self.on_flush()
+            except Exception as e:
+                print(f"Error in batch writer ({self.name}): {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+
+class CSVAppender:
+    """CSV 파일 끝에 행을 추가하는 클래스 (워커 간 파일 잠금)"""
+
+    def __init__(self, path, fieldnames, fsync_interval=5.0):
+        """
+        Args:
+            path: CSV 파일 경로
+            fieldnames: 헤더 필드 목록
+            fsync_interval: fsync 주기 (초, 0이면 매번, None이면 하지 않음)
+        """
+        self.path = Path(path)
+        self.fieldnames = fieldnames
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+
+        if not self.path.exists():
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(fieldnames)
+
+    def write_rows(self, rows):
+        """
+        행들을 한 번의 write로 파일 끝에 추가 (행이 다른 워커의 행과 섞이지 않게 함)
+
+        Args:
+            rows: 필드명을 키로 하는 dict 리스트
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row.get(field, '') for field in self.fieldnames])
+        data = buffer.getvalue()
+
+        with self._lock:
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                lock_file(f, exclusive=True)
+                try:
+                    f.write(data)
+                    f.flush()
+                    if self._fsync_due():
+                        os.fsync(f.fileno())
+                finally:
+                    unlock_file(f)
+
+    def _fsync_due(self):
+        """fsync 주기가 되었는지 확인"""
+        if self.fsync_interval is None:
+            return False
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            self._last_fsync = now
+            return True
+        return False
+
+
+class Storage:
+    """대화 데이터 저장소 인터페이스"""
+
+    def log_conversation(self, row):
+        """대화 기록 추가 (CONVERSATION_FIELDS 키를 가진 dict)"""
+        raise NotImplementedError
+
+    def log_session_analytics(self, row):
+        """세션 분석 기록 추가 (ANALYTICS_FIELDS 키를 가진 dict)"""
+        raise NotImplementedError
+
+    def save_consent(self, user_id, record):
+        """사용자 동의 기록 저장 (consent, timestamp, version)"""
+        raise NotImplementedError
+
+    def get_consent(self, user_id):
+        """사용자 동의 기록 반환 (없으면 None)"""
+        raise NotImplementedError
+
+    def iter_conversations(self, since=None, until=None):
+        """
+        대화 기록을 오래된 순으로 하나씩 반환
+
+        Args:
+            since: 이 시각(ISO 문자열) 이후 기록만 (포함)
+            until: 이 시각(ISO 문자열) 이전 기록만 (제외)
+        """
+        raise NotImplementedError
+
+    def find_conversations(self, user_id=None, session_id=None, limit=None):
+        """사용자/세션별 대화 기록 조회"""
+        raise NotImplementedError
+
+    def get_statistics(self):
+        """누적 통계 반환"""
+        raise NotImplementedError
+
+    def flush(self):
+        """대기 중인 기록을 모두 저장"""
+
+    def close(self):
+        """남은 기록을 저장하고 자원 정리"""
+
+
+class CSVStorage(Storage):
+    """CSV/JSON 파일 저장소 (conversation_data/ 아래 기존 파일 형식 유지)"""
+
+    def __init__(
+        self,
+        data_dir,
+        batch_size=100,
+        flush_interval=1.0,
+        fsync_interval=5.0,
+        max_queue_size=10000
+    ):
+        """
+        Args:
+            data_dir: 데이터 디렉토리
+            batch_size: 한 번에 기록할 최대 행 수
+            flush_interval: 배치 최대 대기 시간 (초)
+            fsync_interval: fsync 주기 (초)
+            max_queue_size: 기록 대기 큐 최대 크기
+        """
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(exist_ok=True)
+
+        self.conversations_file = self.data_dir / "conversations.csv"
+        self.analytics_file = self.data_dir / "analytics.csv"
+        self.consent_file = self.data_dir / "user_consents.json"
+        self.consent_journal_file = self.data_dir / "user_consents.journal"
+
+        self._conversations = CSVAppender(self.conversations_file, CONVERSATION_FIELDS, fsync_interval)
+        self._analytics = CSVAppender(self.analytics_file, ANALYTICS_FIELDS, fsync_interval)
+
+        # 동의 정보 메모리 인덱스 (변경은 저널에 추가 후 주기적으로 압축)
+        self._consents = ConsentStore(self.consent_file, self.consent_journal_file)
+
+        # 누적 통계 (기록 스레드가 배치를 쓸 때마다 새 행만 반영)
+        self._stats = ConversationStats(self.conversations_file)
+
+        # 요청 경로에서 디스크 I/O를 빼기 위한 백그라운드 기록기
+        writer_options = {
+            'max_queue_size': max_queue_size,
+            'batch_size': batch_size,
+            'flush_interval': flush_interval
+        }
+        self._conversation_writer = BackgroundBatchWriter(
+            self._conversations.write_rows,
+            name="csv-writer-conversations",
+            on_flush=self._stats.refresh,
+            **writer_options
+        )
+        self._analytics_writer = BackgroundBatchWriter(
+            self._analytics.write_rows,
+            name="csv-writer-analytics",
+            **writer_options
+        )
+
+    def log_conversation(self, row):
+        self._conversation_writer.write(row)
+
+    def log_session_analytics(self, row):
+        self._analytics_writer.write(row)
+
+    def save_consent(self, user_id, record):
+        self._consents.set(user_id, record)
+
+    def get_consent(self, user_id):
+        return self._consents.get(user_id)
+
+    def all_consents(self):
+        """전체 동의 기록 반환 (마이그레이션용)"""
+        return self._consents.all()
+
+    def iter_conversations(self, since=None, until=None):
+        self.flush()
+        with open(self.conversations_file, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if since is not None and row['timestamp'] < since:
+                    continue
+                if until is not None and row['timestamp'] >= until:
+                    continue
+                yield row
+
+    def iter_session_analytics(self):
+        """전체 세션 분석 기록 반환 (마이그레이션용)"""
+        self.flush()
+        with open(self.analytics_file, 'r', newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+    def find_conversations(self, user_id=None, session_id=None, limit=None):
+        """사용자/세션별 대화 기록 조회 (CSV는 인덱스가 없어 전체 스캔)"""
+        results = []
+        for row in self.iter_conversations():
+            if user_id is not None and row['user_id'] != user_id:
+                continue
+            if session_id is not None and row['session_id'] != session_id:
+                continue
+            results.append(row)
+        return results[-limit:] if limit else results
+
+    def get_statistics(self):
+        self.flush()
+        return self._stats.get_statistics()
+
+    def flush(self):
+        self._conversation_writer.flush()
+        self._analytics_writer.flush()
+
+    def close(self):
+        self._conversation_writer.close()
+        self._analytics_writer.close()
+        self._stats.refresh()
+        self._stats.persist()
+
+
+class SQLiteStorage(Storage):
+    """SQLite(WAL 모드) 저장소 (user_id, session_id, timestamp 인덱스 + 누적 통계 테이블)"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        user_message TEXT,
+        buddha_response TEXT,
+        message_length INTEGER NOT NULL DEFAULT 0,
+        response_length INTEGER NOT NULL DEFAULT 0,
+        detected_emotions TEXT NOT NULL DEFAULT '',
+        conversation_turn INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id);
+    CREATE INDEX IF NOT EXISTS idx_conversations_session_id ON conversations(session_id);
+    CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp);
+
+    CREATE TABLE IF NOT EXISTS session_analytics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        total_messages INTEGER,
+        avg_message_length REAL,
+        session_duration_minutes REAL,
+        primary_emotion TEXT,
+        emotion_progression TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_session_analytics_session_id ON session_analytics(session_id);
+    CREATE INDEX IF NOT EXISTS idx_session_analytics_date ON session_analytics(date);
+
+    CREATE TABLE IF NOT EXISTS user_consents (
+        user_id TEXT PRIMARY KEY,
+        consent INTEGER NOT NULL,
+        timestamp TEXT,
+        version TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS stats_totals (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS stats_sessions (session_id TEXT PRIMARY KEY);
+    CREATE TABLE IF NOT EXISTS stats_daily (day TEXT PRIMARY KEY, count INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS stats_emotions (emotion TEXT PRIMARY KEY, count INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS stats_turns (turn TEXT PRIMARY KEY, count INTEGER NOT NULL);
+    """
+
+    def __init__(
+        self,
+        db_path,
+        batch_size=100,
+        flush_interval=1.0,
+        max_queue_size=10000,
+        busy_timeout_ms=5000
+    ):
+        """
+        Args:
+            db_path: SQLite 데이터베이스 파일 경로
+            batch_size: 한 트랜잭션에 기록할 최대 행 수
+            flush_interval: 배치 최대 대기 시간 (초)
+            max_queue_size: 기록 대기 큐 최대 크기
+            busy_timeout_ms: 다른 워커가 쓰기 잠금을 잡고 있을 때 기다릴 시간
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+        writer_options = {
+            'max_queue_size': max_queue_size,
+            'batch_size': batch_size,
+            'flush_interval': flush_interval
+        }
+        self._conversation_writer = BackgroundBatchWriter(
+            self.write_conversations,
+            name="sqlite-writer-conversations",
+            **writer_options
+        )
+        self._analytics_writer = BackgroundBatchWriter(
+            self.write_session_analytics,
+            name="sqlite-writer-analytics",
+            **writer_options
+        )
+
+    def _connection(self):
+        """스레드(및 프로세스)별 연결 반환"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect_sqlite(self.db_path, self.busy_timeout_ms)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def log_conversation(self, row):
+        self._conversation_writer.write(row)
+
+    def log_session_analytics(self, row):
+        self._analytics_writer.write(row)
+
+    def write_conversations(self, rows):
+        """
+        대화 기록과 누적 통계를 한 트랜잭션으로 기록
+
+        Args:
+            rows: CONVERSATION_FIELDS 키를 가진 dict 리스트
+        """
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO conversations ({', '.join(CONVERSATION_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in CONVERSATION_FIELDS)})",
+                [[row.get(field) for field in CONVERSATION_FIELDS] for row in rows]
+            )
+
+            new_sessions = 0
+            message_length = 0
+            response_length = 0
+            for row in rows:
+                new_sessions += conn.execute(
+                    "INSERT OR IGNORE INTO stats_sessions (session_id) VALUES (?)",
+                    (row.get('session_id'),)
+                ).rowcount
+                message_length += int(row.get('message_length') or 0)
+                response_length += int(row.get('response_length') or 0)
+
+                self._increment(conn, 'stats_daily', 'day', str(row.get('timestamp', ''))[:10])
+                self._increment(conn, 'stats_turns', 'turn', str(row.get('conversation_turn', '')))
+                for emotion in filter(None, (row.get('detected_emotions') or '').split(',')):
+                    self._increment(conn, 'stats_emotions', 'emotion', emotion)
+
+            for name, value in (
+                ('conversations', len(rows)),
+                ('sessions', new_sessions),
+                ('message_length', message_length),
+                ('response_length', response_length)
+            ):
+                self._increment(conn, 'stats_totals', 'name', name, value, column='value')
+
+    @staticmethod
+    def _increment(conn, table, key_column, key, amount=1, column='count'):
+        """누적 통계 테이블 값 증가 (없으면 생성)"""
+        conn.execute(
+            f"INSERT INTO {table} ({key_column}, {column}) VALUES (?, ?) "
+            f"ON CONFLICT({key_column}) DO UPDATE SET {column} = {column} + excluded.{column}",
+            (key, amount)
+        )
+
+    def write_session_analytics(self, rows):
+        """
+        세션 분석 기록을 한 트랜잭션으로 기록
+
+        Args:
+            rows: ANALYTICS_FIELDS 키를 가진 dict 리스트
+        """
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO session_analytics ({', '.join(ANALYTICS_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in ANALYTICS_FIELDS)})",
+                [[row.get(field) for field in ANALYTICS_FIELDS] for row in rows]
+            )
+
+    def save_consent(self, user_id, record):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO user_consents (user_id, consent, timestamp, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET consent = excluded.consent, "
+                "timestamp = excluded.timestamp, version = excluded.version",
+                (user_id, int(bool(record.get('consent'))), record.get('timestamp'), record.get('version'))
+            )
+
+    def get_consent(self, user_id):
+        row = self._connection().execute(
+            "SELECT consent, timestamp, version FROM user_consents WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'consent': bool(row['consent']), 'timestamp': row['timestamp'], 'version': row['version']}
+
+    def iter_conversations(self, since=None, until=None):
+        self.flush()
+        conditions = []
+        params = []
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(until)
+
+        query = f"SELECT {', '.join(CONVERSATION_FIELDS)} FROM conversations"
+        if conditions:
+            # 기간 조건은 timestamp 인덱스로 범위 검색
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+
+        # 커서를 그대로 순회하므로 전체 결과를 메모리에 올리지 않음
+        for row in self._connection().execute(query, params):
+            yield dict(row)
+
+    def find_conversations(self, user_id=None, session_id=None, limit=None):
+        """사용자/세션별 대화 기록 조회 (인덱스 사용)"""
+        self.flush()
+        conditions = []
+        params = []
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if session_id is not None:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+
+        columns = ', '.join(CONVERSATION_FIELDS)
+        query = f"SELECT id, {columns} FROM conversations"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if limit:
+            # 최근 limit개를 오래된 순으로 반환
+            query = f"SELECT {columns} FROM ({query} ORDER BY id DESC LIMIT ?) ORDER BY id"
+            params.append(int(limit))
+        else:
+            query = f"SELECT {columns} FROM ({query}) ORDER BY id"
+
+        return [dict(row) for row in self._connection().execute(query, params)]
+
+    def get_statistics(self):
+        self.flush()
+        conn = self._connection()
+        totals = {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM stats_totals")}
+        total = totals.get('conversations', 0)
+        turns = conn.execute("SELECT turn, count FROM stats_turns").fetchall()
+
+        return {
+            'total_conversations': total,
+            'total_sessions': totals.get('sessions', 0),
+            'avg_message_length': totals.get('message_length', 0) / total if total > 0 else 0,
+            'avg_response_length': totals.get('response_length', 0) / total if total > 0 else 0,
+            'daily_conversations': {
+                row['day']: row['count']
+                for row in conn.execute("SELECT day, count FROM stats_daily ORDER BY day")
+            },
+            'emotion_histogram': {
+                row['emotion']: row['count']
+                for row in conn.execute(
+                    "SELECT emotion, count FROM stats_emotions ORDER BY count DESC, emotion"
+                )
+            },
+            'turn_distribution': {
+                row['turn']: row['count']
+                for row in sorted(turns, key=lambda row: _turn_sort_key(row['turn']))
+            }
+        }
+
+    def flush(self):
+        self._conversation_writer.flush()
+        self._analytics_writer.flush()
+
+    def close(self):
+        self._conversation_writer.close()
+        self._analytics_writer.close()
+
+
+def create_storage(backend, data_dir, **options):
+    """
+    설정에 맞는 저장소 생성
+
+    Args:
+        backend: 'csv' 또는 'sqlite'
+        data_dir: 데이터 디렉토리
+        **options: 저장소별 설정 (batch_size, flush_interval, fsync_interval 등)
+
+    Returns:
+        Storage: 저장소 인스턴스
+    """
+    if backend == 'csv':
+        return CSVStorage(data_dir, **options)
+    if backend == 'sqlite':
+        options.pop('fsync_interval', None)  # SQLite는 WAL + synchronous=NORMAL로 관리
+        return SQLiteStorage(Path(data_dir) / "buddha_talk.db", **options)
+    raise ValueError(f"알 수 없는 저장소: {backend}")
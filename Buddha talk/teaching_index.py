@@ -0,0 +1,196 @@
+"""
+불교 가르침 검색 인덱스
+카테고리 키워드 역색인(Aho-Corasick)과 선택적 BM25 점수로 메시지에 맞는 가르침을 순위대로 반환
+import 시점에 한 번만 구축하며, 디스크에서 불러온 수천 개의 경전 구절로도 확장 가능
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from keyword_matcher import KeywordMatcher
+
+
+def passages_from_categories(teachings: Dict[str, List[str]]) -> List[Dict]:
+    """
+    {카테고리: [가르침, ...]} 형식을 구절 목록으로 변환
+
+    Args:
+        teachings: 카테고리별 가르침 (prompts.BUDDHIST_TEACHINGS 형식)
+
+    Returns:
+        list: [{'category', 'text'}, ...] (원래 순서 유지)
+    """
+    return [
+        {'category': category, 'text': text}
+        for category, texts in teachings.items()
+        for text in texts
+    ]
+
+
+def load_passages(path) -> List[Dict]:
+    """
+    디스크에서 구절 불러오기
+    JSON Lines 파일 또는 그런 파일(*.jsonl)이 든 디렉토리
+    한 줄 형식: {"text": "...", "category": "분노", "source": "법구경 3"} (text만 필수)
+
+    Args:
+        path: 파일 또는 디렉토리 경로
+
+    Returns:
+        list: 구절 목록 (파일 이름순, 파일 내 줄 순서)
+    """
+    path = Path(path)
+    files = sorted(path.glob('*.jsonl')) if path.is_dir() else [path]
+
+    passages = []
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                passage = json.loads(line)
+                if passage.get('text'):
+                    passages.append(passage)
+    return passages
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25용 토큰화 (어절별 문자 2-gram, 형태소 분석기 없이 한국어 어간 일치를 근사)
+
+    Args:
+        text: 원문
+
+    Returns:
+        list: 토큰 목록
+    """
+    tokens = []
+    for word in text.split():
+        word = ''.join(char for char in word if char.isalnum())
+        if len(word) == 1:
+            tokens.append(word)
+        for i in range(len(word) - 1):
+            tokens.append(word[i:i + 2])
+    return tokens
+
+
+class TeachingIndex:
+    """카테고리 키워드 역색인 + BM25 가르침 검색기"""
+
+    def __init__(
+        self,
+        passages: Iterable[Dict],
+        category_keywords: Optional[Dict[str, str]] = None,
+        use_bm25: bool = True,
+        k1: float = 1.5,
+        b: float = 0.75,
+        min_bm25_score: float = 1.0
+    ):
+        """
+        Args:
+            passages: 구절 목록 ({'text', 'category'(선택)})
+            category_keywords: {키워드: 카테고리} (메시지에 키워드가 있으면 해당 카테고리 구절 우선)
+            use_bm25: 구절 본문에 대한 BM25 점수 사용 여부
+            k1: BM25 단어 빈도 포화 계수
+            b: BM25 문서 길이 정규화 계수
+            min_bm25_score: 키워드 일치 없이 BM25만으로 반환할 최소 점수
+        """
+        self.passages = list(passages)
+        self.use_bm25 = use_bm25
+        self.k1 = k1
+        self.b = b
+        self.min_bm25_score = min_bm25_score
+
+        # 카테고리 → 구절 번호 역색인
+        self._category_passages: Dict[str, List[int]] = {}
+        for doc_id, passage in enumerate(self.passages):
+            category = passage.get('category')
+            if category:
+                self._category_passages.setdefault(category, []).append(doc_id)
+
+        self._matcher = KeywordMatcher(
+            (keyword, category)
+            for keyword, category in (category_keywords or {}).items()
+            if category in self._category_passages
+        )
+
+        self._postings: Dict[str, List[tuple]] = {}
+        self._idf: Dict[str, float] = {}
+        self._doc_lengths: List[int] = []
+        self._avg_length = 0.0
+        if use_bm25:
+            self._build_bm25()
+
+    def _build_bm25(self):
+        """토큰 → [(구절 번호, 단어 빈도 가중치)] 역색인과 IDF 계산"""
+        counts_by_doc = []
+        for passage in self.passages:
+            tokens = tokenize(passage['text'])
+            self._doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            counts_by_doc.append(counts)
+
+        total = len(self.passages)
+        self._avg_length = sum(self._doc_lengths) / total if total else 0.0
+
+        # 질의와 무관한 단어 빈도/문서 길이 항은 미리 계산해 두어 검색 시 곱셈만 남김
+        for doc_id, counts in enumerate(counts_by_doc):
+            length_norm = 1 - self.b + self.b * self._doc_lengths[doc_id] / self._avg_length
+            for token, frequency in counts.items():
+                weight = frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                self._postings.setdefault(token, []).append((doc_id, weight))
+
+        self._idf = {
+            token: math.log((total - len(postings) + 0.5) / (len(postings) + 0.5) + 1)
+            for token, postings in self._postings.items()
+        }
+
+    def _bm25_scores(self, query: str) -> Dict[int, float]:
+        """질의 토큰이 등장하는 구절만 BM25 점수 계산"""
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = self._idf[token]
+            for doc_id, weight in postings:
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * weight
+        return scores
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+        """
+        질의와 관련된 구절을 순위대로 반환
+        키워드가 일치한 카테고리 수 → BM25 점수 → 구절 순서로 정렬 (항상 같은 결과)
+
+        Args:
+            query: 사용자 메시지 등 검색어
+            top_k: 최대 반환 개수
+
+        Returns:
+            list: 구절 목록
+        """
+        if not query or top_k <= 0:
+            return []
+
+        keyword_scores: Dict[int, int] = {}
+        for category, hits in self._matcher.match(query).items():
+            for doc_id in self._category_passages[category]:
+                keyword_scores[doc_id] = keyword_scores.get(doc_id, 0) + hits
+
+        bm25_scores = self._bm25_scores(query) if self.use_bm25 else {}
+
+        candidates = set(keyword_scores)
+        candidates.update(
+            doc_id for doc_id, score in bm25_scores.items() if score >= self.min_bm25_score
+        )
+
+        ranked = sorted(
+            candidates,
+            key=lambda doc_id: (-keyword_scores.get(doc_id, 0), -bm25_scores.get(doc_id, 0.0), doc_id)
+        )
+        return [self.passages[doc_id] for doc_id in ranked[:top_k]]
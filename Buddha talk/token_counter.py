@@ -0,0 +1,93 @@
+"""
+토큰 수 계산
+tiktoken이 설치되어 있고 인코딩을 불러올 수 있으면 정확히 세고, 아니면 문자 종류별 근사치 사용
+(근사치는 예산을 넘지 않도록 실제보다 약간 크게 잡음)
+"""
+
+import re
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # 정확한 토큰 계산은 선택 기능
+    tiktoken = None
+
+# 메시지 하나당 역할/구분자 토큰 (채팅 형식 오버헤드)
+MESSAGE_OVERHEAD_TOKENS = 4
+# 응답 시작 표시 토큰
+REPLY_PRIMING_TOKENS = 2
+
+_HANGUL_PATTERN = re.compile(r'[가-힣ㄱ-ㆎ]')
+_WORD_PATTERN = re.compile(r'[A-Za-z0-9]+')
+_SYMBOL_PATTERN = re.compile(r'[^\sA-Za-z0-9가-힣ㄱ-ㆎ]')
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding(model="gpt-4o"):
+    """tiktoken 인코딩 (한 번만 시도, 실패하면 None)"""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            if tiktoken is not None:
+                try:
+                    _encoding = tiktoken.encoding_for_model(model)
+                except Exception:
+                    # 인코딩 파일을 내려받을 수 없는 환경 등
+                    _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(text):
+    """
+    문자 종류별 토큰 수 근사 (한글 음절 1개 ≈ 0.8토큰, 영문/숫자 4자 ≈ 1토큰, 기호 1개 ≈ 1토큰)
+
+    Args:
+        text: 텍스트
+
+    Returns:
+        int: 추정 토큰 수
+    """
+    hangul = len(_HANGUL_PATTERN.findall(text))
+    words = sum((len(word) + 3) // 4 for word in _WORD_PATTERN.findall(text))
+    symbols = len(_SYMBOL_PATTERN.findall(text))
+    return int(hangul * 0.8 + 0.5) + words + symbols
+
+
+def count_tokens(text):
+    """
+    텍스트의 토큰 수
+
+    Args:
+        text: 텍스트
+
+    Returns:
+        int: 토큰 수
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return estimate_tokens(text)
+
+
+def count_message_tokens(messages):
+    """
+    채팅 메시지 목록의 입력 토큰 수
+
+    Args:
+        messages: [{'role', 'content'}, ...]
+
+    Returns:
+        int: 토큰 수
+    """
+    return sum(
+        MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get('content') or '')
+        for message in messages
+    ) + REPLY_PRIMING_TOKENS
@@ -0,0 +1,354 @@
+"""
+학습 데이터 추출 파이프라인
+저장소의 대화 기록을 한 행씩 흘려보내며 필터링, 중복 제거, 포맷 변환, 압축, 분할 저장
+(로그 크기와 무관하게 메모리 사용량 일정)
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import re
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from prompts import SYSTEM_PROMPT_PREFIX
+
+try:
+    import zstandard
+except ImportError:  # zstd 압축은 선택 기능
+    zstandard = None
+
+# 출력 형식별 확장자
+FORMAT_EXTENSIONS = {
+    'jsonl': '.jsonl',
+    'csv': '.csv'
+}
+
+# 압축 방식별 확장자
+COMPRESSION_EXTENSIONS = {
+    None: '',
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+# 학습용 CSV 헤더 (기존 export_for_training 형식)
+CSV_HEADER = ['user_question', 'buddha_answer', 'emotions']
+
+
+class BloomFilter:
+    """고정 메모리로 중복 여부를 판별하는 블룸 필터 (거짓 양성만 있고 거짓 음성은 없음)"""
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        """
+        Args:
+            capacity: 예상 고유 항목 수
+            error_rate: capacity개를 넣었을 때의 거짓 양성 비율
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, digest):
+        """
+        항목 추가
+
+        Args:
+            digest: 16바이트 이상의 해시값
+
+        Returns:
+            bool: 이미 있던 항목이면 True
+        """
+        # 이중 해싱으로 hash_count개의 위치 계산
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        seen = True
+        for i in range(self.hash_count):
+            position = (h1 + i * h2) % self.size
+            byte, bit = divmod(position, 8)
+            mask = 1 << bit
+            if not self.bits[byte] & mask:
+                seen = False
+                self.bits[byte] |= mask
+        return seen
+
+
+_NORMALIZE_PATTERN = re.compile(r'[\W_]+')
+
+
+def pair_digest(question, answer):
+    """
+    거의 같은 질문-답변 쌍이 같은 값이 되도록 정규화 후 해시
+    (대소문자, 공백, 문장부호 차이는 무시)
+
+    Args:
+        question: 사용자 질문
+        answer: 부처님 답변
+
+    Returns:
+        bytes: 16바이트 해시값
+    """
+    normalized = (
+        _NORMALIZE_PATTERN.sub('', question.lower())
+        + '\x00'
+        + _NORMALIZE_PATTERN.sub('', answer.lower())
+    )
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+
+
+def quality_score(row):
+    """
+    대화 품질 점수 (0~1)
+    질문이 20자, 답변이 100자 이상이면 만점이고 짧을수록 낮아짐
+
+    Args:
+        row: 대화 기록
+
+    Returns:
+        float: 품질 점수
+    """
+    message_length = int(row.get('message_length') or 0)
+    response_length = int(row.get('response_length') or 0)
+    return min(1.0, message_length / 20) * min(1.0, response_length / 100)
+
+
+def _parse_date(value):
+    """날짜 문자열/객체를 date로 변환"""
+    if value is None or (isinstance(value, date) and not isinstance(value, datetime)):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+class ShardWriter:
+    """크기 기준으로 파일을 나누어 쓰는 출력기 (gzip/zstd 압축 지원)"""
+
+    def __init__(self, output_path, compression=None, max_shard_bytes=None, header=None):
+        """
+        Args:
+            output_path: 출력 파일 경로 (압축 확장자 제외)
+            compression: None, 'gzip', 'zstd'
+            max_shard_bytes: 파일 하나의 최대 크기 (디스크 기준, None이면 나누지 않음)
+            header: 파일마다 맨 앞에 쓸 내용 (CSV 헤더 등)
+        """
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"지원하지 않는 압축 방식: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd 압축을 사용하려면 zstandard 패키지를 설치하세요")
+
+        self.output_path = Path(output_path)
+        self.compression = compression
+        self.max_shard_bytes = max_shard_bytes
+        self.header = header
+        self.paths = []
+
+        self._raw = None
+        self._stream = None
+        self._shard_rows = 0
+
+    def _shard_path(self):
+        """다음 분할 파일 경로"""
+        suffix = COMPRESSION_EXTENSIONS[self.compression]
+        if self.max_shard_bytes is None:
+            return self.output_path.with_name(self.output_path.name + suffix)
+        name = f"{self.output_path.stem}-{len(self.paths):05d}{self.output_path.suffix}{suffix}"
+        return self.output_path.with_name(name)
+
+    def _open(self):
+        """새 분할 파일 열기"""
+        path = self._shard_path()
+        self._raw = open(path, 'wb')
+        if self.compression == 'gzip':
+            self._stream = gzip.GzipFile(filename='', mode='wb', fileobj=self._raw)
+        elif self.compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self.paths.append(str(path))
+        self._shard_rows = 0
+        if self.header:
+            self._stream.write(self.header)
+
+    def _close_current(self):
+        """현재 분할 파일 닫기"""
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self._raw = None
+        self._stream = None
+
+    def write(self, data):
+        """
+        레코드 하나 쓰기 (레코드가 두 파일에 걸쳐 나뉘지 않음)
+
+        Args:
+            data: 인코딩된 레코드 (bytes)
+        """
+        if self._raw is None:
+            self._open()
+        elif (self.max_shard_bytes is not None and self._shard_rows
+                and self._raw.tell() + len(data) > self.max_shard_bytes):
+            # 압축 스트림은 내부 버퍼가 있어 디스크 크기 기준은 근사값
+            self._close_current()
+            self._open()
+        self._stream.write(data)
+        self._shard_rows += 1
+
+    def close(self):
+        """마지막 파일 닫기 (한 행도 없으면 헤더만 있는 빈 파일 생성)"""
+        if self._raw is None and not self.paths:
+            self._open()
+        if self._raw is not None:
+            self._close_current()
+
+
+def _encode_jsonl(row, system_prompt):
+    """대화 기록을 채팅 파인튜닝 형식의 JSONL 한 줄로 변환"""
+    messages = []
+    if system_prompt:
+        messages.append({'role': 'system', 'content': system_prompt})
+    messages.append({'role': 'user', 'content': row['user_message']})
+    messages.append({'role': 'assistant', 'content': row['buddha_response']})
+    return (json.dumps({'messages': messages}, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _encode_csv(values):
+    """CSV 한 행을 bytes로 변환"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue().encode('utf-8')
+
+
+def export_conversations(
+    storage,
+    output_path,
+    output_format='jsonl',
+    compression=None,
+    max_shard_bytes=None,
+    start_date=None,
+    end_date=None,
+    emotions=None,
+    min_turn=None,
+    max_turn=None,
+    min_message_length=5,
+    min_quality_score=0,
+    deduplicate=True,
+    dedup_capacity=1000000,
+    system_prompt=SYSTEM_PROMPT_PREFIX
+):
+    """
+    저장소의 대화 기록을 학습 데이터 파일로 추출
+
+    Args:
+        storage: 대화 기록 저장소 (storage.Storage)
+        output_path: 출력 파일 경로 (압축 확장자 제외)
+        output_format: 'jsonl' (채팅 파인튜닝 형식) 또는 'csv'
+        compression: None, 'gzip', 'zstd'
+        max_shard_bytes: 파일 하나의 최대 크기 (None이면 파일 하나)
+        start_date: 이 날짜부터 (포함, 'YYYY-MM-DD' 또는 date)
+        end_date: 이 날짜까지 (포함)
+        emotions: 이 감정 중 하나라도 감지된 대화만
+        min_turn: 최소 대화 턴
+        max_turn: 최대 대화 턴
+        min_message_length: 최소 질문 길이
+        min_quality_score: 최소 품질 점수 (quality_score 참고)
+        deduplicate: 거의 같은 질문-답변 쌍 제거 여부
+        dedup_capacity: 중복 제거용 블룸 필터의 예상 고유 쌍 수 (메모리 상한 결정)
+        system_prompt: JSONL 형식에 넣을 시스템 프롬프트 (None이면 생략)
+
+    Returns:
+        dict: 생성된 파일 목록과 행 수 통계
+    """
+    if output_format not in FORMAT_EXTENSIONS:
+        raise ValueError(f"지원하지 않는 출력 형식: {output_format}")
+
+    start_date = _parse_date(start_date)
+    end_date = _parse_date(end_date)
+    since = start_date.isoformat() if start_date else None
+    until = (end_date + timedelta(days=1)).isoformat() if end_date else None
+    emotions = set(emotions) if emotions else None
+
+    header = _encode_csv(CSV_HEADER) if output_format == 'csv' else None
+    writer = ShardWriter(output_path, compression, max_shard_bytes, header)
+    seen = BloomFilter(dedup_capacity) if deduplicate else None
+
+    counts = {'rows_read': 0, 'rows_written': 0, 'filtered': 0, 'duplicates': 0}
+    try:
+        for row in storage.iter_conversations(since=since, until=until):
+            counts['rows_read'] += 1
+
+            turn = int(row.get('conversation_turn') or 0)
+            row_emotions = row.get('detected_emotions') or ''
+            if (int(row.get('message_length') or 0) < min_message_length
+                    or (min_turn is not None and turn < min_turn)
+                    or (max_turn is not None and turn > max_turn)
+                    or (emotions is not None and emotions.isdisjoint(row_emotions.split(',')))
+                    or quality_score(row) < min_quality_score):
+                counts['filtered'] += 1
+                continue
+
+            if seen is not None and seen.add(pair_digest(row['user_message'], row['buddha_response'])):
+                counts['duplicates'] += 1
+                continue
+
+            if output_format == 'jsonl':
+                writer.write(_encode_jsonl(row, system_prompt))
+            else:
+                writer.write(_encode_csv([row['user_message'], row['buddha_response'], row_emotions]))
+            counts['rows_written'] += 1
+    finally:
+        writer.close()
+
+    return dict(counts, files=writer.paths)
+
+
+def main():
+    import argparse
+
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="대화 기록을 학습 데이터로 추출")
+    parser.add_argument("--data-dir", default="conversation_data")
+    parser.add_argument("--storage", default="csv", choices=["csv", "sqlite"])
+    parser.add_argument("--output", default="conversation_data/training_data.jsonl")
+    parser.add_argument("--format", default="jsonl", choices=list(FORMAT_EXTENSIONS))
+    parser.add_argument("--compression", choices=["gzip", "zstd"])
+    parser.add_argument("--max-shard-mb", type=float, help="파일 하나의 최대 크기 (MB)")
+    parser.add_argument("--start-date", help="YYYY-MM-DD (포함)")
+    parser.add_argument("--end-date", help="YYYY-MM-DD (포함)")
+    parser.add_argument("--emotion", action="append", help="감정 필터 (여러 번 지정 가능)")
+    parser.add_argument("--min-turn", type=int)
+    parser.add_argument("--max-turn", type=int)
+    parser.add_argument("--min-quality-score", type=float, default=0)
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--no-system-prompt", action="store_true")
+    args = parser.parse_args()
+
+    storage = create_storage(args.storage, args.data_dir)
+    try:
+        result = export_conversations(
+            storage,
+            args.output,
+            output_format=args.format,
+            compression=args.compression,
+            max_shard_bytes=int(args.max_shard_mb * 1024 * 1024) if args.max_shard_mb else None,
+            start_date=args.start_date,
+            end_date=args.end_date,
+            emotions=args.emotion,
+            min_turn=args.min_turn,
+            max_turn=args.max_turn,
+            min_quality_score=args.min_quality_score,
+            deduplicate=not args.no_dedup,
+            system_prompt=None if args.no_system_prompt else SYSTEM_PROMPT_PREFIX
+        )
+    finally:
+        storage.close()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()